@@ -12,6 +12,7 @@ setup(
         "python-dotenv>=1.0.0",
         "prettytable>=3.11.0",
         "aiohttp>=3.8.1",
+        "numpy>=1.20.0",
     ],
     extras_require={
         "dev": [
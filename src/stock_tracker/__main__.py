@@ -7,7 +7,11 @@ import asyncio
 from pathlib import Path
 from datetime import datetime
 from .gist_utils import GistManager
-from .portfolio.portfolio_manager import PortfolioManager
+from .constants import ANALYTICS_MAX_POINTS, ANALYTICS_PERIOD, ANALYTICS_VOLATILITY_WINDOW, HISTORY_COLUMNAR_SUFFIX
+from .portfolio.analytics import PERIODS, HistoryAnalytics, print_history_stats
+from .portfolio.batch import PortfolioBatchUpdater, PortfolioSource, print_batch_report
+from .portfolio.history_store import SEGMENT_SUFFIX, HistoryStore
+from .portfolio.portfolio_manager import HISTORY_FILENAME, PortfolioManager
 from .utils.error_handler import error_handler
 
 def setup_logging():
@@ -30,8 +34,22 @@ def setup_logging():
 @error_handler
 async def async_main():
     parser = argparse.ArgumentParser(description='股票投資組合管理工具')
-    parser.add_argument('command', choices=['portfolio'], help='執行的命令')
+    parser.add_argument('command', choices=['portfolio', 'batch', 'history'], help='執行的命令')
+    parser.add_argument('action', nargs='?', choices=['stats'], help='history: 子命令')
     parser.add_argument('--file', default='portfolio.json', help='投資組合檔案路徑')
+    parser.add_argument('--files', nargs='+', default=[], help='batch: 多個本地投資組合檔案路徑')
+    parser.add_argument('--gists', nargs='+', default=[], help='batch: 多個 Gist ID（需設定 GIST_TOKEN）')
+    parser.add_argument('--gist-dir', default='gists',
+                       help='batch: Gist 投資組合的本地同步目錄（每個 Gist 一個子目錄）')
+    parser.add_argument('--history', help='history: 歷史紀錄檔案路徑（預設為投資組合檔案旁的 portfolio-history.json）')
+    parser.add_argument('--window', type=int, default=ANALYTICS_VOLATILITY_WINDOW,
+                       help='history: 滾動波動度的資料點數')
+    parser.add_argument('--period', choices=PERIODS, default=ANALYTICS_PERIOD,
+                       help='history: 最佳/最差期間的期別')
+    parser.add_argument('--start', help='history: 起始日期（YYYY-MM-DD）')
+    parser.add_argument('--end', help='history: 結束日期（YYYY-MM-DD）')
+    parser.add_argument('--max-points', type=int, default=ANALYTICS_MAX_POINTS,
+                       help='history: 資料點上限，超過時改用每週或每月收盤計算')
     parser.add_argument('--debug', action='store_true', help='啟用除錯模式')
     parser.add_argument('-f', '--force', action='store_true', 
                        help='強制更新所有股票價格，忽略更新時間限制')
@@ -53,35 +71,37 @@ async def async_main():
 
         if gist_id and gist_token:
             logger.info("使用 Gist 模式")
-            try:
-                gist_manager = GistManager(gist_id, gist_token)
-                portfolio_manager = PortfolioManager(
-                    file_path=args.file,
-                    gist_manager=gist_manager,
-                    force_update=args.force  # 傳入強制更新參數
-                )
-                await portfolio_manager.initialize()
-                logger.info("成功初始化 GistManager 和 PortfolioManager")
-            except Exception as e:
-                logger.error(f"初始化 Gist 管理器失敗: {str(e)}")
-                raise
+            gist_manager = GistManager(gist_id, gist_token)
         else:
             logger.info("使用本地檔案模式")
             if not os.path.exists(args.file):
                 logger.error(f"找不到檔案: {args.file}")
                 raise FileNotFoundError(f"找不到必要的配置文件: {args.file}")
-            
-            portfolio_manager = PortfolioManager(
-                file_path=args.file,
-                force_update=args.force  # 傳入強制更新參數
-            )
-            await portfolio_manager.initialize()
-
-        # 使用 await 調用非同步方法
-        if args.force:
-            logger.info("強制更新模式已啟用，將更新所有股票價格")
-        update_result = await portfolio_manager.update_prices()
-        portfolio_manager.print_portfolio()
+            gist_manager = None
+
+        portfolio_manager = PortfolioManager(
+            file_path=args.file,
+            gist_manager=gist_manager,
+            force_update=args.force  # 傳入強制更新參數
+        )
+        # 初始化失敗時也要關閉管理器建立的 HTTP 連線池
+        try:
+            try:
+                await portfolio_manager.initialize()
+            except Exception as e:
+                if gist_manager:
+                    logger.error(f"初始化 Gist 管理器失敗: {str(e)}")
+                raise
+            if gist_manager:
+                logger.info("成功初始化 GistManager 和 PortfolioManager")
+
+            # 使用 await 調用非同步方法
+            if args.force:
+                logger.info("強制更新模式已啟用，將更新所有股票價格")
+            update_result = await portfolio_manager.update_prices()
+            portfolio_manager.print_portfolio()
+        finally:
+            await portfolio_manager.aclose()
 
         if update_result and update_result.status != "success":
             logger.error("投資組合更新未完整成功: %s", update_result.status)
@@ -89,6 +109,59 @@ async def async_main():
 
         return 0
 
+    if args.command == 'batch':
+        return await run_batch(args, logger)
+
+    if args.command == 'history':
+        return run_history(args, logger)
+
+async def run_batch(args, logger):
+    """批次更新多個投資組合，任一投資組合未完整成功即回傳非零"""
+    gist_token = os.environ.get('GIST_TOKEN')
+    if args.gists and not gist_token:
+        raise ValueError("批次更新 Gist 投資組合需要設定 GIST_TOKEN")
+
+    sources = [PortfolioSource(file_path=path) for path in args.files]
+    sources.extend(
+        PortfolioSource(file_path=str(Path(args.gist_dir) / gist_id / 'portfolio.json'), gist_id=gist_id)
+        for gist_id in args.gists
+    )
+    if not sources:
+        raise ValueError("batch 命令需要 --files 或 --gists")
+
+    updater = PortfolioBatchUpdater(sources, force_update=args.force, gist_token=gist_token)
+    try:
+        reports = await updater.run()
+    finally:
+        await updater.aclose()
+    print_batch_report(reports)
+
+    failed = [report for report in reports if report.status != "success"]
+    if failed:
+        logger.error("批次更新未完整成功: %d/%d 個投資組合", len(failed), len(reports))
+        return 1
+    return 0
+
+def run_history(args, logger):
+    """歷史紀錄分析（目前只有 stats 子命令）"""
+    if args.action != 'stats':
+        raise ValueError("history 命令需要子命令: stats")
+
+    history_path = Path(args.history) if args.history else Path(args.file).with_name(HISTORY_FILENAME)
+    candidates = (
+        history_path,
+        history_path.with_suffix(HISTORY_COLUMNAR_SUFFIX),
+        history_path.with_name(history_path.name + SEGMENT_SUFFIX),
+    )
+    if not any(candidate.exists() for candidate in candidates):
+        raise FileNotFoundError(f"找不到歷史紀錄檔案: {history_path}")
+
+    resolution, bars = HistoryStore.load_series(history_path, args.start, args.end, args.max_points)
+    analytics = HistoryAnalytics.from_bars(bars)
+    logger.info("分析 %d 筆歷史紀錄（%s）: %s", len(analytics), resolution, history_path)
+    print_history_stats(analytics.stats(args.window, args.period), args.window, args.period, resolution)
+    return 0
+
 def main():
     """同步入口點，用於執行非同步主函數"""
     return asyncio.run(async_main())
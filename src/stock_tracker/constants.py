@@ -2,6 +2,9 @@ from datetime import time
 
 # URL相關
 GOOGLE_FINANCE_BASE_URL = "https://www.google.com/finance/quote/"
+YAHOO_QUOTE_API_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+TWSE_QUOTE_API_URL = "https://mis.twse.com.tw/stock/api/getStockInfo.jsp"
+EXCHANGE_RATE_API_URL = "https://open.er-api.com/v6/latest/{base}"
 
 # 使用者代理
 DEFAULT_USER_AGENT = (
@@ -16,6 +19,78 @@ DEFAULT_TIMEZONE = "Asia/Taipei"
 REQUEST_TIMEOUT = 10  # 秒
 MAX_RETRIES = 3
 
+# 報價並行抓取相關
+MAX_CONCURRENT_REQUESTS = 8  # 全域同時進行的報價請求上限
+PROVIDER_MAX_CONCURRENCY = 4  # 單一資料來源同時進行的請求上限
+SYMBOL_TIMEOUT = REQUEST_TIMEOUT + 5  # 單一股票報價的總逾時（秒）
+YAHOO_QUOTE_BATCH_SIZE = 50  # 批次報價 API 每次請求的股票數
+TWSE_QUOTE_BATCH_SIZE = 50  # 證交所多檔報價 API 每次請求的股票數
+SYMBOL_ROUTE_CACHE_SIZE = 65536  # 已解析股票代號的快取數量
+DEFAULT_PROVIDER_PRIORITY = 100  # 資料來源預設優先序（數字越小越先嘗試）
+
+# 資料來源健康度與對沖請求相關
+PROVIDER_HEALTH_WINDOW = 50  # 每個資料來源保留的最近請求樣本數
+PROVIDER_HEALTH_MIN_SAMPLES = 5  # 樣本數達此值才依延遲排序與計算 p95
+PROVIDER_MIN_SUCCESS_RATE = 0.5  # 成功率低於此值視為不健康，排到鏈的後段
+HEDGE_LATENCY_PERCENTILE = 95  # 主要來源超過此百分位延遲仍未回應時發出對沖請求
+PROVIDER_HEALTH_PATH = "~/.cache/stock_tracker/provider-health.json"  # 健康度樣本檔，跨排程執行累積（可用環境變數覆寫）
+
+# 斷路器與重試預算相關
+CIRCUIT_FAILURE_THRESHOLD = 5  # 連續連線失敗達此次數即開路
+CIRCUIT_RESET_TIMEOUT = 300  # 開路後等待幾秒才放行半開探測請求
+CIRCUIT_STATE_PATH = "~/.cache/stock_tracker/circuits.json"  # 斷路器狀態檔（可用環境變數覆寫）
+RETRY_BUDGET_RATIO = 0.1  # 每個請求存入的重試額度
+RETRY_BUDGET_MAX_TOKENS = 10  # 重試額度上限
+RETRY_BACKOFF_BASE = 0.5  # 重試退避基準秒數（指數成長並加入隨機抖動）
+RETRY_BACKOFF_MAX = 4  # 單次重試最長等待秒數
+
+# 匯率服務相關
+FX_RATE_TABLE_BASE = "USD"  # 取得匯率表的基準貨幣，其他貨幣對以交叉匯率換算
+FX_RATE_TABLE_TTL = 3600  # 匯率表快取秒數（資料來源每日更新）
+
+# 每個主機的請求速率限制（每秒令牌數, 突發上限）
+RATE_LIMIT_DEFAULT_RATE = 5.0  # 未列出的主機預設每秒請求數；設為 None 表示不限速
+RATE_LIMIT_DEFAULT_BURST = 10  # 未列出的主機預設可突發的請求數
+HOST_RATE_LIMITS = {
+    "tw.stock.yahoo.com": (2.0, 4),
+    "finance.yahoo.com": (2.0, 4),
+    "query1.finance.yahoo.com": (2.0, 4),
+    "mis.twse.com.tw": (1.0, 3),  # 證交所對頻繁請求會暫時封鎖 IP
+    "open.er-api.com": (1.0, 2),
+}
+
+# HTTP 連線池相關
+HTTP_POOL_CONNECTIONS = 10  # 保留連線池的主機數量
+HTTP_POOL_MAXSIZE = MAX_CONCURRENT_REQUESTS  # 每個主機保持的 keep-alive 連線數
+HTTP_KEEPALIVE_TIMEOUT = 30  # 閒置 keep-alive 連線保留秒數（aiohttp）
+
+# 報價頁串流讀取相關
+STREAM_CHUNK_SIZE = 16 * 1024  # 每次讀取的位元組數
+STREAM_MAX_BYTES = 2 * 1024 * 1024  # 單頁最多讀取的位元組數（安全上限）
+STREAM_SCAN_OVERLAP = 4096  # 每次重新掃描時回溯的字元數，避免漏掉跨區塊的標記
+
+# 報價快取相關
+QUOTE_CACHE_MAX_SIZE = 1024  # 記憶體快取最多保存的股票數（LRU）
+QUOTE_CACHE_OPEN_TTL = 60  # 開盤期間報價的有效秒數；收盤後有效至下次開盤
+QUOTE_STORE_PATH = "~/.cache/stock_tracker/quotes.sqlite3"  # 跨行程共用的報價資料庫（可用環境變數覆寫）
+QUOTE_STORE_BUSY_TIMEOUT = 5  # 資料庫被其他行程鎖定時的等待秒數
+PRICE_HISTORY_PATH = "~/.cache/stock_tracker/price-history.sqlite3"  # 各股票價格與匯率時間序列（可用環境變數覆寫）
+
+# 投資組合估值相關
+VALUATION_RESYNC_INTERVAL = 1000  # 累積套用多少次差額後以完整加總校正總值
+
+# 投資組合歷史紀錄相關
+HISTORY_COMPACT_EVERY = 50  # 紀錄段累積幾筆更新後壓縮回 portfolio-history.json
+HISTORY_COMPACT_BYTES = 256 * 1024  # 紀錄段超過此大小（bytes）時也會壓縮
+HISTORY_VALUE_FIELD = "totalValueTwd"  # 欄式歷史儲存的數值欄位
+HISTORY_COLUMNAR_SUFFIX = ".columns"  # 欄式歷史目錄（portfolio-history.columns/）
+HISTORY_MAX_POINTS = 500  # series() 預設的點數上限，超過時改用較粗的解析度
+
+# 歷史績效分析相關
+ANALYTICS_VOLATILITY_WINDOW = 20  # 滾動波動度的資料點數
+ANALYTICS_PERIOD = "month"  # 最佳/最差期間的預設期別（week、month、year）
+ANALYTICS_MAX_POINTS = 5000  # history stats 的點數上限；約 20 年的每日資料仍以日為單位計算
+
 # 輸出格式相關
 TABLE_WIDTH = 80
 COLUMN_WIDTHS = {
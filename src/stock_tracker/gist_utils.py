@@ -1,35 +1,40 @@
 # src/stock_tracker/gist_utils.py
-import aiohttp
 import json
 import os
 import logging
 from datetime import datetime
 
+from .providers.transport import get_default_transport
+
 logger = logging.getLogger(__name__)
 
 HISTORY_FILENAME = 'portfolio-history.json'
 
 class GistManager:
-    def __init__(self, gist_id, token):
+    def __init__(self, gist_id, token, transport=None):
         self.gist_id = gist_id
+        self.transport = transport
         self.headers = {
             'Authorization': f'token {token}',
             'Accept': 'application/vnd.github.v3+json'
         }
         self.base_url = f'https://api.github.com/gists/{gist_id}'
 
+    def _session(self):
+        """取得共用傳輸層的 keep-alive session"""
+        return (self.transport or get_default_transport()).async_session()
+
     async def read_portfolio(self):
         """從 Gist 讀取 portfolio.json"""
         try:
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.get(self.base_url) as response:
-                    if response.status == 200:
-                        gist_data = await response.json()
-                        portfolio_content = gist_data['files']['portfolio.json']['content']
-                        return json.loads(portfolio_content)
-                    else:
-                        logger.error(f"從 Gist 讀取失敗: {response.status}")
-                        return None
+            async with self._session().get(self.base_url, headers=self.headers) as response:
+                if response.status == 200:
+                    gist_data = await response.json()
+                    portfolio_content = gist_data['files']['portfolio.json']['content']
+                    return json.loads(portfolio_content)
+                else:
+                    logger.error(f"從 Gist 讀取失敗: {response.status}")
+                    return None
         except Exception as e:
             logger.error(f"從 Gist 讀取失敗: {str(e)}")
             return None
@@ -37,17 +42,16 @@ class GistManager:
     async def read_history(self):
         """從 Gist 讀取 portfolio-history.json；檔案不存在時回傳空歷史。"""
         try:
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.get(self.base_url) as response:
-                    if response.status == 200:
-                        gist_data = await response.json()
-                        history_file = gist_data.get('files', {}).get(HISTORY_FILENAME)
-                        if not history_file:
-                            return {'values': []}
-                        return json.loads(history_file.get('content') or '{"values": []}')
-                    else:
-                        logger.error(f"從 Gist 讀取歷史檔失敗: {response.status}")
+            async with self._session().get(self.base_url, headers=self.headers) as response:
+                if response.status == 200:
+                    gist_data = await response.json()
+                    history_file = gist_data.get('files', {}).get(HISTORY_FILENAME)
+                    if not history_file:
                         return {'values': []}
+                    return json.loads(history_file.get('content') or '{"values": []}')
+                else:
+                    logger.error(f"從 Gist 讀取歷史檔失敗: {response.status}")
+                    return {'values': []}
         except Exception as e:
             logger.error(f"從 Gist 讀取歷史檔失敗: {str(e)}")
             return {'values': []}
@@ -69,15 +73,14 @@ class GistManager:
                 'files': files
             }
             
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.patch(self.base_url, json=payload) as response:
-                    if response.status == 200:
-                        logger.info("已成功更新 Gist 中的 portfolio.json")
-                        return True
-                    else:
-                        response_text = await response.text()
-                        logger.error(f"更新 Gist 失敗: {response.status}, {response_text}")
-                        return False
+            async with self._session().patch(self.base_url, headers=self.headers, json=payload) as response:
+                if response.status == 200:
+                    logger.info("已成功更新 Gist 中的 portfolio.json")
+                    return True
+                else:
+                    response_text = await response.text()
+                    logger.error(f"更新 Gist 失敗: {response.status}, {response_text}")
+                    return False
         except Exception as e:
             logger.error(f"更新 Gist 失敗: {str(e)}")
             return False
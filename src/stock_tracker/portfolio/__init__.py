@@ -2,6 +2,8 @@
 投資組合管理模組
 """
 
+from .batch import BatchUpdateResult, PortfolioBatchUpdater, PortfolioSource
+from .columnar_history import ColumnarHistory
 from .portfolio_manager import PortfolioManager
 
-__all__ = ['PortfolioManager']
\ No newline at end of file
+__all__ = ['BatchUpdateResult', 'ColumnarHistory', 'PortfolioBatchUpdater', 'PortfolioManager', 'PortfolioSource']
\ No newline at end of file
@@ -0,0 +1,276 @@
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import numpy as np
+
+from ..constants import ANALYTICS_PERIOD, ANALYTICS_VOLATILITY_WINDOW
+from .columnar_history import EPOCH_ORDINAL, ColumnarHistory, ordinals_to_dates, to_ordinal
+from .rollups import RESOLUTION_LABELS
+
+DAYS_PER_YEAR = 365.25
+PERIODS = ("week", "month", "year")
+PERIOD_LABELS = {"week": "週", "month": "月", "year": "年"}
+
+
+@dataclass
+class Drawdown:
+    depth: float
+    peak_date: Optional[str] = None
+    trough_date: Optional[str] = None
+    recovery_date: Optional[str] = None
+
+
+@dataclass
+class PeriodReturn:
+    period: str
+    value: float
+
+
+@dataclass
+class HistoryStats:
+    start_date: str
+    end_date: str
+    points: int
+    start_value: float
+    end_value: float
+    total_return: float
+    cagr: Optional[float]
+    volatility: Optional[float]
+    rolling_volatility: Optional[float]
+    max_drawdown: Drawdown
+    best_day: Optional[PeriodReturn]
+    worst_day: Optional[PeriodReturn]
+    best_period: Optional[PeriodReturn]
+    worst_period: Optional[PeriodReturn]
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class HistoryAnalytics:
+    """
+    投資組合歷史績效分析
+
+    以日序數與數值兩個陣列運算（同一天有多個點時取當日最後一點作為收盤），
+    報酬、波動度、最大回撤等皆為 NumPy 向量化運算，不逐點建立 Python 物件。
+
+    年化時使用歷史實際的每年資料點數（依資料的日期跨度估算），
+    不假設固定的交易日數。
+    """
+
+    def __init__(self, days, values):
+        days = np.asarray(days)
+        values = np.asarray(values, dtype=np.float64)
+        # 每天只保留最後一點（輸入需依日期排序）
+        last_of_day = np.ones(len(days), dtype=bool)
+        last_of_day[:-1] = days[1:] != days[:-1]
+        self.days = days[last_of_day].astype(np.int64)
+        self.values = values[last_of_day]
+
+    @classmethod
+    def from_columnar(cls, history, start=None, end=None):
+        days, values = history.range(start, end)
+        return cls(days, values)
+
+    @classmethod
+    def from_bars(cls, bars):
+        """由 HistoryStore.series() 的 OHLC 建立（以各期收盤日與收盤值計算）"""
+        days = np.fromiter((to_ordinal(bar.close_date) for bar in bars), dtype=np.int64, count=len(bars))
+        values = np.fromiter((bar.close for bar in bars), dtype=np.float64, count=len(bars))
+        return cls(days, values)
+
+    @classmethod
+    def from_document(cls, document, start=None, end=None):
+        return cls.from_columnar(ColumnarHistory.from_document(document), start, end)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def years(self):
+        """資料涵蓋的年數（依日期跨度）"""
+        if len(self.days) < 2:
+            return 0.0
+        return float(self.days[-1] - self.days[0]) / DAYS_PER_YEAR
+
+    @property
+    def periods_per_year(self):
+        years = self.years
+        return (len(self.values) - 1) / years if years else None
+
+    def daily_returns(self):
+        """相鄰兩個資料點之間的報酬率（長度為 len - 1）"""
+        if len(self.values) < 2:
+            return np.empty(0, dtype=np.float64)
+        return self.values[1:] / self.values[:-1] - 1
+
+    def period_returns(self, period=ANALYTICS_PERIOD):
+        """
+        各期報酬率（以每期最後一點為收盤，對上一期收盤計算；第一期對第一個資料點）
+
+        Args:
+            period (str): week、month 或 year
+
+        Returns:
+            tuple[list[str], np.ndarray]: 期別標籤與報酬率
+        """
+        if not len(self.values):
+            return [], np.empty(0, dtype=np.float64)
+        keys = self._period_keys(period)
+        ends = np.flatnonzero(np.append(keys[1:] != keys[:-1], True))
+        closes = self.values[ends]
+        previous = np.concatenate(([self.values[0]], closes[:-1]))
+        return self._period_labels(period, keys[ends]), closes / previous - 1
+
+    def rolling_volatility(self, window=ANALYTICS_VOLATILITY_WINDOW, annualize=True):
+        """
+        滾動 N 個資料點報酬率的標準差
+
+        以累加和一次算出所有視窗的變異數；第 i 個值對應 daily_returns()[i - window + 1 : i + 1]。
+
+        Returns:
+            np.ndarray: 長度為 len(daily_returns()) - window + 1（資料不足時為空陣列）
+        """
+        returns = self.daily_returns()
+        if window < 2 or len(returns) < window:
+            return np.empty(0, dtype=np.float64)
+        sums = np.concatenate(([0.0], np.cumsum(returns)))
+        squares = np.concatenate(([0.0], np.cumsum(returns * returns)))
+        window_sum = sums[window:] - sums[:-window]
+        window_squares = squares[window:] - squares[:-window]
+        variance = (window_squares - window_sum * window_sum / window) / (window - 1)
+        volatility = np.sqrt(np.clip(variance, 0.0, None))
+        return self._annualize(volatility) if annualize else volatility
+
+    def volatility(self, annualize=True):
+        """整段期間報酬率的標準差"""
+        returns = self.daily_returns()
+        if len(returns) < 2:
+            return None
+        volatility = float(returns.std(ddof=1))
+        return float(self._annualize(volatility)) if annualize else volatility
+
+    def max_drawdown(self):
+        """
+        最大回撤（自前高點到之後最低點的跌幅）
+
+        Returns:
+            Drawdown: depth 為負值比例；尚未回到前高時 recovery_date 為 None
+        """
+        if not len(self.values):
+            return Drawdown(depth=0.0)
+        peaks = np.maximum.accumulate(self.values)
+        drawdowns = self.values / peaks - 1
+        trough = int(drawdowns.argmin())
+        depth = float(drawdowns[trough])
+        if depth >= 0:
+            return Drawdown(depth=0.0)
+        peak = int(np.flatnonzero(self.values[:trough + 1] == peaks[trough])[-1])
+        recovered = np.flatnonzero(self.values[trough:] >= peaks[trough])
+        dates = [self.days[peak], self.days[trough]]
+        if len(recovered):
+            dates.append(self.days[trough + int(recovered[0])])
+        return Drawdown(depth, *ordinals_to_dates(dates))
+
+    def cagr(self):
+        """年化報酬率；資料不足一天或起點非正值時為 None"""
+        years = self.years
+        if not years or self.values[0] <= 0:
+            return None
+        return float((self.values[-1] / self.values[0]) ** (1 / years) - 1)
+
+    def stats(self, window=ANALYTICS_VOLATILITY_WINDOW, period=ANALYTICS_PERIOD):
+        """
+        彙整績效統計
+
+        Returns:
+            HistoryStats | None: 沒有資料時為 None
+        """
+        if not len(self.values):
+            return None
+        returns = self.daily_returns()
+        rolling = self.rolling_volatility(window)
+        labels, period_returns = self.period_returns(period)
+        start_date, end_date = ordinals_to_dates([self.days[0], self.days[-1]])
+        return HistoryStats(
+            start_date=start_date,
+            end_date=end_date,
+            points=len(self.values),
+            start_value=float(self.values[0]),
+            end_value=float(self.values[-1]),
+            total_return=float(self.values[-1] / self.values[0] - 1) if self.values[0] else 0.0,
+            cagr=self.cagr(),
+            volatility=self.volatility(),
+            rolling_volatility=float(rolling[-1]) if len(rolling) else None,
+            max_drawdown=self.max_drawdown(),
+            best_day=self._extreme(returns, np.argmax, day_offset=1),
+            worst_day=self._extreme(returns, np.argmin, day_offset=1),
+            best_period=self._extreme(period_returns, np.argmax, labels=labels),
+            worst_period=self._extreme(period_returns, np.argmin, labels=labels),
+        )
+
+    def _annualize(self, volatility):
+        periods_per_year = self.periods_per_year
+        return volatility * np.sqrt(periods_per_year) if periods_per_year else volatility
+
+    def _extreme(self, returns, pick, day_offset=0, labels=None):
+        if not len(returns):
+            return None
+        index = int(pick(returns))
+        label = labels[index] if labels is not None else ordinals_to_dates([self.days[index + day_offset]])[0]
+        return PeriodReturn(period=label, value=float(returns[index]))
+
+    def _period_keys(self, period):
+        epoch_days = self.days - EPOCH_ORDINAL
+        if period == "week":
+            # 1970-01-01 為星期四，位移 3 天讓每週從星期一開始
+            return (epoch_days + 3) // 7
+        if period == "month":
+            return epoch_days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        if period == "year":
+            return epoch_days.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64)
+        raise ValueError(f"不支援的期間: {period}（可用: {', '.join(PERIODS)}）")
+
+    def _period_labels(self, period, keys):
+        if period == "week":
+            # 以該週星期一的日期為標籤
+            return ordinals_to_dates(keys * 7 - 3 + EPOCH_ORDINAL)
+        unit = "datetime64[M]" if period == "month" else "datetime64[Y]"
+        return np.datetime_as_string(keys.astype(unit)).tolist()
+
+
+def print_history_stats(stats, window=ANALYTICS_VOLATILITY_WINDOW, period=ANALYTICS_PERIOD, resolution="daily"):
+    """打印歷史績效統計（resolution 為計算所用資料點的解析度）"""
+    if stats is None:
+        print("\n沒有歷史紀錄")
+        return
+
+    def percent(value):
+        return "-" if value is None else f"{value * 100:,.2f}%"
+
+    def extreme(result):
+        return "-" if result is None else f"{result.period} ({percent(result.value)})"
+
+    drawdown = stats.max_drawdown
+    unit = RESOLUTION_LABELS.get(resolution, resolution)
+    print(f"\n歷史績效統計 ({stats.start_date} ~ {stats.end_date}, {stats.points} 筆):")
+    print(f"- 資料解析度: 每{unit}收盤")
+    print(f"- 起始總值: TWD {stats.start_value:,.2f}")
+    print(f"- 最新總值: TWD {stats.end_value:,.2f}")
+    print(f"- 累積報酬: {percent(stats.total_return)}")
+    print(f"- 年化報酬 (CAGR): {percent(stats.cagr)}")
+    print(f"- 年化波動度: {percent(stats.volatility)}")
+    print(f"- 近 {window} 筆年化波動度: {percent(stats.rolling_volatility)}")
+    if drawdown.peak_date:
+        recovery = drawdown.recovery_date or "尚未回復"
+        print(
+            f"- 最大回撤: {percent(drawdown.depth)} "
+            f"(高點 {drawdown.peak_date}, 低點 {drawdown.trough_date}, 回復 {recovery})"
+        )
+    else:
+        print(f"- 最大回撤: {percent(drawdown.depth)}")
+    print(f"- 最佳單{unit}: {extreme(stats.best_day)}")
+    print(f"- 最差單{unit}: {extreme(stats.worst_day)}")
+    label = PERIOD_LABELS.get(period, period)
+    print(f"- 最佳{label}: {extreme(stats.best_period)}")
+    print(f"- 最差{label}: {extreme(stats.worst_period)}")
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from ..gist_utils import GistManager
+from ..providers.market_data import MarketDataService, PriceUpdateBatch
+from ..providers.quote_cache import CachedMarketDataService
+from ..providers.transport import HttpTransport
+from ..scraper.exchange_rate_scraper import ExchangeRateService
+from .portfolio_manager import HISTORY_FILENAME, PortfolioManager, UpdateResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PortfolioSource:
+    """批次更新的一個投資組合來源：本地檔案，或 Gist（file_path 為本地同步檔）"""
+    file_path: str
+    gist_id: Optional[str] = None
+
+    @property
+    def label(self):
+        return f"gist:{self.gist_id}" if self.gist_id else self.file_path
+
+
+@dataclass
+class BatchUpdateResult:
+    source: PortfolioSource
+    result: Optional[UpdateResult] = None
+    error: Optional[str] = None
+    total_value: Optional[float] = None
+
+    @property
+    def status(self):
+        return self.result.status if self.result is not None else "failed"
+
+
+class PrefetchedQuoteService:
+    """各投資組合共用的報價來源：聯集報價已一次取得，只依代號切出子集"""
+
+    def __init__(self):
+        self.batch = PriceUpdateBatch(prices={}, failures={})
+
+    async def get_prices(self, symbols):
+        return PriceUpdateBatch(
+            prices={symbol: self.batch.prices[symbol] for symbol in symbols if symbol in self.batch.prices},
+            failures={symbol: self.batch.failures[symbol] for symbol in symbols if symbol in self.batch.failures},
+        )
+
+
+class PrefetchedExchangeRateService:
+    """各投資組合共用的匯率來源：匯率只取得一次，失敗時每個投資組合都沿用舊匯率"""
+
+    def __init__(self):
+        self.rate = None
+        self.error = None
+
+    async def get_rate(self, currency_pair='USD-TWD'):
+        if self.error is not None:
+            raise self.error
+        return self.rate
+
+
+class PortfolioBatchUpdater:
+    """
+    一次更新多個投資組合
+
+    先計算所有投資組合待更新股票的聯集，每檔股票與匯率只抓取一次，
+    再同時為每個投資組合重新估值與儲存，並回報各自的 UpdateResult。
+    """
+
+    def __init__(
+        self,
+        sources,
+        force_update=False,
+        gist_token=None,
+        price_service=None,
+        exchange_rate_service=None,
+        transport=None,
+    ):
+        self.sources = list(sources)
+        self.force_update = force_update
+        self.gist_token = gist_token
+        self._owns_transport = transport is None
+        self.transport = transport or HttpTransport()
+        self.price_service = price_service or CachedMarketDataService(
+            MarketDataService(transport=self.transport, stream=True, hedge=True),
+            bypass=force_update,
+        )
+        self.exchange_rate_service = exchange_rate_service or ExchangeRateService(transport=self.transport)
+        self.quotes = PrefetchedQuoteService()
+        self.exchange_rate = PrefetchedExchangeRateService()
+        history_paths = self._history_paths()
+        self.managers = [
+            self._build_manager(source, history_path)
+            for source, history_path in zip(self.sources, history_paths)
+        ]
+
+    def _history_paths(self):
+        """
+        決定各投資組合的歷史紀錄檔案
+
+        預設為投資組合檔案旁的 portfolio-history.json；同一目錄有多個投資組合時，
+        改用各自的 <檔名>-history.json，避免同時寫入同一個歷史檔而遺失資料。
+        """
+        resolved = [Path(source.file_path).resolve() for source in self.sources]
+        duplicates = {path for path in resolved if resolved.count(path) > 1}
+        if duplicates:
+            raise ValueError(f"批次更新包含重複的投資組合檔案: {', '.join(sorted(map(str, duplicates)))}")
+
+        defaults = [path.with_name(HISTORY_FILENAME) for path in resolved]
+        return [
+            path.with_name(f"{path.stem}-history.json") if defaults.count(default) > 1 else None
+            for path, default in zip(resolved, defaults)
+        ]
+
+    def _build_manager(self, source, history_path=None):
+        gist_manager = None
+        if source.gist_id:
+            gist_manager = GistManager(source.gist_id, self.gist_token, transport=self.transport)
+            Path(source.file_path).parent.mkdir(parents=True, exist_ok=True)
+        return PortfolioManager(
+            file_path=source.file_path,
+            gist_manager=gist_manager,
+            force_update=self.force_update,
+            price_service=self.quotes,
+            exchange_rate_service=self.exchange_rate,
+            transport=self.transport,
+            history_path=history_path,
+        )
+
+    async def run(self):
+        """
+        執行批次更新
+
+        Returns:
+            list[BatchUpdateResult]: 依輸入順序排列的各投資組合結果
+        """
+        reports = [BatchUpdateResult(source=source) for source in self.sources]
+        loaded = await asyncio.gather(
+            *(manager.initialize() for manager in self.managers),
+            return_exceptions=True,
+        )
+        ready = []
+        for report, manager, outcome in zip(reports, self.managers, loaded):
+            if isinstance(outcome, Exception):
+                logger.error("載入投資組合失敗 %s: %s", report.source.label, outcome)
+                report.error = str(outcome)
+            else:
+                ready.append((report, manager))
+
+        # 各投資組合的待更新清單只計算一次，抓取聯集與後續更新使用同一份
+        pending = [manager.symbols_to_update() for _, manager in ready]
+        # 所有投資組合待更新股票的聯集（保留首次出現的順序）
+        symbols = list(dict.fromkeys(symbol for symbols_to_update in pending for symbol in symbols_to_update))
+        logger.info("批次更新 %d 個投資組合，共 %d 檔不重複股票", len(ready), len(symbols))
+
+        await asyncio.gather(self._prefetch_exchange_rate(), self._prefetch_quotes(symbols))
+
+        results = await asyncio.gather(
+            *(manager.update_prices(symbols_to_update) for (_, manager), symbols_to_update in zip(ready, pending)),
+            return_exceptions=True,
+        )
+        for (report, manager), outcome in zip(ready, results):
+            if isinstance(outcome, Exception):
+                logger.error("更新投資組合失敗 %s: %s", report.source.label, outcome)
+                report.error = str(outcome)
+            else:
+                report.result = outcome
+            report.total_value = manager.portfolio.get('totalValue')
+        return reports
+
+    async def _prefetch_quotes(self, symbols):
+        if symbols:
+            self.quotes.batch = await self.price_service.get_prices(symbols)
+
+    async def _prefetch_exchange_rate(self):
+        try:
+            self.exchange_rate.rate = await self.exchange_rate_service.get_rate('USD-TWD')
+        except Exception as e:
+            self.exchange_rate.error = e
+
+    async def aclose(self):
+        await asyncio.gather(*(manager.flush_history() for manager in self.managers))
+        if self._owns_transport:
+            await self.transport.aclose()
+
+
+def print_batch_report(reports):
+    """打印批次更新結果"""
+    print("\n批次更新結果:")
+    for report in reports:
+        if report.result is None:
+            print(f"- {report.source.label}: failed ({report.error})")
+            continue
+        line = (
+            f"- {report.source.label}: {report.status}, "
+            f"更新 {len(report.result.updated_symbols)} 檔, 失敗 {len(report.result.failed_symbols)} 檔"
+        )
+        if report.total_value is not None:
+            line = f"{line}, 總值 TWD {report.total_value:,.2f}"
+        print(line)
@@ -0,0 +1,69 @@
+_MISSING = object()
+
+
+class PortfolioChangeSet:
+    """
+    投資組合的輕量交易紀錄
+
+    只記錄被修改欄位的原值（每個欄位第一次修改時記錄一次），
+    不需複製整份投資組合即可提交或回滾，並保留更新前後的總值。
+    """
+
+    def __init__(self, portfolio):
+        self.portfolio = portfolio
+        self.old_total = portfolio.get('totalValue')
+        self._originals = []
+        self._recorded = set()
+
+    @property
+    def new_total(self):
+        return self.portfolio.get('totalValue')
+
+    @property
+    def changed_fields(self):
+        return len(self._originals)
+
+    def set(self, container, key, value):
+        """
+        修改欄位並記錄原值
+
+        Args:
+            container: 投資組合 dict 或其中一筆持股（Holding，以屬性名稱修改）
+            key (str): 欄位或屬性名稱
+            value: 新值
+        """
+        marker = (id(container), key)
+        if marker not in self._recorded:
+            self._recorded.add(marker)
+            self._originals.append((container, key, _read(container, key)))
+        _write(container, key, value)
+
+    def rollback(self):
+        """將所有記錄的欄位還原為修改前的值"""
+        for container, key, original in reversed(self._originals):
+            if original is _MISSING:
+                container.pop(key, None)
+            else:
+                _write(container, key, original)
+        self._clear()
+
+    def commit(self):
+        """確認修改並釋放記錄的原值"""
+        self._clear()
+
+    def _clear(self):
+        self._originals = []
+        self._recorded = set()
+
+
+def _read(container, key):
+    if isinstance(container, dict):
+        return container.get(key, _MISSING)
+    return getattr(container, key)
+
+
+def _write(container, key, value):
+    if isinstance(container, dict):
+        container[key] = value
+    else:
+        setattr(container, key, value)
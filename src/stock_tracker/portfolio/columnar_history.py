@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+from ..constants import HISTORY_COLUMNAR_SUFFIX, HISTORY_VALUE_FIELD
+from .rollups import is_iso_date
+
+logger = logging.getLogger(__name__)
+
+DAYS_FILENAME = "days.npy"
+VALUES_FILENAME = "values.npy"
+META_FILENAME = "meta.json"
+
+# date.toordinal() 與 numpy datetime64[D]（自 1970-01-01 起的天數）的換算差
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_ordinal(day):
+    """ISO 日期字串或 date 轉為日序數（date.toordinal）"""
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    return day.toordinal()
+
+
+def ordinals_to_dates(days):
+    """日序數陣列轉為 ISO 日期字串清單（只在需要輸出時才建立 Python 物件）"""
+    epoch_days = np.asarray(days, dtype=np.int64) - EPOCH_ORDINAL
+    return np.datetime_as_string(epoch_days.astype("datetime64[D]")).tolist()
+
+
+class ColumnarHistory:
+    """
+    欄式（columnar）投資組合歷史
+
+    以 int32 日序數與 float64 數值兩個 NumPy 陣列儲存歷史，並以 .npy 檔寫入目錄；
+    開啟時使用記憶體映射（mmap），區間查詢與統計直接在陣列切片上運算，
+    不需解析整份 JSON，也不會為每個點建立 dict。
+
+    同一天可以有多個點（盤中紀錄），依寫入順序保留。
+    """
+
+    def __init__(self, days, values, updated_at=None):
+        self.days = np.asarray(days, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float64)
+        if self.days.shape != self.values.shape:
+            raise ValueError("days 與 values 長度不一致")
+        self.updated_at = updated_at
+
+    def __len__(self):
+        return len(self.days)
+
+    @classmethod
+    def from_document(cls, document, field=HISTORY_VALUE_FIELD):
+        """
+        由 portfolio-history.json 的內容建立欄式歷史
+
+        Args:
+            document (dict): {"updatedAt", "values": [{"date", "totalValueTwd", ...}]}
+            field (str): 要儲存的數值欄位
+
+        Returns:
+            ColumnarHistory: 依日期排序的欄式歷史（日期無法解析或數值非數字的資料點會略過）
+        """
+        entries = [
+            entry for entry in document.get("values") or []
+            if isinstance(entry, dict) and entry.get("date") and entry.get(field) is not None
+        ]
+        valid = [
+            entry for entry in entries
+            if is_iso_date(entry["date"])
+            and isinstance(entry[field], (int, float)) and not isinstance(entry[field], bool)
+        ]
+        if len(valid) != len(entries):
+            logger.warning("欄式歷史略過 %d 筆格式錯誤的歷史紀錄", len(entries) - len(valid))
+            entries = valid
+        epoch_days = np.array([entry["date"][:10] for entry in entries], dtype="datetime64[D]")
+        days = epoch_days.astype(np.int64) + EPOCH_ORDINAL
+        values = np.fromiter((entry[field] for entry in entries), dtype=np.float64, count=len(entries))
+        order = np.argsort(days, kind="stable")
+        return cls(days[order], values[order], document.get("updatedAt"))
+
+    @classmethod
+    def from_history_file(cls, path, field=HISTORY_VALUE_FIELD):
+        """讀取 portfolio-history.json"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_document(json.load(f), field)
+
+    @classmethod
+    def load(cls, path, field=HISTORY_VALUE_FIELD):
+        """
+        載入 portfolio-history.json 的歷史
+
+        旁邊的欄式副本（portfolio-history.columns/）不比 JSON 舊時直接 mmap 開啟，否則解析 JSON。
+        """
+        path = Path(path)
+        columnar_path = path.with_suffix(HISTORY_COLUMNAR_SUFFIX)
+        meta_path = columnar_path / META_FILENAME
+        if field == HISTORY_VALUE_FIELD and meta_path.exists() and (
+            not path.exists() or meta_path.stat().st_mtime >= path.stat().st_mtime
+        ):
+            return cls.open(columnar_path)
+        return cls.from_history_file(path, field)
+
+    def to_document(self, field=HISTORY_VALUE_FIELD):
+        """轉回 portfolio-history.json 的 {"updatedAt", "values": [...]} 格式（只包含日期與數值）"""
+        document = {}
+        if self.updated_at is not None:
+            document["updatedAt"] = self.updated_at
+        document["values"] = [
+            {"date": day, field: value}
+            for day, value in zip(ordinals_to_dates(self.days), self.values.tolist())
+        ]
+        return document
+
+    def write_history_file(self, path, field=HISTORY_VALUE_FIELD):
+        """寫出 portfolio-history.json 格式的檔案"""
+        _write_atomic(path, lambda f: json.dump(self.to_document(field), f, indent=2, ensure_ascii=False), "w")
+
+    def save(self, directory):
+        """
+        將欄式歷史寫入目錄（days.npy、values.npy、meta.json）
+
+        每個檔案先寫入暫存檔再原子替換；meta.json 最後寫入，記錄筆數供開啟時檢查。
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        _write_atomic(directory / DAYS_FILENAME, lambda f: np.save(f, self.days), "wb")
+        _write_atomic(directory / VALUES_FILENAME, lambda f: np.save(f, self.values), "wb")
+        meta = {"updatedAt": self.updated_at, "count": len(self)}
+        _write_atomic(directory / META_FILENAME, lambda f: json.dump(meta, f), "w")
+
+    @classmethod
+    def open(cls, directory, mmap=True):
+        """
+        開啟欄式歷史目錄
+
+        Args:
+            directory: save() 寫出的目錄
+            mmap (bool): 是否以唯讀記憶體映射載入陣列
+
+        Returns:
+            ColumnarHistory: 欄式歷史
+        """
+        directory = Path(directory)
+        with open(directory / META_FILENAME, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        # 空陣列無法在部分 NumPy 版本上 mmap
+        mode = "r" if mmap and meta.get("count") else None
+        days = np.load(directory / DAYS_FILENAME, mmap_mode=mode)
+        values = np.load(directory / VALUES_FILENAME, mmap_mode=mode)
+        if len(days) != meta.get("count", len(days)) or len(values) != len(days):
+            raise ValueError(f"欄式歷史檔案不完整: {directory}")
+        history = cls.__new__(cls)
+        history.days = days
+        history.values = values
+        history.updated_at = meta.get("updatedAt")
+        return history
+
+    def bounds(self, start=None, end=None):
+        """start <= 日期 <= end 在陣列中的索引範圍（二分搜尋）"""
+        low = 0 if start is None else int(np.searchsorted(self.days, to_ordinal(start), side="left"))
+        high = len(self.days) if end is None else int(np.searchsorted(self.days, to_ordinal(end), side="right"))
+        return low, max(low, high)
+
+    def range(self, start=None, end=None):
+        """
+        區間查詢
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (日序數, 數值) 的陣列切片（mmap 時不複製資料）
+        """
+        low, high = self.bounds(start, end)
+        return self.days[low:high], self.values[low:high]
+
+    def aggregate(self, start=None, end=None):
+        """
+        區間統計
+
+        Returns:
+            dict: count、first、last、min、max、mean、change；區間內沒有資料時只有 count
+        """
+        _, values = self.range(start, end)
+        if not len(values):
+            return {"count": 0}
+        first = float(values[0])
+        last = float(values[-1])
+        return {
+            "count": int(len(values)),
+            "first": first,
+            "last": last,
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": float(values.mean()),
+            "change": last - first,
+        }
+
+
+def _write_atomic(path, write, mode):
+    path = Path(path)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    encoding = None if "b" in mode else "utf-8"
+    with open(temp_path, mode, encoding=encoding) as f:
+        write(f)
+    os.replace(temp_path, path)
@@ -0,0 +1,337 @@
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from ..constants import (
+    HISTORY_COLUMNAR_SUFFIX,
+    HISTORY_COMPACT_BYTES,
+    HISTORY_COMPACT_EVERY,
+    HISTORY_MAX_POINTS,
+    HISTORY_VALUE_FIELD,
+)
+from .columnar_history import META_FILENAME, ColumnarHistory, ordinals_to_dates
+from .rollups import HistoryRollups, RollupBar, is_iso_date, pick_resolution
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+ROLLUPS_FILENAME = "rollups.json"
+
+
+class HistoryStore:
+    """
+    以日期排序索引的投資組合歷史紀錄
+
+    - 依日期 bisect 更新或插入，不需線性掃描與重新排序整份歷史
+    - 每次更新只在 append-only 的紀錄段（portfolio-history.json.log）追加一行
+    - 紀錄段累積 compact_every 筆或超過 compact_bytes 時才壓縮（compact），把完整內容寫回 portfolio-history.json，
+      既有讀取 {"updatedAt", "values": [...]} 格式的程式不受影響；
+      同時更新可記憶體映射的欄式歷史（portfolio-history.columns/）供長區間分析使用
+    - 隨資料點更新維護 totalValueTwd 的每週、每月 OHLC 彙總，壓縮時與欄式歷史一起寫入
+      （portfolio-history.columns/rollups.json），下次載入直接沿用不需重新掃描；
+      series() 依區間與點數上限自動選擇解析度，長區間圖表與分析不需讀取每個原始資料點
+    - 每天只保留一個資料點（同日更新會取代），daily 即當日收盤，是最細的解析度
+    """
+
+    def __init__(self, path, compact_every=HISTORY_COMPACT_EVERY, compact_bytes=HISTORY_COMPACT_BYTES):
+        self.path = Path(path)
+        self.segment_path = self.path.with_name(self.path.name + SEGMENT_SUFFIX)
+        self.columnar_path = self.path.with_suffix(HISTORY_COLUMNAR_SUFFIX)
+        self.rollups_path = self.columnar_path / ROLLUPS_FILENAME
+        self.compact_every = max(1, compact_every)
+        self.compact_bytes = compact_bytes
+        self._dates = []
+        self._values = []
+        self._numbers = []
+        self._meta = {}
+        self._rollups = HistoryRollups()
+        self._pending = 0
+        self._segment_bytes = 0
+        self._lock = threading.RLock()
+        self._load()
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def updated_at(self):
+        return self._meta.get("updatedAt")
+
+    def get(self, date):
+        """取得某日的歷史紀錄，不存在時回傳 None"""
+        with self._lock:
+            index = bisect_left(self._dates, date)
+            if index < len(self._dates) and self._dates[index] == date:
+                return self._values[index]
+            return None
+
+    def range(self, start=None, end=None):
+        """取得 start <= date <= end 的歷史紀錄（日期為 ISO 格式字串）"""
+        with self._lock:
+            low = 0 if start is None else bisect_left(self._dates, start)
+            high = len(self._dates) if end is None else bisect_right(self._dates, end)
+            return self._values[low:high]
+
+    def rollup(self, resolution, start=None, end=None):
+        """
+        取得某解析度下與 start ~ end 重疊的 OHLC
+
+        Args:
+            resolution (str): daily、weekly 或 monthly
+
+        Returns:
+            list[RollupBar]: 依期間排序；daily 的每根 bar 即當日收盤
+        """
+        with self._lock:
+            if resolution != "daily":
+                return self._rollups.bars(resolution, start, end)
+            low = 0 if start is None else bisect_left(self._dates, start)
+            high = len(self._dates) if end is None else bisect_right(self._dates, end)
+            return [
+                RollupBar(day, value, value, value, value, 1)
+                for day, value in zip(self._dates[low:high], self._numbers[low:high])
+                if value is not None
+            ]
+
+    def series(self, start=None, end=None, max_points=HISTORY_MAX_POINTS):
+        """
+        依點數上限自動選擇解析度
+
+        由 daily 往 weekly、monthly 依序檢查，只在區間內的點數超過 max_points 時才改用較粗的解析度；
+        點數只以 bisect 計算，不會先讀出較細的資料。
+
+        Returns:
+            tuple[str, list[RollupBar]]: (解析度, OHLC)；monthly 仍超過上限時回傳 monthly
+        """
+        def count(resolution):
+            if resolution == "daily":
+                low = 0 if start is None else bisect_left(self._dates, start)
+                high = len(self._dates) if end is None else bisect_right(self._dates, end)
+            else:
+                low, high = self._rollups.bounds(resolution, start, end)
+            return high - low
+
+        with self._lock:
+            resolution = pick_resolution(count, max_points)
+            return resolution, self.rollup(resolution, start, end)
+
+    @classmethod
+    def load_series(cls, path, start=None, end=None, max_points=HISTORY_MAX_POINTS):
+        """
+        讀取歷史檔案並依點數上限選擇解析度（同 series()）
+
+        沒有未壓縮的紀錄段、且欄式副本與彙總都不比 JSON 舊時，daily 點數由 mmap 的欄式副本
+        二分搜尋取得、weekly/monthly 直接讀取 rollups.json，不解析整份 JSON；否則載入索引後查詢。
+
+        Returns:
+            tuple[str, list[RollupBar]]: (解析度, OHLC)
+        """
+        path = Path(path)
+        columnar_path = path.with_suffix(HISTORY_COLUMNAR_SUFFIX)
+        rollups_path = columnar_path / ROLLUPS_FILENAME
+        fresh = (
+            not path.with_name(path.name + SEGMENT_SUFFIX).exists()
+            and rollups_path.exists()
+            and (columnar_path / META_FILENAME).exists()
+            and (not path.exists() or rollups_path.stat().st_mtime >= path.stat().st_mtime)
+        )
+        if fresh:
+            history = ColumnarHistory.open(columnar_path)
+            with open(rollups_path, "r", encoding="utf-8") as f:
+                document = json.load(f)
+            if document.get("points") == len(history) and document.get("updatedAt") == history.updated_at:
+                return _columnar_series(history, HistoryRollups.from_document(document), start, end, max_points)
+        return cls(path).series(start, end, max_points)
+
+    def upsert(self, entry, updated_at=None):
+        """
+        新增或取代某日的歷史紀錄，並追加到紀錄段
+
+        Args:
+            entry (dict): 含 date 的歷史紀錄
+            updated_at (str): 歷史的更新時間；預設為 entry 的 sourceUpdatedAt
+        """
+        updated_at = updated_at or entry.get("sourceUpdatedAt")
+        with self._lock:
+            self._apply(entry, updated_at)
+            record = {"entry": entry, "updatedAt": updated_at}
+            self.segment_path.parent.mkdir(parents=True, exist_ok=True)
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            with open(self.segment_path, "ab") as f:
+                f.write(line)
+            self._pending += 1
+            self._segment_bytes += len(line)
+
+    def replace(self, document):
+        """以完整的歷史文件（例如 Gist 上的版本）取代目前內容；下次 compact 時寫回快照"""
+        with self._lock:
+            self._reset(document)
+            self._pending = self.compact_every
+
+    def matches(self, document):
+        """文件與目前內容是否為同一版本（比較更新時間、筆數與最後一筆）"""
+        values = document.get("values") or []
+        with self._lock:
+            return (
+                document.get("updatedAt") == self.updated_at
+                and len(values) == len(self._values)
+                and (not values or values[-1] == self._values[-1])
+            )
+
+    def export(self):
+        """匯出為原本的 {"updatedAt", "values": [...]} 格式"""
+        with self._lock:
+            document = dict(self._meta)
+            document["values"] = list(self._values)
+            return document
+
+    def columnar(self):
+        """目前內容的欄式歷史（不經過檔案）"""
+        return ColumnarHistory.from_document(self.export())
+
+    @classmethod
+    def load_columnar(cls, path):
+        """
+        讀取歷史檔案的欄式歷史，包含尚未壓縮的紀錄段
+
+        沒有紀錄段時直接使用 ColumnarHistory.load（可 mmap 欄式副本），否則載入索引並重播紀錄段。
+        """
+        path = Path(path)
+        if not path.with_name(path.name + SEGMENT_SUFFIX).exists():
+            return ColumnarHistory.load(path)
+        return cls(path).columnar()
+
+    def has_pending(self):
+        """是否有尚未壓縮回快照檔的更新"""
+        return self._pending > 0
+
+    def needs_compaction(self):
+        return self._pending >= self.compact_every or (
+            self.compact_bytes is not None and self._segment_bytes >= self.compact_bytes
+        )
+
+    def compact(self, force=False):
+        """
+        將目前內容寫回快照檔並清空紀錄段
+
+        快照先寫入暫存檔再原子替換；在壓縮完成前紀錄段仍保有所有更新，中斷也不會遺失資料。
+        """
+        with self._lock:
+            if not force and not self.needs_compaction():
+                return False
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.export(), f, indent=2, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            columnar = self.columnar()
+            columnar.save(self.columnar_path)
+            # 彙總已隨每次更新增量維護，直接寫出；欄式副本寫完後才寫，載入時以 points 檢查兩者一致
+            rollups = self._rollups.to_document(updatedAt=self.updated_at, points=len(columnar))
+            rollups_temp = self.rollups_path.with_name(f"{ROLLUPS_FILENAME}.{os.getpid()}.tmp")
+            rollups_temp.write_text(json.dumps(rollups), encoding="utf-8")
+            os.replace(rollups_temp, self.rollups_path)
+            if self.segment_path.exists():
+                self.segment_path.unlink()
+            self._pending = 0
+            self._segment_bytes = 0
+            logger.info("已更新本地投資組合歷史檔案")
+            return True
+
+    def _apply(self, entry, updated_at):
+        date = entry.get("date", "")
+        index = bisect_left(self._dates, date)
+        if index < len(self._dates) and self._dates[index] == date:
+            self._values[index] = entry
+            self._numbers[index] = _entry_value(entry)
+        else:
+            self._dates.insert(index, date)
+            self._values.insert(index, entry)
+            self._numbers.insert(index, _entry_value(entry))
+        if date:
+            self._rollups.refresh(date, self._dates, self._numbers)
+        if updated_at is not None:
+            self._meta["updatedAt"] = updated_at
+
+    def _reset(self, document, rollups=None):
+        self._meta = {key: value for key, value in document.items() if key != "values"}
+        entries = [value for value in document.get("values") or [] if isinstance(value, dict)]
+        # 同一日期保留最後一筆；sorted 為穩定排序
+        by_date = {}
+        for entry in entries:
+            by_date[entry.get("date", "")] = entry
+        ordered = sorted(by_date.items(), key=lambda item: item[0])
+        self._dates = [date for date, _ in ordered]
+        self._values = [entry for _, entry in ordered]
+        self._numbers = [_entry_value(entry) for entry in self._values]
+        if rollups is not None and rollups.get("updatedAt") == self.updated_at and rollups.get("points") == sum(
+            value is not None for value in self._numbers
+        ):
+            self._rollups = HistoryRollups.from_document(rollups)
+        else:
+            self._rollups.rebuild(self._dates, self._numbers)
+
+    def _load(self):
+        document = {"values": []}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            if isinstance(loaded, dict):
+                document = loaded
+        self._reset(document, self._read_rollups())
+
+        if not self.segment_path.exists():
+            return
+        self._segment_bytes = self.segment_path.stat().st_size
+        with open(self.segment_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 寫到一半中斷的最後一行
+                    logger.warning("略過無法解析的歷史紀錄段: %s", self.segment_path)
+                    continue
+                self._apply(record["entry"], record.get("updatedAt"))
+                self._pending += 1
+
+
+    def _read_rollups(self):
+        """上次壓縮寫出的彙總；不存在或無法解析時為 None（改為重新計算）"""
+        if not self.rollups_path.exists():
+            return None
+        try:
+            with open(self.rollups_path, "r", encoding="utf-8") as f:
+                rollups = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("略過無法讀取的歷史彙總 %s: %s", self.rollups_path, e)
+            return None
+        return rollups if isinstance(rollups, dict) else None
+
+
+def _columnar_series(history, rollups, start, end, max_points):
+    def count(resolution):
+        low, high = history.bounds(start, end) if resolution == "daily" else rollups.bounds(resolution, start, end)
+        return high - low
+
+    resolution = pick_resolution(count, max_points)
+    if resolution != "daily":
+        return resolution, rollups.bars(resolution, start, end)
+    days, values = history.range(start, end)
+    return resolution, [
+        RollupBar(day, value, value, value, value, 1)
+        for day, value in zip(ordinals_to_dates(days), values.tolist())
+    ]
+
+
+def _entry_value(entry):
+    """歷史紀錄的 totalValueTwd；日期無法解析或沒有數值時為 None（不列入彙總）"""
+    value = entry.get(HISTORY_VALUE_FIELD)
+    if not is_iso_date(entry.get("date")) or isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
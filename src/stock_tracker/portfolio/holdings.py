@@ -0,0 +1,143 @@
+_MISSING = object()
+
+# portfolio.json 欄位名稱 -> Holding 屬性名稱
+FIELD_ATTRIBUTES = {
+    'name': 'name',
+    'price': 'price',
+    'quantity': 'quantity',
+    'currency': 'currency',
+    'lastUpdated': 'last_updated',
+    'percentageOfTotal': 'percentage_of_total',
+}
+
+# 大部分持股的欄位順序相同，共用同一個 tuple 以節省記憶體
+_key_orders = {}
+
+
+def _intern_key_order(keys):
+    keys = tuple(keys)
+    return _key_orders.setdefault(keys, keys)
+
+
+class Holding:
+    """
+    單一持股（以 __slots__ 儲存，取代每筆持股一個 dict）
+
+    記錄原始欄位順序與未知欄位，dump 時可無損還原 portfolio.json 的格式。
+    """
+
+    __slots__ = (
+        'name',
+        'price',
+        'quantity',
+        'currency',
+        'last_updated',
+        'percentage_of_total',
+        'extra',
+        'key_order',
+    )
+
+    def __init__(
+        self,
+        name,
+        price,
+        quantity,
+        currency,
+        last_updated=None,
+        percentage_of_total=None,
+        extra=None,
+        key_order=None,
+    ):
+        self.name = name
+        self.price = price
+        self.quantity = quantity
+        self.currency = currency
+        self.last_updated = last_updated
+        self.percentage_of_total = percentage_of_total
+        self.extra = extra
+        self.key_order = key_order
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        由 portfolio.json 中的一筆持股建立 Holding
+
+        Args:
+            data (dict): 持股資料
+
+        Returns:
+            Holding: 持股
+        """
+        extra = {key: value for key, value in data.items() if key not in FIELD_ATTRIBUTES}
+        return cls(
+            name=data['name'],
+            price=data['price'],
+            quantity=data['quantity'],
+            currency=data['currency'],
+            last_updated=data.get('lastUpdated'),
+            percentage_of_total=data.get('percentageOfTotal'),
+            extra=extra or None,
+            key_order=_intern_key_order(data),
+        )
+
+    def to_dict(self):
+        """轉回 portfolio.json 的持股格式（保留原本的欄位順序與未知欄位）"""
+        key_order = self.key_order or tuple(FIELD_ATTRIBUTES)
+        result = {}
+        for key in key_order:
+            value = self._field(key)
+            if value is not _MISSING:
+                result[key] = value
+        # 原始資料沒有、之後才設定的欄位（例如首次計算的佔比）附加在後面
+        for key, attribute in FIELD_ATTRIBUTES.items():
+            if key not in result and getattr(self, attribute) is not None:
+                result[key] = getattr(self, attribute)
+        if self.extra:
+            for key, value in self.extra.items():
+                result.setdefault(key, value)
+        return result
+
+    def _field(self, key):
+        attribute = FIELD_ATTRIBUTES.get(key)
+        if attribute is not None:
+            return getattr(self, attribute)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        return _MISSING
+
+    def __eq__(self, other):
+        if not isinstance(other, Holding):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Holding({self.name!r}, price={self.price!r}, quantity={self.quantity!r}, currency={self.currency!r})"
+
+
+def as_holding(stock):
+    """Holding 原樣回傳；portfolio.json 格式的持股 dict 轉為 Holding"""
+    return stock if isinstance(stock, Holding) else Holding.from_dict(stock)
+
+
+def load_holdings(stocks):
+    """將持股 dict 清單轉為 Holding 清單"""
+    return [as_holding(stock) for stock in stocks]
+
+
+def dump_holdings(holdings):
+    """將 Holding 清單轉回持股 dict 清單"""
+    return [holding.to_dict() if isinstance(holding, Holding) else dict(holding) for holding in holdings]
+
+
+def load_portfolio_document(document):
+    """將 portfolio.json 內容中的 stocks 轉為 Holding 清單（其他欄位維持原樣）"""
+    portfolio = dict(document)
+    portfolio['stocks'] = load_holdings(document.get('stocks', []))
+    return portfolio
+
+
+def dump_portfolio_document(portfolio):
+    """將投資組合轉回可直接寫入 portfolio.json 的格式"""
+    document = dict(portfolio)
+    document['stocks'] = dump_holdings(portfolio.get('stocks', []))
+    return document
@@ -1,6 +1,6 @@
 # src/stock_tracker/portfolio/portfolio_manager.py
+import asyncio
 import json
-from copy import deepcopy
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
@@ -10,6 +10,9 @@ from prettytable import PrettyTable, PLAIN_COLUMNS
 
 from ..scraper.exchange_rate_scraper import ExchangeRateService
 from ..providers.market_data import ExchangeRateFailure, MarketDataService, PriceFailure
+from ..providers.price_history import get_default_price_history
+from ..providers.quote_cache import CachedMarketDataService
+from ..providers.transport import HttpTransport
 from ..utils.market_utils import (
     should_update_price,
     get_market_from_symbol,
@@ -17,6 +20,10 @@ from ..utils.market_utils import (
     is_market_open
 )
 from ..utils.time_utils import get_current_timestamp
+from .change_set import PortfolioChangeSet
+from .history_store import HistoryStore
+from .holdings import dump_portfolio_document, load_portfolio_document
+from .valuation import PortfolioValuation, fx_rates_from_portfolio
 
 logger = logging.getLogger(__name__)
 HISTORY_FILENAME = "portfolio-history.json"
@@ -36,6 +43,9 @@ class PortfolioManager:
         force_update=False,
         price_service=None,
         exchange_rate_service=None,
+        transport=None,
+        price_history=None,
+        history_path=None,
     ):
         """初始化投資組合管理器
         
@@ -43,18 +53,84 @@ class PortfolioManager:
             file_path (str): 投資組合文件路徑
             gist_manager: Gist管理器實例
             force_update (bool): 是否強制更新所有價格，不考慮更新時間限制
+            transport: 共用 HTTP 傳輸層；未提供時由管理器建立並負責關閉
+            price_history: 價格與匯率的時間序列；預設為共用的 SQLite 資料庫（預設的報價服務也寫入同一份）
+            history_path: 歷史紀錄檔案路徑；預設為投資組合檔案旁的 portfolio-history.json
         """
         self.file_path = file_path
+        self.history_path = history_path
         self.gist_manager = gist_manager
         self.force_update = force_update
-        self.price_service = price_service or MarketDataService()
-        self.exchange_rate_service = exchange_rate_service or ExchangeRateService()
+        self._owns_transport = transport is None
+        self.transport = transport or HttpTransport()
+        self.price_history = price_history or get_default_price_history()
+        self.price_service = price_service or CachedMarketDataService(
+            MarketDataService(transport=self.transport, stream=True, hedge=True),
+            bypass=force_update,
+            price_history=self.price_history,
+        )
+        self.exchange_rate_service = exchange_rate_service or ExchangeRateService(transport=self.transport)
+        if getattr(self.gist_manager, "transport", False) is None:
+            self.gist_manager.transport = self.transport
         self.portfolio = None
+        self._valuation = None
+        self._valuation_stocks = None
+        self._changes = None
+        self._history_store = None
+        self._compaction = None
     
     async def initialize(self):
         """非同步初始化方法"""
-        self.portfolio = await self._load_portfolio()
+        self.portfolio = load_portfolio_document(await self._load_portfolio())
         return self
+
+    async def aclose(self):
+        """寫回尚未壓縮的歷史，並釋放管理器持有的 HTTP 連線池"""
+        await self.flush_history()
+        for host, stats in self.transport.rate_limit_stats().items():
+            if stats["throttled"]:
+                logger.info(
+                    "Rate limit on %s delayed %d/%d requests, %.2fs total (max %.2fs)",
+                    host,
+                    stats["throttled"],
+                    stats["requests"],
+                    stats["wait_seconds"],
+                    stats["max_wait"],
+                )
+        if self._owns_transport:
+            await self.transport.aclose()
+
+    async def wait_for_history(self):
+        """等待背景的歷史壓縮完成；失敗時只記錄警告，紀錄段仍保有所有更新"""
+        compaction, self._compaction = self._compaction, None
+        if compaction is None:
+            return
+        try:
+            await compaction
+        except Exception as e:
+            logger.warning(f"壓縮本地歷史檔案失敗: {str(e)}")
+
+    async def flush_history(self):
+        """
+        等待背景壓縮完成，再把尚未壓縮的更新寫回 portfolio-history.json
+
+        執行期間的壓縮依 HISTORY_COMPACT_EVERY 節流；結束時一律寫回，
+        每次執行後直接讀取 {"updatedAt", "values"} 檔案的程式仍看到最新內容。
+        """
+        await self.wait_for_history()
+        store = self._history_store
+        if store is None or not store.has_pending():
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, store.compact, True)
+        except Exception as e:
+            logger.warning(f"壓縮本地歷史檔案失敗: {str(e)}")
+
+    async def __aenter__(self):
+        return await self.initialize()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
         
     async def _load_portfolio(self):
         """優先從 Gist 讀取，如果失敗則從本地讀取"""
@@ -86,61 +162,104 @@ class PortfolioManager:
             logger.error(f"讀取本地檔案失敗: {str(e)}")
             raise FileNotFoundError(f"無法讀取投資組合資料: {str(e)}")
             
-    async def _save_portfolio(self, update_history=False):
-        """保存到本地文件和 Gist"""
+    async def _save_portfolio(self, update_history=False, history_base=None):
+        """
+        保存到本地文件和 Gist
+
+        Args:
+            update_history (bool): 是否同時寫入當日歷史紀錄
+            history_base: 預先讀取中的歷史資料（Task）；未提供時於此處讀取
+        """
         try:
             history_data = None
             if update_history:
-                history_data = await self._build_history_data()
-
-            # 更新本地檔案
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.portfolio, f, indent=2, ensure_ascii=False)
-            logger.info("已更新本地投資組合檔案")
-            if history_data is not None:
-                self._save_local_history(history_data)
-            
+                history_data = await self._build_history_data(history_base)
+                self._schedule_compaction()
+
+            document = dump_portfolio_document(self.portfolio)
+
+            # 本地檔案寫入在背景執行緒進行，與 Gist 更新同時進行
+            local_write = asyncio.get_running_loop().run_in_executor(
+                None, self._write_local_files, document
+            )
+
             # 更新 Gist（如果有設定）
             if self.gist_manager:
-                success = await self.gist_manager.update_portfolio(self.portfolio, history_data=history_data)
+                results = await asyncio.gather(
+                    local_write,
+                    self.gist_manager.update_portfolio(document, history_data=history_data),
+                    return_exceptions=True,
+                )
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
+                success = results[1]
                 if success:
                     logger.info("已更新 Gist 投資組合")
                     # 建立備份
-                    await self.gist_manager.create_backup(self.portfolio)
+                    await self.gist_manager.create_backup(document)
                     logger.info("已建立 Gist 備份")
                 else:
                     logger.error("更新 Gist 失敗")
                     raise RuntimeError("更新 Gist 失敗")
-                    
+            else:
+                await local_write
+
         except Exception as e:
             logger.error(f"儲存投資組合失敗: {str(e)}")
             raise
 
-    async def _build_history_data(self):
-        if self.gist_manager and hasattr(self.gist_manager, "read_history"):
-            history_data = await self.gist_manager.read_history()
-            if isinstance(history_data, dict) and not history_data.get("values"):
-                local_history = self._load_local_history()
-                if local_history.get("values"):
-                    history_data = local_history
-        else:
-            history_data = self._load_local_history()
+    def _write_local_files(self, document):
+        with open(self.file_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+        logger.info("已更新本地投資組合檔案")
 
-        if not isinstance(history_data, dict):
-            history_data = {"values": []}
+    def _schedule_compaction(self):
+        """
+        紀錄段累積足夠更新時在背景執行緒壓縮歷史
 
-        entry = self._current_history_entry()
-        values = [
-            value for value in history_data.get("values", [])
-            if isinstance(value, dict) and value.get("date") != entry["date"]
-        ]
-        values.append(entry)
-        values.sort(key=lambda value: value.get("date", ""))
+        儲存流程不等待壓縮完成（歷史更新已追加到紀錄段，Gist 上傳使用記憶體中的內容）；
+        aclose() 時才等待，前一次壓縮仍在進行時不重複排程。
+        """
+        store = self._history_store
+        if store is None or not store.needs_compaction():
+            return
+        if self._compaction is not None and not self._compaction.done():
+            return
+        self._compaction = asyncio.get_running_loop().run_in_executor(None, store.compact)
+
+    async def _build_history_data(self, history_base=None):
+        gist_history = await history_base if history_base is not None else await self._read_history_base()
+        store = self._get_history_store()
+
+        # Gist 上的歷史為準：與本地索引版本不同時（例如 CI 的全新環境）才整份重建
+        if isinstance(gist_history, dict) and gist_history.get("values") and not store.matches(gist_history):
+            store.replace(gist_history)
 
-        updated_history = deepcopy(history_data)
-        updated_history["updatedAt"] = entry["sourceUpdatedAt"]
-        updated_history["values"] = values
-        return updated_history
+        store.upsert(self._current_history_entry())
+        return store.export()
+
+    async def _read_history_base(self):
+        """
+        讀取 Gist 上的歷史紀錄，同時在背景載入本地歷史索引
+
+        Returns:
+            dict | None: Gist 歷史；沒有 Gist 時為 None（使用本地歷史索引）
+        """
+        loop = asyncio.get_running_loop()
+        local_store = loop.run_in_executor(None, self._get_history_store)
+        history_data = None
+        try:
+            if self.gist_manager and hasattr(self.gist_manager, "read_history"):
+                history_data = await self.gist_manager.read_history()
+        finally:
+            await local_store
+        return history_data
+
+    def _get_history_store(self):
+        if self._history_store is None:
+            self._history_store = HistoryStore(self._history_file_path())
+        return self._history_store
 
     def _current_history_entry(self):
         retrieved_at = self.portfolio.get("updateStatus", {}).get("retrieved_at") or get_current_timestamp()
@@ -161,28 +280,18 @@ class PortfolioManager:
             return str(timestamp)[:10]
 
     def _history_file_path(self):
+        if self.history_path is not None:
+            return Path(self.history_path)
         return Path(self.file_path).with_name(HISTORY_FILENAME)
 
-    def _load_local_history(self):
-        history_path = self._history_file_path()
-        if not history_path.exists():
-            return {"values": []}
-        with open(history_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-
-    def _save_local_history(self, history_data):
-        with open(self._history_file_path(), "w", encoding="utf-8") as f:
-            json.dump(history_data, f, indent=2, ensure_ascii=False)
-        logger.info("已更新本地投資組合歷史檔案")
-    
     async def update_exchange_rate(self):
         """更新匯率"""
         try:
             new_rate = await self.exchange_rate_service.get_rate('USD-TWD')
             if isinstance(new_rate, ExchangeRateFailure):
                 raise new_rate
-            self.portfolio['exchange rate'] = f"{new_rate:.2f}"
-            self.portfolio['exchange_rate_updated'] = get_current_timestamp()
+            self._set_field(self.portfolio, 'exchange rate', f"{new_rate:.2f}")
+            self._set_field(self.portfolio, 'exchange_rate_updated', get_current_timestamp())
             print(f"已更新匯率: {new_rate:.2f} TWD/USD")
             return {
                 "status": "success",
@@ -206,73 +315,149 @@ class PortfolioManager:
                 "updatedAt": old_updated,
             }
     
+    def _set_field(self, container, key, value):
+        """修改投資組合欄位；更新進行中時記錄到交易紀錄以便回滾"""
+        if self._changes is not None:
+            self._changes.set(container, key, value)
+        else:
+            container[key] = value
+
     def _calculate_total_value(self):
         """計算投資組合總值"""
-        total_value_twd = 0
-        exchange_rate = float(self.portfolio['exchange rate'])
-        
-        for stock in self.portfolio['stocks']:
-            value_twd = stock['price'] * stock['quantity']
-            if stock['currency'] == 'USD':
-                value_twd *= exchange_rate
-            total_value_twd += value_twd
-        
-        return total_value_twd
+        return self._get_valuation().total
+
+    def _get_valuation(self):
+        """
+        取得目前投資組合的估值狀態
+
+        估值狀態跨呼叫保留，價格與匯率變動只套用差額；持股清單被替換（例如回滾）時重新建立。
+        """
+        stocks = self.portfolio['stocks']
+        if (
+            self._valuation is None
+            or self._valuation_stocks is not stocks
+            or len(stocks) != len(self._valuation.symbols)
+        ):
+            self._valuation = PortfolioValuation.from_portfolio(self.portfolio)
+            self._valuation_stocks = stocks
+        else:
+            self._valuation.apply_fx(fx_rates_from_portfolio(self.portfolio))
+        return self._valuation
             
-    async def update_prices(self):
-        """更新所有價格"""
+    async def update_prices(self, symbols_to_update=None):
+        """
+        更新所有價格
+
+        Args:
+            symbols_to_update (list): 要更新的股票代號；預設依交易時間計算。
+                批次更新時沿用預先抓取報價時的清單，避免兩次計算之間跨過交易時段邊界
+        """
         if self.portfolio is None:
             await self.initialize()
 
-        original_portfolio = deepcopy(self.portfolio)
-        exchange_status = await self.update_exchange_rate()
+        self._changes = PortfolioChangeSet(self.portfolio)
 
-        symbols_to_update = []
+        if symbols_to_update is None:
+            symbols_to_update = self.symbols_to_update()
         market_status = {}
 
         for stock in self.portfolio['stocks']:
-            market = get_market_from_symbol(stock['name'])
-            if should_update_price(stock['name'], stock.get('lastUpdated'), self.force_update):
-                symbols_to_update.append(stock['name'])
+            market = get_market_from_symbol(stock.name)
             if market not in market_status:
                 market_status[market] = is_market_open(market)
 
-        self._print_market_status(market_status)
+        # 匯率、報價與歷史紀錄讀取互不相依：同時發出，整體耗時取決於最慢的一項
+        exchange_task = asyncio.ensure_future(self.update_exchange_rate())
+        price_task = None
+        history_task = None
+        if symbols_to_update:
+            price_task = asyncio.ensure_future(self.price_service.get_prices(symbols_to_update))
+            history_task = asyncio.ensure_future(self._read_history_base())
 
-        if not symbols_to_update:
-            if self.force_update:
-                print("\n強制更新已啟用，但沒有需要更新的股票")
-            else:
-                print("\n股票價格更新狀態:")
-                print("- 美股已收盤，使用最新收盤價")
-                print("- 台股無需更新")
-            self._update_portfolio_calculations()
-            return UpdateResult(status="success", updated_symbols=[], failed_symbols=[])
+        try:
+            exchange_status = await exchange_task
+            self._print_market_status(market_status)
+
+            if not symbols_to_update:
+                if self.force_update:
+                    print("\n強制更新已啟用，但沒有需要更新的股票")
+                else:
+                    print("\n股票價格更新狀態:")
+                    print("- 美股已收盤，使用最新收盤價")
+                    print("- 台股無需更新")
+                self._update_portfolio_calculations()
+                return UpdateResult(status="success", updated_symbols=[], failed_symbols=[])
+
+            batch = await price_task
+            return await self._apply_price_batch(
+                symbols_to_update, batch, exchange_status, history_task
+            )
+        finally:
+            if self._changes is not None:
+                self._changes.commit()
+                self._changes = None
+            for task in (exchange_task, price_task, history_task):
+                if task is not None and not task.done():
+                    task.cancel()
+            if history_task is not None and history_task.done() and not history_task.cancelled():
+                # 未使用的預讀結果若失敗，避免 "exception was never retrieved" 警告
+                history_task.exception()
+
+    async def _record_exchange_rate(self, exchange_status):
+        """
+        在背景執行緒寫入本次取得的匯率；寫入失敗不影響更新結果
+
+        各股票的報價由報價服務（CachedMarketDataService）在抓取時寫入價格歷史。
+        """
+        if exchange_status.get("status") != "success":
+            return
+
+        def record():
+            self.price_history.record_fx("USD-TWD", float(exchange_status["rate"]), exchange_status["updatedAt"])
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, record)
+        except Exception as e:
+            logger.warning(f"寫入價格歷史失敗: {str(e)}")
+
+    def symbols_to_update(self):
+        """依交易時間與最後更新時間，列出本次需要更新價格的股票代號"""
+        return [
+            stock.name
+            for stock in self.portfolio['stocks']
+            if should_update_price(stock.name, stock.last_updated, self.force_update)
+        ]
 
-        batch = await self.price_service.get_prices(symbols_to_update)
+    async def _apply_price_batch(self, symbols_to_update, batch, exchange_status, history_task):
         failures = self._ordered_failures(symbols_to_update, batch)
 
         update_count = 0
         us_stocks_count = 0
         local_stocks_count = 0
         updated_symbols = []
+        valuation = self._get_valuation()
 
         for stock in self.portfolio['stocks']:
-            if stock['name'] in batch.prices:
-                price_info = batch.prices[stock['name']]
-                stock['price'] = price_info.price
-                stock['lastUpdated'] = price_info.retrieved_at
+            price_info = batch.prices.get(stock.name)
+            if price_info is not None:
+                self._set_field(stock, 'price', price_info.price)
+                self._set_field(stock, 'last_updated', price_info.retrieved_at)
                 update_count += 1
-                updated_symbols.append(stock['name'])
+                updated_symbols.append(stock.name)
 
-                market = get_market_from_symbol(stock['name'])
+                market = get_market_from_symbol(stock.name)
                 if market in ['NASDAQ', 'NYSE', 'NYSEARCA']:
                     us_stocks_count += 1
                 else:
                     local_stocks_count += 1
 
+        # 只有本次取得報價的持股需要重新估值
+        valuation.apply_prices(batch.prices)
+
         if update_count == 0:
-            self.portfolio = original_portfolio
+            # 回滾本次修改過的欄位（包含匯率），估值狀態隨之重建
+            self._changes.rollback()
+            self._valuation = None
             self.portfolio["updateStatus"] = self._build_update_status(
                 status="failed",
                 updated_symbols=[],
@@ -295,8 +480,14 @@ class PortfolioManager:
             failures=failures,
             exchange_status=exchange_status,
         )
-        await self._save_portfolio(update_history=status == "success")
-        self._print_update_statistics(us_stocks_count, local_stocks_count, original_portfolio)
+        await asyncio.gather(
+            self._save_portfolio(
+                update_history=status == "success",
+                history_base=history_task if status == "success" else None,
+            ),
+            self._record_exchange_rate(exchange_status),
+        )
+        self._print_update_statistics(us_stocks_count, local_stocks_count, self._changes.old_total)
 
         return UpdateResult(
             status=status,
@@ -342,7 +533,8 @@ class PortfolioManager:
 
     def _update_portfolio_calculations(self):
         """更新投資組合計算"""
-        total_value_twd = self._calculate_total_value()
+        valuation = self._get_valuation()
+        total_value_twd = valuation.total
         old_total = self.portfolio['totalValue']
 
         if abs(total_value_twd - old_total) > 0.01:
@@ -351,15 +543,9 @@ class PortfolioManager:
             print(f"- 新總值: TWD {total_value_twd:,.2f}")
 
         self.portfolio['totalValue'] = total_value_twd
-        exchange_rate = float(self.portfolio['exchange rate'])
+        valuation.apply_percentages(self.portfolio['stocks'])
 
-        for stock in self.portfolio['stocks']:
-            value_twd = stock['price'] * stock['quantity']
-            if stock['currency'] == 'USD':
-                value_twd *= exchange_rate
-            stock['percentageOfTotal'] = round((value_twd / total_value_twd) * 100, 2)
-
-    def _print_update_statistics(self, us_stocks_count, local_stocks_count, original_portfolio):
+    def _print_update_statistics(self, us_stocks_count, local_stocks_count, old_total):
         if us_stocks_count <= 0 and local_stocks_count <= 0:
             return
 
@@ -370,17 +556,17 @@ class PortfolioManager:
             print(f"- 更新了 {local_stocks_count} 支台股價格")
         print(
             f"- 投資組合總值變動: "
-            f"TWD {original_portfolio['totalValue']:,.2f} → TWD {self.portfolio['totalValue']:,.2f}"
+            f"TWD {old_total:,.2f} → TWD {self.portfolio['totalValue']:,.2f}"
         )
 
         print("\n投資佔比統計:")
         sorted_stocks = sorted(
             self.portfolio['stocks'],
-            key=lambda x: x['percentageOfTotal'],
+            key=lambda x: x.percentage_of_total,
             reverse=True,
         )
         for stock in sorted_stocks:
-            print(f"- {stock['name']}: {stock['percentageOfTotal']}%")
+            print(f"- {stock.name}: {stock.percentage_of_total}%")
     
     def _print_market_status(self, market_status):
         """打印市場狀態"""
@@ -421,19 +607,15 @@ class PortfolioManager:
 
         table.border = False
         
-        exchange_rate = float(self.portfolio['exchange rate'])
-        for stock in self.portfolio['stocks']:
-            value_twd = stock['price'] * stock['quantity']
-            if stock['currency'] == 'USD':
-                value_twd *= exchange_rate
-            
+        valuation = self._get_valuation()
+        for stock, value_twd in zip(self.portfolio['stocks'], valuation.values_twd.tolist()):
             table.add_row([
-                stock['name'],
-                f"{stock['currency']} {stock['price']:.2f}",
-                f"{stock['quantity']:,.2f}",
+                stock.name,
+                f"{stock.currency} {stock.price:.2f}",
+                f"{stock.quantity:,.2f}",
                 f"TWD {value_twd:,.2f}",
-                f"{stock['percentageOfTotal']:.2f}%",
-                stock['lastUpdated']
+                f"{stock.percentage_of_total:.2f}%",
+                stock.last_updated
             ])
         
         table_width = len(table.get_string().split('\n')[0])
@@ -466,21 +648,14 @@ class PortfolioManager:
             }
         }
         
-        exchange_rate = float(self.portfolio['exchange rate'])
-        
-        for stock in self.portfolio['stocks']:
-            currency = stock['currency']
-            value = stock['price'] * stock['quantity']
-            
-            if currency == 'USD':
-                summary['holdings']['USD']['total'] += value
-                summary['holdings']['USD']['count'] += 1
-            else:
-                summary['holdings']['TWD']['total'] += value
-                summary['holdings']['TWD']['count'] += 1
+        # 美股以外的持股（台股等）以原幣值合計於 TWD
+        for currency, subtotal in self._get_valuation().currency_breakdown().items():
+            bucket = summary['holdings']['USD' if currency == 'USD' else 'TWD']
+            bucket['total'] += subtotal['total']
+            bucket['count'] += subtotal['count']
         
         # 轉換美股總值為台幣
-        usd_in_twd = summary['holdings']['USD']['total'] * exchange_rate
+        usd_in_twd = summary['holdings']['USD']['total'] * float(self.portfolio['exchange rate'])
         summary['holdings']['USD']['total_twd'] = usd_in_twd
         
         # 計算幣別佔比
@@ -492,6 +667,10 @@ class PortfolioManager:
         return summary
 
     def generate_charts(self, output_dir='plots'):
-        """生成圖表"""
-        from ..utils.plot_utils import create_portfolio_plots
-        create_portfolio_plots(self.portfolio, output_dir)
+        """生成圖表；有歷史紀錄時另外生成總值走勢圖（依點數上限自動選擇解析度）"""
+        from ..utils.plot_utils import create_history_plot, create_portfolio_plots
+        charts = create_portfolio_plots(dump_portfolio_document(self.portfolio), output_dir)
+        resolution, bars = self._get_history_store().series()
+        if bars:
+            charts['portfolio_history'] = create_history_plot(bars, resolution, output_dir)
+        return charts
@@ -0,0 +1,221 @@
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+# 由細到粗排列；查詢時依序嘗試，取第一個符合點數上限的解析度。
+# 歷史每天只保留一個資料點（當日收盤），daily 即為最細的解析度
+RESOLUTIONS = ("daily", "weekly", "monthly")
+RESOLUTION_LABELS = {"daily": "日", "weekly": "週", "monthly": "月"}
+
+
+def is_iso_date(day):
+    """是否為可解析的 ISO 日期（YYYY-MM-DD，可帶時間）"""
+    try:
+        date.fromisoformat(day[:10])
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def bucket_start(day, resolution):
+    """ISO 日期所屬期間的第一天（weekly 為星期一，monthly 為每月 1 日）"""
+    if resolution == "daily":
+        return day
+    parsed = date.fromisoformat(day[:10])
+    if resolution == "weekly":
+        return (parsed - timedelta(days=parsed.weekday())).isoformat()
+    if resolution == "monthly":
+        return parsed.replace(day=1).isoformat()
+    raise ValueError(f"不支援的解析度: {resolution}（可用: {', '.join(RESOLUTIONS)}）")
+
+
+def pick_resolution(count, max_points):
+    """
+    由細到粗選出第一個點數不超過 max_points 的解析度
+
+    Args:
+        count: resolution -> 區間內的點數（只在需要時呼叫）
+        max_points (int): 點數上限
+
+    Returns:
+        str: 解析度；monthly 仍超過上限時回傳 monthly
+    """
+    for resolution in RESOLUTIONS:
+        if resolution == RESOLUTIONS[-1] or count(resolution) <= max_points:
+            return resolution
+
+
+def bucket_end(day, resolution):
+    """ISO 日期所屬期間的最後一天"""
+    start = date.fromisoformat(bucket_start(day, resolution))
+    if resolution == "daily":
+        return start.isoformat()
+    if resolution == "weekly":
+        return (start + timedelta(days=6)).isoformat()
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return (next_month - timedelta(days=1)).isoformat()
+
+
+class RollupBar:
+    """一個期間的 OHLC（以期間第一天為 period，close_date 為收盤資料點的日期）"""
+
+    __slots__ = ('period', 'open', 'high', 'low', 'close', 'count', 'close_date')
+
+    def __init__(self, period, open, high, low, close, count, close_date=None):
+        self.period = period
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.count = count
+        self.close_date = close_date or period
+
+    @classmethod
+    def from_values(cls, period, values, close_date=None):
+        return cls(period, values[0], max(values), min(values), values[-1], len(values), close_date)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def to_row(self):
+        """寫入 rollups.json 用的精簡格式"""
+        return [self.period, self.open, self.high, self.low, self.close, self.count, self.close_date]
+
+    def to_dict(self):
+        return {
+            'period': self.period,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'count': self.count,
+            'close_date': self.close_date,
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, RollupBar):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return (
+            f"RollupBar({self.period!r}, open={self.open!r}, high={self.high!r}, low={self.low!r}, "
+            f"close={self.close!r}, close_date={self.close_date!r})"
+        )
+
+
+class HistoryRollups:
+    """
+    依期間彙總的 OHLC（weekly、monthly），每個解析度以期間起始日排序
+
+    新增或修改一個資料點時只重新計算該點所在的期間（以 bisect 找出期間內的資料點），
+    不需重算整份歷史；daily 解析度直接使用原始資料點（每日收盤）。
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._bars = {}
+        self.clear()
+
+    def clear(self):
+        for resolution in RESOLUTIONS[1:]:
+            self._keys[resolution] = []
+            self._bars[resolution] = []
+
+    def rebuild(self, dates, values):
+        """
+        由排序後的資料點重建所有彙總（單次掃描）；日期無法解析的資料點不列入彙總
+
+        Args:
+            dates (list[str]): 依日期排序的 ISO 日期
+            values (list[float | None]): 對應的數值；None 表示該點沒有數值
+        """
+        self.clear()
+        valid = [is_iso_date(day) for day in dates]
+        skipped = sum(1 for day, ok in zip(dates, valid) if day and not ok)
+        if skipped:
+            logger.warning("略過 %d 筆日期格式錯誤的歷史紀錄", skipped)
+        for resolution in RESOLUTIONS[1:]:
+            keys = self._keys[resolution]
+            bars = self._bars[resolution]
+            current = None
+            last_day = None
+            bucket_values = []
+            for day, value, ok in zip(dates, values, valid):
+                if value is None or not ok:
+                    continue
+                key = bucket_start(day, resolution)
+                if key != current:
+                    if bucket_values:
+                        keys.append(current)
+                        bars.append(RollupBar.from_values(current, bucket_values, last_day))
+                    current = key
+                    bucket_values = []
+                bucket_values.append(value)
+                last_day = day
+            if bucket_values:
+                keys.append(current)
+                bars.append(RollupBar.from_values(current, bucket_values, last_day))
+
+    def refresh(self, day, dates, values):
+        """
+        重新計算 day 所在的各期間
+
+        Args:
+            day (str): 新增或修改的資料點日期
+            dates, values: 與 rebuild 相同的完整排序資料（只會讀取該期間的切片）
+        """
+        if not is_iso_date(day):
+            logger.warning("略過日期格式錯誤的歷史紀錄: %r", day)
+            return
+        for resolution in RESOLUTIONS[1:]:
+            key = bucket_start(day, resolution)
+            low = bisect_left(dates, key)
+            high = bisect_right(dates, bucket_end(day, resolution))
+            points = [(point, value) for point, value in zip(dates[low:high], values[low:high]) if value is not None]
+            bucket_values = [value for _, value in points]
+
+            keys = self._keys[resolution]
+            bars = self._bars[resolution]
+            index = bisect_left(keys, key)
+            exists = index < len(keys) and keys[index] == key
+            if not bucket_values:
+                if exists:
+                    del keys[index]
+                    del bars[index]
+            elif exists:
+                bars[index] = RollupBar.from_values(key, bucket_values, points[-1][0])
+            else:
+                keys.insert(index, key)
+                bars.insert(index, RollupBar.from_values(key, bucket_values, points[-1][0]))
+
+    def bounds(self, resolution, start=None, end=None):
+        """與 start ~ end 重疊的期間在彙總中的索引範圍"""
+        keys = self._keys[resolution]
+        low = 0 if start is None else bisect_left(keys, bucket_start(start, resolution))
+        high = len(keys) if end is None else bisect_right(keys, end)
+        return low, max(low, high)
+
+    def bars(self, resolution, start=None, end=None):
+        low, high = self.bounds(resolution, start, end)
+        return self._bars[resolution][low:high]
+
+    def to_document(self, **meta):
+        """轉為 rollups.json 的內容；meta 記錄建立彙總時的歷史版本（updatedAt、points）"""
+        document = dict(meta)
+        for resolution in RESOLUTIONS[1:]:
+            document[resolution] = [bar.to_row() for bar in self._bars[resolution]]
+        return document
+
+    @classmethod
+    def from_document(cls, document):
+        """由 to_document() 的內容還原，不需重新掃描原始資料點"""
+        rollups = cls()
+        for resolution in RESOLUTIONS[1:]:
+            bars = [RollupBar.from_row(row) for row in document.get(resolution) or []]
+            rollups._bars[resolution] = bars
+            rollups._keys[resolution] = [bar.period for bar in bars]
+        return rollups
@@ -0,0 +1,173 @@
+import numpy as np
+
+from ..constants import VALUATION_RESYNC_INTERVAL
+from .holdings import Holding, as_holding
+
+BASE_CURRENCY = "TWD"
+
+
+def fx_rates_from_portfolio(portfolio):
+    """由投資組合資料取得各幣別兌台幣匯率（目前只有 USD 有匯率欄位，其餘幣別視為 1）"""
+    return {"USD": float(portfolio['exchange rate'])}
+
+
+class PortfolioValuation:
+    """
+    欄式（columnar）投資組合估值引擎
+
+    將持股拆成價格、數量與幣別索引三個陣列，搭配一個依幣別排列的匯率向量，
+    一次向量化運算即可得到每筆持股的台幣價值、總值、佔比與各幣別小計。
+
+    估值狀態會保留每筆持股的台幣價值與總值；部分價格或匯率變動時只套用差額
+    （apply_prices / apply_fx），佔比則在需要時才重新正規化。
+    """
+
+    def __init__(self, symbols, prices, quantities, currency_index, currencies, fx_rates=None):
+        self.symbols = list(symbols)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.quantities = np.asarray(quantities, dtype=np.float64)
+        self.currency_index = np.asarray(currency_index, dtype=np.intp)
+        self.currencies = tuple(currencies)
+        self.positions = {}
+        for position, symbol in enumerate(self.symbols):
+            self.positions.setdefault(symbol, []).append(position)
+        self.fx = np.array(
+            [1.0 if currency == BASE_CURRENCY else float((fx_rates or {}).get(currency, 1.0))
+             for currency in self.currencies],
+            dtype=np.float64,
+        )
+        self.revalue()
+
+    @classmethod
+    def from_stocks(cls, stocks, fx_rates=None):
+        """
+        由持股清單建立估值
+
+        Args:
+            stocks: Holding 清單或 portfolio.json 中 stocks 格式的 dict 清單
+            fx_rates (dict): 幣別 -> 台幣匯率；未列出的幣別以 1 計算
+
+        Returns:
+            PortfolioValuation: 估值結果
+        """
+        count = len(stocks)
+        prices = np.empty(count, dtype=np.float64)
+        quantities = np.empty(count, dtype=np.float64)
+        currency_index = np.empty(count, dtype=np.intp)
+        currencies = {}
+        symbols = []
+        for position, stock in enumerate(stocks):
+            stock = as_holding(stock)
+            symbols.append(stock.name)
+            prices[position] = stock.price
+            quantities[position] = stock.quantity
+            currency_index[position] = currencies.setdefault(stock.currency, len(currencies))
+        return cls(symbols, prices, quantities, currency_index, currencies, fx_rates)
+
+    @classmethod
+    def from_portfolio(cls, portfolio):
+        return cls.from_stocks(portfolio['stocks'], fx_rates_from_portfolio(portfolio))
+
+    def revalue(self):
+        """重新計算所有持股的原幣價值、台幣價值與總值"""
+        self.native_values = self.prices * self.quantities
+        self.values_twd = self.native_values * self.fx[self.currency_index]
+        self.total = float(self.values_twd.sum())
+        self.pending_deltas = 0
+        self._percentages = None
+        return self.total
+
+    def apply_prices(self, prices):
+        """
+        只針對價格有變動的持股套用差額
+
+        Args:
+            prices (dict): 股票代號 -> 新價格（或帶有 price 屬性的報價結果）
+
+        Returns:
+            float: 總值變動量（台幣）
+        """
+        changed = [
+            (position, getattr(price, 'price', price))
+            for symbol, price in prices.items()
+            for position in self.positions.get(symbol, ())
+        ]
+        if not changed:
+            return 0.0
+        index = np.fromiter((position for position, _ in changed), dtype=np.intp, count=len(changed))
+        self.prices[index] = [price for _, price in changed]
+        return self._apply_delta(index)
+
+    def apply_fx(self, fx_rates):
+        """
+        匯率變動時只重新估值該幣別的持股
+
+        Args:
+            fx_rates (dict): 幣別 -> 新的台幣匯率
+
+        Returns:
+            float: 總值變動量（台幣）
+        """
+        changed = [
+            index for index, currency in enumerate(self.currencies)
+            if currency in fx_rates and currency != BASE_CURRENCY and float(fx_rates[currency]) != self.fx[index]
+        ]
+        if not changed:
+            return 0.0
+        for index in changed:
+            self.fx[index] = float(fx_rates[self.currencies[index]])
+        return self._apply_delta(np.flatnonzero(np.isin(self.currency_index, changed)))
+
+    def _apply_delta(self, index):
+        native = self.prices[index] * self.quantities[index]
+        values = native * self.fx[self.currency_index[index]]
+        delta = float(values.sum() - self.values_twd[index].sum())
+        self.native_values[index] = native
+        self.values_twd[index] = values
+        self.total += delta
+        self._percentages = None
+        self.pending_deltas += 1
+        # 連續套用差額會累積浮點誤差，定期以完整加總校正總值
+        if self.pending_deltas >= VALUATION_RESYNC_INTERVAL:
+            self.total = float(self.values_twd.sum())
+            self.pending_deltas = 0
+        return delta
+
+    def percentages(self, total=None):
+        """各持股佔總值的百分比（未四捨五入；總值變動後才重新計算）"""
+        if total is not None and total != self.total:
+            return self.values_twd / total * 100 if total else np.zeros_like(self.values_twd)
+        if self._percentages is None:
+            if not self.total:
+                self._percentages = np.zeros_like(self.values_twd)
+            else:
+                self._percentages = self.values_twd / self.total * 100
+        return self._percentages
+
+    def apply_percentages(self, stocks, total=None):
+        """將佔比寫回持股清單的 percentageOfTotal（四捨五入到小數點後兩位）"""
+        for stock, percentage in zip(stocks, self.percentages(total).tolist()):
+            if isinstance(stock, Holding):
+                stock.percentage_of_total = round(percentage, 2)
+            else:
+                stock['percentageOfTotal'] = round(percentage, 2)
+
+    def currency_breakdown(self):
+        """
+        各幣別小計
+
+        Returns:
+            dict: 幣別 -> {'total': 原幣總值, 'count': 持股數, 'total_twd': 台幣總值}
+        """
+        size = len(self.currencies)
+        native = np.bincount(self.currency_index, weights=self.native_values, minlength=size)
+        twd = np.bincount(self.currency_index, weights=self.values_twd, minlength=size)
+        counts = np.bincount(self.currency_index, minlength=size)
+        return {
+            currency: {
+                'total': float(native[index]),
+                'count': int(counts[index]),
+                'total_twd': float(twd[index]),
+            }
+            for index, currency in enumerate(self.currencies)
+        }
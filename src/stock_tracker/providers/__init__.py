@@ -1,19 +1,49 @@
+from .circuit_breaker import CircuitBreakerRegistry, RetryBudget
+from .health import ProviderHealthTracker
 from .market_data import (
     ExchangeRateFailure,
     MarketDataService,
     PriceFailure,
     PriceResult,
     PriceUpdateBatch,
+    ProviderRouter,
+    TwseBatchQuoteProvider,
+    YahooBatchQuoteProvider,
     YahooFinanceProvider,
     YahooTaiwanProvider,
 )
+from .price_extraction import LayeredPriceExtractor, PriceExtraction
+from .price_history import SQLitePriceHistory, get_default_price_history
+from .quote_cache import CachedMarketDataService, QuoteCache, get_quote_service
+from .quote_store import SQLiteQuoteStore, get_default_quote_store
+from .rate_limiter import HostRateLimiter, TokenBucket
+from .transport import HttpTransport, get_default_transport
 
 __all__ = [
+    "CachedMarketDataService",
+    "CircuitBreakerRegistry",
     "ExchangeRateFailure",
+    "HostRateLimiter",
+    "HttpTransport",
+    "LayeredPriceExtractor",
     "MarketDataService",
     "PriceFailure",
+    "PriceExtraction",
     "PriceResult",
     "PriceUpdateBatch",
+    "ProviderHealthTracker",
+    "ProviderRouter",
+    "QuoteCache",
+    "RetryBudget",
+    "SQLitePriceHistory",
+    "SQLiteQuoteStore",
+    "TokenBucket",
+    "TwseBatchQuoteProvider",
+    "YahooBatchQuoteProvider",
     "YahooFinanceProvider",
     "YahooTaiwanProvider",
+    "get_default_price_history",
+    "get_default_quote_store",
+    "get_default_transport",
+    "get_quote_service",
 ]
@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from ..constants import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    CIRCUIT_STATE_PATH,
+    MAX_RETRIES,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    RETRY_BUDGET_MAX_TOKENS,
+    RETRY_BUDGET_RATIO,
+)
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """單一資料來源的斷路器：連續失敗達門檻即開路，冷卻後以單一探測請求半開"""
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = STATE_HALF_OPEN
+                self._probing = False
+            # 半開狀態一次只放行一個探測請求
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = STATE_CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """記錄一次失敗，回傳斷路器是否因此開路"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probing = False
+            if self.state == STATE_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                opened = self.state != STATE_OPEN
+                self.state = STATE_OPEN
+                self.opened_at = self.clock()
+                return opened
+            return False
+
+    def release(self) -> None:
+        """探測請求被取消時釋放名額，讓下一個請求可以重新探測"""
+        with self._lock:
+            self._probing = False
+
+    def to_dict(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "opened_at": self.opened_at,
+            }
+
+    def load(self, data: Dict[str, object]) -> None:
+        with self._lock:
+            state = data.get("state", STATE_CLOSED)
+            # 上次執行中斷在半開狀態時，視為仍在開路冷卻中
+            self.state = STATE_OPEN if state == STATE_HALF_OPEN else state
+            self.consecutive_failures = int(data.get("consecutive_failures", 0))
+            self.opened_at = data.get("opened_at")
+            if self.state == STATE_OPEN and self.opened_at is None:
+                self.opened_at = self.clock()
+
+
+class CircuitBreakerRegistry:
+    """依資料來源管理斷路器，並將狀態存成 JSON 讓排程的下一次執行沿用"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = Path(os.path.expanduser(path or os.getenv("CIRCUIT_STATE_PATH", CIRCUIT_STATE_PATH)))
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._saved: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            if key not in self._breakers:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout, self.clock)
+                if key in self._saved:
+                    breaker.load(self._saved[key])
+                self._breakers[key] = breaker
+            return self._breakers[key]
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        state = dict(self._saved)
+        state.update({key: breaker.to_dict() for key, breaker in breakers.items()})
+        return state
+
+    def save(self) -> None:
+        state = self.snapshot()
+        if state == self._saved:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            temp_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+            os.replace(temp_path, self.path)
+            self._saved = state
+        except OSError as exc:
+            logger.warning("Could not persist circuit breaker state to %s: %s", self.path, exc)
+
+    def _load(self) -> None:
+        try:
+            self._saved = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self._saved = {}
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable circuit breaker state %s: %s", self.path, exc)
+            self._saved = {}
+
+
+class RetryBudget:
+    """全域重試預算：每個請求存入少量額度，每次重試消耗一個，避免故障時重試放大整體執行時間"""
+
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        initial_tokens: float = MAX_RETRIES,
+        max_tokens: float = RETRY_BUDGET_MAX_TOKENS,
+        base_delay: float = RETRY_BACKOFF_BASE,
+        max_delay: float = RETRY_BACKOFF_MAX,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng
+        self.tokens = min(initial_tokens, max_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self, requests: int = 1) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + requests * self.ratio)
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def backoff(self, attempt: int) -> float:
+        """full jitter 指數退避：在 0 到 base * 2^(attempt-1) 之間隨機等待"""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** max(0, attempt - 1))
+        return ceiling * self.rng()
@@ -0,0 +1,188 @@
+import json
+import logging
+import math
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from ..constants import (
+    HEDGE_LATENCY_PERCENTILE,
+    PROVIDER_HEALTH_MIN_SAMPLES,
+    PROVIDER_HEALTH_PATH,
+    PROVIDER_HEALTH_WINDOW,
+    PROVIDER_MIN_SUCCESS_RATE,
+)
+
+logger = logging.getLogger(__name__)
+
+# 只有這些失敗原因代表資料來源本身有問題；查無股票等情況不影響健康度。
+PROVIDER_FAULT_REASONS = frozenset(
+    {"provider_http_error", "provider_parse_error", "provider_timeout"}
+)
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+class ProviderHealth:
+    """單一資料來源最近請求的延遲與成功率"""
+
+    def __init__(self, window: int = PROVIDER_HEALTH_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._per_symbol_costs = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, attempts: int = 0, faults: int = 0) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            if attempts:
+                self._per_symbol_costs.append(latency / attempts)
+                self._outcomes.append((attempts, faults))
+
+    def to_dict(self) -> Dict[str, list]:
+        with self._lock:
+            return {
+                "latencies": list(self._latencies),
+                "per_symbol_costs": list(self._per_symbol_costs),
+                "outcomes": [list(outcome) for outcome in self._outcomes],
+            }
+
+    def load(self, data: Dict[str, list]) -> None:
+        """載入前次執行保存的樣本（超過視窗大小的舊樣本會被捨棄）"""
+        with self._lock:
+            self._latencies.extend(float(value) for value in data.get("latencies", []))
+            self._per_symbol_costs.extend(float(value) for value in data.get("per_symbol_costs", []))
+            self._outcomes.extend((int(attempts), int(faults)) for attempts, faults in data.get("outcomes", []))
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    def success_rate(self) -> float:
+        with self._lock:
+            attempts = sum(count for count, _ in self._outcomes)
+            faults = sum(count for _, count in self._outcomes)
+        return 1.0 if not attempts else 1 - faults / attempts
+
+    def is_healthy(self, min_success_rate: float = PROVIDER_MIN_SUCCESS_RATE) -> bool:
+        if len(self._outcomes) < PROVIDER_HEALTH_MIN_SAMPLES:
+            return True
+        return self.success_rate() >= min_success_rate
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < PROVIDER_HEALTH_MIN_SAMPLES:
+                return None
+            return percentile(self._latencies, pct)
+
+    def cost_estimate(self) -> Optional[float]:
+        """每檔股票的中位延遲；批次來源會因一次處理多檔而較低"""
+        with self._lock:
+            if len(self._per_symbol_costs) < PROVIDER_HEALTH_MIN_SAMPLES:
+                return None
+            return percentile(self._per_symbol_costs, 50)
+
+
+class ProviderHealthTracker:
+    """
+    依資料來源追蹤最近請求的健康度，並將樣本存成 JSON 讓排程的下一次執行沿用
+
+    單次執行的請求數通常不足 PROVIDER_HEALTH_MIN_SAMPLES（批次來源一次請求處理多檔股票），
+    跨執行累積樣本後，依延遲排序與 p95 對沖才會生效。
+    """
+
+    def __init__(
+        self,
+        window: int = PROVIDER_HEALTH_WINDOW,
+        min_success_rate: float = PROVIDER_MIN_SUCCESS_RATE,
+        hedge_percentile: float = HEDGE_LATENCY_PERCENTILE,
+        path: Optional[str] = None,
+    ):
+        self.window = window
+        self.min_success_rate = min_success_rate
+        self.hedge_percentile = hedge_percentile
+        self.path = Path(os.path.expanduser(path or os.getenv("PROVIDER_HEALTH_PATH", PROVIDER_HEALTH_PATH)))
+        self._health: Dict[str, ProviderHealth] = {}
+        self._saved: Dict[str, Dict[str, list]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def health(self, provider) -> ProviderHealth:
+        with self._lock:
+            if provider.source not in self._health:
+                health = ProviderHealth(self.window)
+                if provider.source in self._saved:
+                    try:
+                        health.load(self._saved[provider.source])
+                    except (TypeError, ValueError) as exc:
+                        logger.warning("Ignoring unreadable health samples for %s: %s", provider.source, exc)
+                self._health[provider.source] = health
+            return self._health[provider.source]
+
+    def record(self, provider, latency: float, attempts: int = 0, faults: int = 0) -> None:
+        self.health(provider).record(latency, attempts, faults)
+
+    def hedge_delay(self, provider) -> Optional[float]:
+        return self.health(provider).latency_percentile(self.hedge_percentile)
+
+    def rank(self, chain: Iterable) -> Tuple:
+        """健康的來源優先，再依每檔延遲由快到慢；尚無足夠樣本的來源維持原優先序"""
+        def sort_key(item):
+            index, provider = item
+            health = self.health(provider)
+            cost = health.cost_estimate()
+            return (
+                not health.is_healthy(self.min_success_rate),
+                math.inf if cost is None else cost,
+                index,
+            )
+
+        return tuple(provider for _, provider in sorted(enumerate(chain), key=sort_key))
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        with self._lock:
+            items = list(self._health.items())
+        return {
+            source: {
+                "samples": health.samples,
+                "success_rate": health.success_rate(),
+                "p95_latency": health.latency_percentile(95),
+                "cost_estimate": health.cost_estimate(),
+            }
+            for source, health in items
+        }
+
+    def state(self) -> Dict[str, Dict[str, list]]:
+        with self._lock:
+            items = list(self._health.items())
+        state = dict(self._saved)
+        state.update({source: health.to_dict() for source, health in items})
+        return state
+
+    def save(self) -> None:
+        state = self.state()
+        if state == self._saved:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            temp_path.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(temp_path, self.path)
+            self._saved = state
+        except OSError as exc:
+            logger.warning("Could not persist provider health to %s: %s", self.path, exc)
+
+    def _load(self) -> None:
+        try:
+            self._saved = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self._saved = {}
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable provider health %s: %s", self.path, exc)
+            self._saved = {}
@@ -1,23 +1,67 @@
+import asyncio
 import logging
-import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Dict, Iterable, List, Optional, Tuple
 
 import requests
 from bs4 import BeautifulSoup
 
-from ..constants import DEFAULT_USER_AGENT, REQUEST_TIMEOUT
-from ..utils.time_utils import get_current_timestamp
+from ..constants import (
+    DEFAULT_PROVIDER_PRIORITY,
+    DEFAULT_USER_AGENT,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_RETRIES,
+    PROVIDER_MAX_CONCURRENCY,
+    REQUEST_TIMEOUT,
+    STREAM_MAX_BYTES,
+    STREAM_SCAN_OVERLAP,
+    SYMBOL_ROUTE_CACHE_SIZE,
+    SYMBOL_TIMEOUT,
+    TWSE_QUOTE_API_URL,
+    TWSE_QUOTE_BATCH_SIZE,
+    YAHOO_QUOTE_API_URL,
+    YAHOO_QUOTE_BATCH_SIZE,
+)
+from ..utils.time_utils import get_current_timestamp, timestamp_from_epoch
+from .circuit_breaker import CircuitBreaker, CircuitBreakerRegistry, RetryBudget
+from .health import PROVIDER_FAULT_REASONS, ProviderHealthTracker
+from .price_extraction import (
+    PATH_BATCH_JSON,
+    PATH_FIN_STREAMER,
+    PATH_PRICE_DETAIL,
+    PATH_QSP_PRICE,
+    PATH_REGULAR_MARKET_PRICE,
+    LayeredPriceExtractor,
+    PriceExtraction,
+    parse_price_text,
+    scan_fin_streamer,
+    scan_price_detail_item,
+    scan_qsp_price,
+    scan_regular_market_price,
+)
+from .transport import HttpTransport, get_default_transport
 
 logger = logging.getLogger(__name__)
 
 
 REASON_PRICE_UNAVAILABLE = "price_unavailable"
 REASON_PROVIDER_HTTP_ERROR = "provider_http_error"
+REASON_PROVIDER_CLIENT_ERROR = "provider_client_error"
 REASON_PROVIDER_PARSE_ERROR = "provider_parse_error"
+REASON_PROVIDER_TIMEOUT = "provider_timeout"
 REASON_UNSUPPORTED_SYMBOL = "unsupported_symbol"
+REASON_CIRCUIT_OPEN = "circuit_open"
 REASON_RATE_UNAVAILABLE = "rate_unavailable"
 
+# 連線層級的失敗（連線錯誤、5xx、429、逾時）會計入斷路器；只有 HTTP 錯誤會在重試預算內重試，
+# 逾時重試只會拉長執行時間。其他 4xx（例如下市股票的 404）歸為 provider_client_error，不重試也不計入斷路器
+CIRCUIT_FAILURE_REASONS = frozenset({REASON_PROVIDER_HTTP_ERROR, REASON_PROVIDER_TIMEOUT})
+RETRYABLE_REASONS = frozenset({REASON_PROVIDER_HTTP_ERROR})
+
 
 @dataclass
 class PriceResult:
@@ -27,6 +71,7 @@ class PriceResult:
     retrieved_at: str
     source: str
     market_timestamp: Optional[str] = None
+    extraction_path: Optional[str] = None
 
     def to_legacy_dict(self) -> dict:
         return {
@@ -37,6 +82,14 @@ class PriceResult:
         }
 
 
+def http_failure_reason(exc: requests.RequestException) -> str:
+    """依 HTTP 狀態碼分類失敗原因：連線錯誤、5xx 與 429 為暫時性錯誤，其他 4xx 重試也不會成功"""
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None and 400 <= status < 500 and status != 429:
+        return REASON_PROVIDER_CLIENT_ERROR
+    return REASON_PROVIDER_HTTP_ERROR
+
+
 @dataclass
 class PriceFailure(Exception):
     symbol: str
@@ -72,6 +125,7 @@ class ExchangeRateFailure(Exception):
         Exception.__init__(self, self.message or self.reason)
 
 
+@lru_cache(maxsize=SYMBOL_ROUTE_CACHE_SIZE)
 def split_symbol(symbol: str) -> Tuple[str, str]:
     parts = symbol.split(":")
     if len(parts) != 2 or not parts[0] or not parts[1]:
@@ -79,23 +133,36 @@ def split_symbol(symbol: str) -> Tuple[str, str]:
     return parts[0], parts[1].upper()
 
 
-def parse_price_text(value: str) -> float:
-    cleaned = value.strip().replace(",", "")
-    if not cleaned or cleaned in {"-", "--", "N/A"}:
-        raise ValueError("price is empty")
-    return float(cleaned)
+def symbol_exchange(symbol: str) -> Optional[str]:
+    try:
+        return split_symbol(symbol)[1]
+    except ValueError:
+        return None
 
 
 class BasePriceProvider:
     source = "BasePriceProvider"
     supported_exchanges: Tuple[str, ...] = ()
+    max_concurrency: int = PROVIDER_MAX_CONCURRENCY
+    priority: int = DEFAULT_PROVIDER_PRIORITY
+    batch_size: int = 1
+    transport: Optional[HttpTransport] = None
+    extractor: Optional[LayeredPriceExtractor] = None
+    stream: bool = False
+    max_stream_bytes: int = STREAM_MAX_BYTES
+
+    def __init__(
+        self,
+        transport: Optional[HttpTransport] = None,
+        stream: bool = False,
+        max_stream_bytes: int = STREAM_MAX_BYTES,
+    ):
+        self.transport = transport
+        self.stream = stream
+        self.max_stream_bytes = max_stream_bytes
 
     def supports(self, symbol: str) -> bool:
-        try:
-            _, exchange = split_symbol(symbol)
-        except ValueError:
-            return False
-        return exchange in self.supported_exchanges
+        return symbol_exchange(symbol) in self.supported_exchanges
 
     def normalize_symbol(self, symbol: str) -> str:
         raise NotImplementedError
@@ -103,17 +170,86 @@ class BasePriceProvider:
     def fetch_price(self, symbol: str) -> PriceResult:
         raise NotImplementedError
 
+    def fetch_batch(self, symbols: List[str]) -> PriceUpdateBatch:
+        prices: Dict[str, PriceResult] = {}
+        failures: Dict[str, PriceFailure] = {}
+        for symbol in symbols:
+            try:
+                prices[symbol] = self.fetch_price(symbol)
+            except PriceFailure as failure:
+                failures[symbol] = failure
+        return PriceUpdateBatch(prices=prices, failures=failures)
+
+    def _fail_all(self, symbols: List[str], reason: str, message: str) -> PriceUpdateBatch:
+        return PriceUpdateBatch(
+            prices={},
+            failures={
+                symbol: PriceFailure(symbol=symbol, reason=reason, message=message, source=self.source)
+                for symbol in symbols
+            },
+        )
+
+    def _with_missing_failures(self, symbols: List[str], prices: Dict[str, PriceResult]) -> PriceUpdateBatch:
+        failures = {
+            symbol: PriceFailure(
+                symbol=symbol,
+                reason=REASON_PRICE_UNAVAILABLE,
+                message=f"{self.source} returned no price for {symbol}",
+                source=self.source,
+            )
+            for symbol in symbols
+            if symbol not in prices
+        }
+        return PriceUpdateBatch(prices=prices, failures=failures)
+
+    def _get_transport(self) -> HttpTransport:
+        return self.transport or get_default_transport()
+
     def _get_html(self, url: str) -> str:
         headers = {"User-Agent": DEFAULT_USER_AGENT}
-        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        response = self._get_transport().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         return response.text
 
+    def _fetch_extraction(self, url: str, *args) -> PriceExtraction:
+        if not self.stream:
+            return self.extractor.extract(self._get_html(url), *args)
+
+        headers = {"User-Agent": DEFAULT_USER_AGENT}
+        chunks = self._get_transport().iter_text(
+            url,
+            headers=headers,
+            timeout=REQUEST_TIMEOUT,
+            max_bytes=self.max_stream_bytes,
+        )
+        html = ""
+        scanned = 0
+        try:
+            for text in chunks:
+                html += text
+                window = html[max(0, scanned - STREAM_SCAN_OVERLAP):]
+                scanned = len(html)
+                extraction = self.extractor.scan(window, *args, prefix=True)
+                if extraction is not None:
+                    self.extractor.record(extraction.path)
+                    logger.debug("%s found price after %s chars of %s", self.source, len(html), url)
+                    return extraction
+        finally:
+            chunks.close()
+        return self.extractor.extract(html, *args)
+
 
 class YahooTaiwanProvider(BasePriceProvider):
     source = "YahooTaiwanProvider"
     supported_exchanges = ("TPE", "TWSE", "TWO")
 
+    def __init__(self, transport: Optional[HttpTransport] = None, **kwargs):
+        super().__init__(transport=transport, **kwargs)
+        self.extractor = LayeredPriceExtractor(
+            fast_paths=[(PATH_PRICE_DETAIL, scan_price_detail_item)],
+            dom_fallback=self._parse_price_dom,
+        )
+
     def normalize_symbol(self, symbol: str) -> str:
         code, exchange = split_symbol(symbol)
         suffix = "TWO" if exchange == "TWO" else "TW"
@@ -123,20 +259,20 @@ class YahooTaiwanProvider(BasePriceProvider):
         yahoo_symbol = self.normalize_symbol(symbol)
         url = f"https://tw.stock.yahoo.com/quote/{yahoo_symbol}/"
         try:
-            html = self._get_html(url)
-            price = self._parse_price(html)
+            extraction = self._fetch_extraction(url)
             return PriceResult(
                 symbol=symbol,
-                price=price,
+                price=extraction.price,
                 currency="TWD",
                 retrieved_at=get_current_timestamp(),
                 source=self.source,
+                extraction_path=extraction.path,
             )
         except requests.RequestException as exc:
             logger.error("%s HTTP error for %s: %s", self.source, symbol, exc)
             raise PriceFailure(
                 symbol=symbol,
-                reason=REASON_PROVIDER_HTTP_ERROR,
+                reason=http_failure_reason(exc),
                 message=str(exc),
                 source=self.source,
             )
@@ -149,7 +285,13 @@ class YahooTaiwanProvider(BasePriceProvider):
                 source=self.source,
             )
 
+    def _extract_price(self, html: str) -> PriceExtraction:
+        return self.extractor.extract(html)
+
     def _parse_price(self, html: str) -> float:
+        return self._extract_price(html).price
+
+    def _parse_price_dom(self, html: str) -> float:
         soup = BeautifulSoup(html, "html.parser")
         price_items = soup.find_all(
             "li",
@@ -168,6 +310,19 @@ class YahooFinanceProvider(BasePriceProvider):
     source = "YahooFinanceProvider"
     supported_exchanges = ("NASDAQ", "NYSE", "NYSEARCA")
 
+    def __init__(self, transport: Optional[HttpTransport] = None, **kwargs):
+        super().__init__(transport=transport, **kwargs)
+        self.extractor = LayeredPriceExtractor(
+            fast_paths=[
+                (PATH_QSP_PRICE, scan_qsp_price),
+                (PATH_FIN_STREAMER, scan_fin_streamer),
+            ],
+            dom_fallback=self._parse_price_dom,
+            # 頁首的 regularMarketPrice 可能屬於其他商品：讀完整頁且 DOM 的 qsp-price 與
+            # 該商品的 fin-streamer 都找不到時才採用。
+            last_resort_paths=[(PATH_REGULAR_MARKET_PRICE, scan_regular_market_price)],
+        )
+
     def normalize_symbol(self, symbol: str) -> str:
         code, _ = split_symbol(symbol)
         return code
@@ -176,20 +331,20 @@ class YahooFinanceProvider(BasePriceProvider):
         yahoo_symbol = self.normalize_symbol(symbol)
         url = f"https://finance.yahoo.com/quote/{yahoo_symbol}/"
         try:
-            html = self._get_html(url)
-            price = self._parse_price(html, yahoo_symbol)
+            extraction = self._fetch_extraction(url, yahoo_symbol)
             return PriceResult(
                 symbol=symbol,
-                price=price,
+                price=extraction.price,
                 currency="USD",
                 retrieved_at=get_current_timestamp(),
                 source=self.source,
+                extraction_path=extraction.path,
             )
         except requests.RequestException as exc:
             logger.error("%s HTTP error for %s: %s", self.source, symbol, exc)
             raise PriceFailure(
                 symbol=symbol,
-                reason=REASON_PROVIDER_HTTP_ERROR,
+                reason=http_failure_reason(exc),
                 message=str(exc),
                 source=self.source,
             )
@@ -202,7 +357,13 @@ class YahooFinanceProvider(BasePriceProvider):
                 source=self.source,
             )
 
+    def _extract_price(self, html: str, yahoo_symbol: str) -> PriceExtraction:
+        return self.extractor.extract(html, yahoo_symbol)
+
     def _parse_price(self, html: str, yahoo_symbol: str) -> float:
+        return self._extract_price(html, yahoo_symbol).price
+
+    def _parse_price_dom(self, html: str, yahoo_symbol: str) -> float:
         soup = BeautifulSoup(html, "html.parser")
         price_node = soup.find(attrs={"data-testid": "qsp-price"})
         if price_node and price_node.get_text(strip=True):
@@ -218,28 +379,247 @@ class YahooFinanceProvider(BasePriceProvider):
         if streamer and streamer.get_text(strip=True):
             return parse_price_text(streamer.get_text())
 
-        match = re.search(r'"regularMarketPrice"\s*:\s*\{\s*"raw"\s*:\s*([0-9.]+)', html)
-        if match:
-            return float(match.group(1))
-
         raise ValueError("regular market price not found")
 
 
+class TwseBatchQuoteProvider(BasePriceProvider):
+    source = "TwseBatchQuoteProvider"
+    supported_exchanges = ("TPE", "TWSE", "TWO")
+
+    def __init__(
+        self,
+        transport: Optional[HttpTransport] = None,
+        base_url: str = TWSE_QUOTE_API_URL,
+        batch_size: int = TWSE_QUOTE_BATCH_SIZE,
+        **kwargs,
+    ):
+        super().__init__(transport=transport, **kwargs)
+        self.base_url = base_url
+        self.batch_size = max(1, batch_size)
+
+    def normalize_symbol(self, symbol: str) -> str:
+        code, exchange = split_symbol(symbol)
+        market = "otc" if exchange == "TWO" else "tse"
+        return f"{market}_{code.lower()}.tw"
+
+    def fetch_price(self, symbol: str) -> PriceResult:
+        batch = self.fetch_batch([symbol])
+        if symbol in batch.prices:
+            return batch.prices[symbol]
+        raise batch.failures[symbol]
+
+    def fetch_batch(self, symbols: List[str]) -> PriceUpdateBatch:
+        by_channel: Dict[str, List[str]] = {}
+        for symbol in symbols:
+            by_channel.setdefault(self.normalize_symbol(symbol), []).append(symbol)
+
+        try:
+            response = self._get_transport().get(
+                self.base_url,
+                params={"ex_ch": "|".join(by_channel), "json": "1", "delay": "0"},
+                headers={"User-Agent": DEFAULT_USER_AGENT},
+                timeout=REQUEST_TIMEOUT,
+            )
+            response.raise_for_status()
+            rows = response.json()["msgArray"]
+        except requests.RequestException as exc:
+            logger.error("%s HTTP error for %s symbols: %s", self.source, len(symbols), exc)
+            return self._fail_all(symbols, http_failure_reason(exc), str(exc))
+        except (ValueError, KeyError, TypeError) as exc:
+            logger.error("%s parse error for %s symbols: %s", self.source, len(symbols), exc)
+            return self._fail_all(symbols, REASON_PROVIDER_PARSE_ERROR, str(exc))
+
+        retrieved_at = get_current_timestamp()
+        prices: Dict[str, PriceResult] = {}
+        for row in rows or []:
+            if not isinstance(row, dict):
+                continue
+            channel = f"{row.get('ex', '')}_{str(row.get('c', '')).lower()}.tw"
+            try:
+                # z 為最近成交價；尚未成交時為 "-"，交由逐檔資料來源處理
+                price = parse_price_text(str(row.get("z", "")))
+            except ValueError:
+                continue
+            tlong = row.get("tlong")
+            market_timestamp = (
+                timestamp_from_epoch(int(tlong) / 1000) if str(tlong or "").isdigit() else None
+            )
+            for symbol in by_channel.get(channel, []):
+                prices[symbol] = PriceResult(
+                    symbol=symbol,
+                    price=price,
+                    currency="TWD",
+                    retrieved_at=retrieved_at,
+                    source=self.source,
+                    market_timestamp=market_timestamp,
+                    extraction_path=PATH_BATCH_JSON,
+                )
+
+        return self._with_missing_failures(symbols, prices)
+
+
+class YahooBatchQuoteProvider(BasePriceProvider):
+    source = "YahooBatchQuoteProvider"
+    supported_exchanges = ("NASDAQ", "NYSE", "NYSEARCA")
+
+    def __init__(
+        self,
+        transport: Optional[HttpTransport] = None,
+        base_url: str = YAHOO_QUOTE_API_URL,
+        batch_size: int = YAHOO_QUOTE_BATCH_SIZE,
+        **kwargs,
+    ):
+        super().__init__(transport=transport, **kwargs)
+        self.base_url = base_url
+        self.batch_size = max(1, batch_size)
+
+    def normalize_symbol(self, symbol: str) -> str:
+        code, _ = split_symbol(symbol)
+        return code.upper()
+
+    def fetch_price(self, symbol: str) -> PriceResult:
+        batch = self.fetch_batch([symbol])
+        if symbol in batch.prices:
+            return batch.prices[symbol]
+        raise batch.failures[symbol]
+
+    def fetch_batch(self, symbols: List[str]) -> PriceUpdateBatch:
+        by_yahoo_symbol: Dict[str, List[str]] = {}
+        for symbol in symbols:
+            by_yahoo_symbol.setdefault(self.normalize_symbol(symbol), []).append(symbol)
+
+        try:
+            response = self._get_transport().get(
+                self.base_url,
+                params={"symbols": ",".join(by_yahoo_symbol)},
+                headers={"User-Agent": DEFAULT_USER_AGENT},
+                timeout=REQUEST_TIMEOUT,
+            )
+            response.raise_for_status()
+            quotes = response.json()["quoteResponse"]["result"]
+        except requests.RequestException as exc:
+            logger.error("%s HTTP error for %s symbols: %s", self.source, len(symbols), exc)
+            return self._fail_all(symbols, http_failure_reason(exc), str(exc))
+        except (ValueError, KeyError, TypeError) as exc:
+            logger.error("%s parse error for %s symbols: %s", self.source, len(symbols), exc)
+            return self._fail_all(symbols, REASON_PROVIDER_PARSE_ERROR, str(exc))
+
+        retrieved_at = get_current_timestamp()
+        prices: Dict[str, PriceResult] = {}
+        for quote in quotes or []:
+            price = quote.get("regularMarketPrice") if isinstance(quote, dict) else None
+            yahoo_symbol = str(quote.get("symbol", "")).upper() if isinstance(quote, dict) else ""
+            if not isinstance(price, (int, float)) or yahoo_symbol not in by_yahoo_symbol:
+                continue
+            market_time = quote.get("regularMarketTime")
+            for symbol in by_yahoo_symbol[yahoo_symbol]:
+                prices[symbol] = PriceResult(
+                    symbol=symbol,
+                    price=float(price),
+                    currency=quote.get("currency") or "USD",
+                    retrieved_at=retrieved_at,
+                    source=self.source,
+                    market_timestamp=(
+                        timestamp_from_epoch(market_time)
+                        if isinstance(market_time, (int, float))
+                        else None
+                    ),
+                    extraction_path=PATH_BATCH_JSON,
+                )
+
+        return self._with_missing_failures(symbols, prices)
+
+
+class ProviderRouter:
+    """依 supported_exchanges 預先建立「交易所 -> 依優先序排列的資料來源鏈」索引"""
+
+    def __init__(self, providers: Iterable[BasePriceProvider] = ()):
+        self._entries: List[Tuple[int, int, BasePriceProvider]] = []
+        self._index: Dict[str, Tuple[BasePriceProvider, ...]] = {}
+        self._ordered: List[BasePriceProvider] = []
+        for provider in providers:
+            self._entries.append((provider.priority, len(self._entries), provider))
+        self.rebuild()
+
+    @property
+    def providers(self) -> List[BasePriceProvider]:
+        return list(self._ordered)
+
+    def register(self, provider: BasePriceProvider, priority: Optional[int] = None) -> None:
+        rank = provider.priority if priority is None else priority
+        self._entries.append((rank, len(self._entries), provider))
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        ordered = [provider for _, _, provider in sorted(self._entries, key=lambda entry: entry[:2])]
+        index: Dict[str, List[BasePriceProvider]] = {}
+        for provider in ordered:
+            for exchange in provider.supported_exchanges:
+                index.setdefault(exchange.upper(), []).append(provider)
+        self._ordered = ordered
+        self._index = {exchange: tuple(chain) for exchange, chain in index.items()}
+
+    def chain_for_exchange(self, exchange: Optional[str]) -> Tuple[BasePriceProvider, ...]:
+        return self._index.get(exchange, ())
+
+    def chain(self, symbol: str) -> Tuple[BasePriceProvider, ...]:
+        return self.chain_for_exchange(symbol_exchange(symbol))
+
+
 class MarketDataService:
-    def __init__(self, providers: Optional[Iterable[BasePriceProvider]] = None):
-        self.providers: List[BasePriceProvider] = list(
+    def __init__(
+        self,
+        providers: Optional[Iterable[BasePriceProvider]] = None,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        provider_concurrency: Optional[Dict[str, int]] = None,
+        symbol_timeout: Optional[float] = SYMBOL_TIMEOUT,
+        transport: Optional[HttpTransport] = None,
+        stream: bool = False,
+        hedge: bool = False,
+        health: Optional[ProviderHealthTracker] = None,
+        breakers: Optional[CircuitBreakerRegistry] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        max_retries: int = MAX_RETRIES,
+    ):
+        self.router = ProviderRouter(
             providers
             if providers is not None
             else [
-                YahooTaiwanProvider(),
-                YahooFinanceProvider(),
+                TwseBatchQuoteProvider(transport=transport),
+                YahooTaiwanProvider(transport=transport, stream=stream),
+                YahooBatchQuoteProvider(transport=transport),
+                YahooFinanceProvider(transport=transport, stream=stream),
             ]
         )
+        self.max_concurrency = max(1, max_concurrency)
+        self.provider_concurrency = dict(provider_concurrency or {})
+        self.symbol_timeout = symbol_timeout
+        self.hedge = hedge
+        self.health = health or ProviderHealthTracker()
+        self.breakers = breakers or CircuitBreakerRegistry()
+        self.retry_budget = retry_budget or RetryBudget()
+        self.max_retries = max(0, max_retries)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._limits_loop = None
+        self._global_limit: Optional[asyncio.Semaphore] = None
+        self._provider_limits: Dict[int, asyncio.Semaphore] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.metrics: Counter = Counter()
+
+    @property
+    def providers(self) -> List[BasePriceProvider]:
+        return self.router.providers
+
+    def register_provider(self, provider: BasePriceProvider, priority: Optional[int] = None) -> None:
+        self.router.register(provider, priority=priority)
+
+    def providers_for_symbol(self, symbol: str) -> List[BasePriceProvider]:
+        return list(self.router.chain(symbol))
 
     def provider_for_symbol(self, symbol: str) -> BasePriceProvider:
-        for provider in self.providers:
-            if provider.supports(symbol):
-                return provider
+        chain = self.providers_for_symbol(symbol)
+        if chain:
+            return chain[0]
         raise PriceFailure(
             symbol=symbol,
             reason=REASON_UNSUPPORTED_SYMBOL,
@@ -247,21 +627,355 @@ class MarketDataService:
         )
 
     async def get_prices(self, symbols: Iterable[str]) -> PriceUpdateBatch:
+        ordered_symbols = list(dict.fromkeys(symbols))
+        loop = asyncio.get_running_loop()
+
+        # single-flight：同一股票已有進行中的抓取時，等待該次結果而不重複發出請求
+        owned: Dict[str, asyncio.Future] = {}
+        shared: Dict[str, asyncio.Future] = {}
+        for symbol in ordered_symbols:
+            future = self._inflight.get(symbol)
+            if future is not None and not future.done() and future.get_loop() is loop:
+                shared[symbol] = future
+            else:
+                owned[symbol] = self._inflight[symbol] = loop.create_future()
+        self.metrics["requested"] += len(ordered_symbols)
+        self.metrics["coalesced"] += len(shared)
+
+        try:
+            batch = await self._fetch_prices(list(owned)) if owned else None
+            for symbol, future in owned.items():
+                future.set_result(batch.prices.get(symbol) or batch.failures[symbol])
+        finally:
+            for symbol, future in owned.items():
+                if not future.done():
+                    future.set_result(
+                        PriceFailure(
+                            symbol=symbol,
+                            reason=REASON_PRICE_UNAVAILABLE,
+                            message="Shared price fetch was cancelled",
+                        )
+                    )
+                if self._inflight.get(symbol) is future:
+                    del self._inflight[symbol]
+
+        shared_outcomes = await asyncio.gather(*(asyncio.shield(future) for future in shared.values()))
+        outcomes = dict(zip(shared, shared_outcomes))
+
         prices: Dict[str, PriceResult] = {}
         failures: Dict[str, PriceFailure] = {}
+        for symbol in ordered_symbols:
+            outcome = owned[symbol].result() if symbol in owned else outcomes[symbol]
+            if isinstance(outcome, PriceResult):
+                prices[symbol] = outcome
+            else:
+                failures[symbol] = outcome
 
-        for symbol in symbols:
-            try:
-                provider = self.provider_for_symbol(symbol)
-                prices[symbol] = provider.fetch_price(symbol)
-            except PriceFailure as failure:
-                failures[symbol] = failure
-            except Exception as exc:
-                logger.error("Unexpected price update error for %s: %s", symbol, exc)
-                failures[symbol] = PriceFailure(
+        return PriceUpdateBatch(prices=prices, failures=failures)
+
+    async def _fetch_prices(self, ordered_symbols: List[str]) -> PriceUpdateBatch:
+        self.metrics["fetched"] += len(ordered_symbols)
+        outcomes: Dict[str, object] = {}
+        chains: Dict[str, Tuple[BasePriceProvider, ...]] = {}
+        ranked: Dict[Tuple[BasePriceProvider, ...], Tuple[BasePriceProvider, ...]] = {}
+        for symbol in ordered_symbols:
+            chain = self.router.chain(symbol)
+            if not chain:
+                outcomes[symbol] = PriceFailure(
                     symbol=symbol,
-                    reason=REASON_PRICE_UNAVAILABLE,
-                    message=str(exc),
+                    reason=REASON_UNSUPPORTED_SYMBOL,
+                    message=f"No provider supports {symbol}",
+                )
+                continue
+            if chain not in ranked:
+                ranked[chain] = self.health.rank(chain)
+            chains[symbol] = ranked[chain]
+
+        # 依健康度排序後的 fallback 鏈逐輪抓取：每輪把待處理股票依下一個尚未嘗試的
+        # 資料來源分組，失敗的股票在下一輪交給鏈中的下一個來源。
+        tried: Dict[str, set] = {symbol: set() for symbol in chains}
+        pending = list(chains)
+        while pending:
+            groups: Dict[int, Tuple[BasePriceProvider, List[str]]] = {}
+            for symbol in pending:
+                provider = self._next_provider(chains[symbol], tried[symbol])
+                groups.setdefault(id(provider), (provider, []))[1].append(symbol)
+
+            batches = await asyncio.gather(
+                *(
+                    self._fetch_group(provider, group, chains, tried)
+                    for provider, group in groups.values()
                 )
+            )
+            retry = set()
+            for batch in batches:
+                outcomes.update(batch.prices)
+                for symbol, failure in batch.failures.items():
+                    outcomes[symbol] = failure
+                    fallback = self._next_provider(chains[symbol], tried[symbol])
+                    if fallback is not None:
+                        logger.info(
+                            "%s failed for %s (%s), falling back to %s",
+                            failure.source,
+                            symbol,
+                            failure.reason,
+                            fallback.source,
+                        )
+                        retry.add(symbol)
+            pending = [symbol for symbol in pending if symbol in retry]
+        self.breakers.save()
+        self.health.save()
+
+        prices: Dict[str, PriceResult] = {}
+        failures: Dict[str, PriceFailure] = {}
+        for symbol in ordered_symbols:
+            outcome = outcomes[symbol]
+            if isinstance(outcome, PriceResult):
+                prices[symbol] = outcome
+            else:
+                failures[symbol] = outcome
 
         return PriceUpdateBatch(prices=prices, failures=failures)
+
+    def extraction_stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            provider.source: dict(provider.extractor.stats)
+            for provider in self.providers
+            if getattr(provider, "extractor", None) is not None
+        }
+
+    def circuit_stats(self) -> Dict[str, Dict[str, object]]:
+        return self.breakers.snapshot()
+
+    def health_stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        return self.health.snapshot()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @staticmethod
+    def _next_provider(chain, tried) -> Optional[BasePriceProvider]:
+        for provider in chain:
+            if id(provider) not in tried:
+                return provider
+        return None
+
+    @staticmethod
+    def _merge_batches(symbols: List[str], batches: Iterable[PriceUpdateBatch]) -> PriceUpdateBatch:
+        prices: Dict[str, PriceResult] = {}
+        failures: Dict[str, PriceFailure] = {}
+        for batch in batches:
+            for symbol, result in batch.prices.items():
+                prices.setdefault(symbol, result)
+            for symbol, failure in batch.failures.items():
+                failures.setdefault(symbol, failure)
+        return PriceUpdateBatch(
+            prices={symbol: prices[symbol] for symbol in symbols if symbol in prices},
+            failures={
+                symbol: failures[symbol]
+                for symbol in symbols
+                if symbol not in prices and symbol in failures
+            },
+        )
+
+    @staticmethod
+    def _chunks(provider: BasePriceProvider, symbols: List[str]):
+        size = max(1, provider.batch_size)
+        for start in range(0, len(symbols), size):
+            yield symbols[start:start + size]
+
+    async def _fetch_group(self, provider, symbols, chains, tried) -> PriceUpdateBatch:
+        for symbol in symbols:
+            tried[symbol].add(id(provider))
+        batches = await asyncio.gather(
+            *(self._fetch_hedged(provider, chunk, chains, tried) for chunk in self._chunks(provider, symbols))
+        )
+        return self._merge_batches(symbols, batches)
+
+    async def _fetch_chunks(self, provider: BasePriceProvider, symbols: List[str]) -> PriceUpdateBatch:
+        batches = await asyncio.gather(
+            *(self._fetch_unit(provider, chunk) for chunk in self._chunks(provider, symbols))
+        )
+        return self._merge_batches(symbols, batches)
+
+    async def _fetch_hedged(self, provider, symbols, chains, tried) -> PriceUpdateBatch:
+        primary = asyncio.ensure_future(self._fetch_unit(provider, symbols))
+        delay = self.health.hedge_delay(provider) if self.hedge else None
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        # 主要來源超過其 p95 延遲仍未回應：把同一批股票交給下一個來源，先回來的結果勝出
+        backups: Dict[int, Tuple[BasePriceProvider, List[str]]] = {}
+        for symbol in symbols:
+            backup = self._next_provider(chains[symbol], tried[symbol])
+            if backup is not None:
+                backups.setdefault(id(backup), (backup, []))[1].append(symbol)
+        if not backups:
+            return await primary
+
+        tasks = [primary]
+        for backup, group in backups.values():
+            for symbol in group:
+                tried[symbol].add(id(backup))
+            logger.info("Hedging %s symbols from %s to %s after %.2fs", len(group), provider.source, backup.source, delay)
+            self.metrics["hedged"] += len(group)
+            tasks.append(asyncio.ensure_future(self._fetch_chunks(backup, group)))
+
+        prices: Dict[str, PriceResult] = {}
+        batches: List[PriceUpdateBatch] = []
+        waiting = set(tasks)
+        try:
+            while waiting and len(prices) < len(symbols):
+                done, waiting = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    batch = task.result()
+                    batches.append(batch)
+                    for symbol, result in batch.prices.items():
+                        if symbol not in prices:
+                            prices[symbol] = result
+                            if task is not primary:
+                                self.metrics["hedge_wins"] += 1
+        finally:
+            for task in waiting:
+                task.cancel()
+        return self._merge_batches(symbols, batches)
+
+    async def _fetch_unit(self, provider: BasePriceProvider, symbols: List[str]) -> PriceUpdateBatch:
+        breaker = self.breakers.breaker(provider.source)
+        prices: Dict[str, PriceResult] = {}
+        failures: Dict[str, PriceFailure] = {}
+        remaining = list(symbols)
+        attempt = 0
+        self.retry_budget.deposit(len(symbols))
+        while remaining:
+            batch = await self._attempt_unit(provider, remaining, breaker)
+            if batch is None:
+                # 斷路器開路：不等待逾時，直接失敗並交給鏈中的下一個來源
+                failures.update(
+                    self._fail_unit(
+                        provider,
+                        remaining,
+                        REASON_CIRCUIT_OPEN,
+                        f"{provider.source} circuit is open after repeated connection failures",
+                    ).failures
+                )
+                break
+            prices.update(batch.prices)
+            failures.update(batch.failures)
+            connection_failed = not batch.prices and any(
+                failure.reason in CIRCUIT_FAILURE_REASONS for failure in batch.failures.values()
+            )
+            if not connection_failed:
+                breaker.record_success()
+            elif breaker.record_failure():
+                logger.warning(
+                    "%s circuit opened after %s consecutive failures",
+                    provider.source,
+                    breaker.consecutive_failures,
+                )
+
+            transient = [
+                symbol for symbol, failure in batch.failures.items() if failure.reason in RETRYABLE_REASONS
+            ]
+
+            if not transient or attempt >= self.max_retries or not self.retry_budget.acquire():
+                break
+            attempt += 1
+            self.metrics["retries"] += len(transient)
+            await asyncio.sleep(self.retry_budget.backoff(attempt))
+            remaining = transient
+
+        return PriceUpdateBatch(
+            prices={symbol: prices[symbol] for symbol in symbols if symbol in prices},
+            failures={symbol: failures[symbol] for symbol in symbols if symbol not in prices},
+        )
+
+    async def _attempt_unit(
+        self, provider: BasePriceProvider, symbols: List[str], breaker: CircuitBreaker
+    ) -> Optional[PriceUpdateBatch]:
+        """取得併發名額後呼叫資料來源；斷路器不放行時回傳 None"""
+        async with self._global_semaphore(), self._provider_semaphore(provider):
+            # 取得名額後才檢查斷路器：排隊等待期間斷路器可能已經開路
+            if not breaker.allow():
+                return None
+            started = time.perf_counter()
+            try:
+                batch = await self._call_provider(provider, symbols)
+            except asyncio.CancelledError:
+                # 被對沖請求取代時仍記錄延遲，讓 p95 反映慢速回應
+                self.health.record(provider, time.perf_counter() - started)
+                breaker.release()
+                raise
+            faults = sum(1 for failure in batch.failures.values() if failure.reason in PROVIDER_FAULT_REASONS)
+            self.health.record(provider, time.perf_counter() - started, attempts=len(symbols), faults=faults)
+            return batch
+
+    async def _call_provider(self, provider: BasePriceProvider, symbols: List[str]) -> PriceUpdateBatch:
+        try:
+            if provider.batch_size > 1:
+                return await self._run_with_timeout(provider.fetch_batch, symbols)
+            result = await self._run_with_timeout(provider.fetch_price, symbols[0])
+            return PriceUpdateBatch(prices={symbols[0]: result}, failures={})
+        except PriceFailure as failure:
+            return PriceUpdateBatch(prices={}, failures={symbols[0]: failure})
+        except asyncio.TimeoutError:
+            logger.error("%s timed out for %s after %ss", provider.source, symbols, self.symbol_timeout)
+            return self._fail_unit(
+                provider,
+                symbols,
+                REASON_PROVIDER_TIMEOUT,
+                f"{provider.source} did not respond within {self.symbol_timeout}s",
+            )
+        except Exception as exc:
+            logger.error("Unexpected price update error for %s: %s", symbols, exc)
+            return self._fail_unit(provider, symbols, REASON_PRICE_UNAVAILABLE, str(exc))
+
+    @staticmethod
+    def _fail_unit(provider, symbols, reason, message) -> PriceUpdateBatch:
+        return PriceUpdateBatch(
+            prices={},
+            failures={
+                symbol: PriceFailure(symbol=symbol, reason=reason, message=message, source=provider.source)
+                for symbol in symbols
+            },
+        )
+
+    async def _run_with_timeout(self, func, argument):
+        loop = asyncio.get_running_loop()
+        call = loop.run_in_executor(self._get_executor(), func, argument)
+        return await asyncio.wait_for(call, timeout=self.symbol_timeout)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="market-data",
+            )
+        return self._executor
+
+    def _bind_limits_to_running_loop(self) -> None:
+        # Semaphore 綁定單一事件迴圈；舊版 scraper 介面每次呼叫都會 asyncio.run()，
+        # 因此事件迴圈改變時重新建立併發限制。
+        loop = asyncio.get_running_loop()
+        if self._limits_loop is not loop:
+            self._limits_loop = loop
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+            self._provider_limits = {}
+
+    def _global_semaphore(self) -> asyncio.Semaphore:
+        self._bind_limits_to_running_loop()
+        return self._global_limit
+
+    def _provider_semaphore(self, provider: BasePriceProvider) -> asyncio.Semaphore:
+        self._bind_limits_to_running_loop()
+        key = id(provider)
+        if key not in self._provider_limits:
+            limit = self.provider_concurrency.get(provider.source, provider.max_concurrency)
+            self._provider_limits[key] = asyncio.Semaphore(max(1, limit))
+        return self._provider_limits[key]
@@ -0,0 +1,141 @@
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+PATH_QSP_PRICE = "qsp_price"
+PATH_FIN_STREAMER = "fin_streamer"
+PATH_REGULAR_MARKET_PRICE = "regular_market_price_json"
+PATH_PRICE_DETAIL = "price_detail_item"
+PATH_BATCH_JSON = "batch_json"
+PATH_DOM = "dom"
+PATH_MISS = "miss"
+
+_QSP_PRICE_RE = re.compile(r'data-testid="qsp-price"[^>]*>\s*([^<]*?)\s*<')
+_FIN_STREAMER_RE = re.compile(r"<fin-streamer\b([^>]*)>\s*([^<]*?)\s*<")
+# 要求數字後方出現分隔字元，避免串流讀取時比對到被截斷的數字。
+_REGULAR_MARKET_PRICE_RE = re.compile(
+    r'"regularMarketPrice"\s*:\s*\{\s*"raw"\s*:\s*([0-9.]+)\s*[,}]'
+)
+_PRICE_DETAIL_ITEM_RE = re.compile(
+    r'<li\b[^>]*class="[^"]*\bprice-detail-item\b[^"]*"[^>]*>(.*?)</li>',
+    re.DOTALL,
+)
+_SPAN_TEXT_RE = re.compile(r"<span\b[^>]*>([^<]*)</span>")
+
+FastPath = Callable[..., Optional[float]]
+
+
+@dataclass
+class PriceExtraction:
+    price: float
+    path: str
+
+
+def parse_price_text(value: str) -> float:
+    cleaned = value.strip().replace(",", "")
+    if not cleaned or cleaned in {"-", "--", "N/A"}:
+        raise ValueError("price is empty")
+    return float(cleaned)
+
+
+def _try_parse(value: str) -> Optional[float]:
+    try:
+        return parse_price_text(value)
+    except ValueError:
+        return None
+
+
+def scan_qsp_price(html: str, *_) -> Optional[float]:
+    match = _QSP_PRICE_RE.search(html)
+    return _try_parse(match.group(1)) if match else None
+
+
+def scan_fin_streamer(html: str, yahoo_symbol: str, *_) -> Optional[float]:
+    symbol_attr = f'data-symbol="{yahoo_symbol}"'
+    for match in _FIN_STREAMER_RE.finditer(html):
+        attrs = match.group(1)
+        if symbol_attr in attrs and 'data-field="regularMarketPrice"' in attrs:
+            price = _try_parse(match.group(2))
+            if price is not None:
+                return price
+    return None
+
+
+def scan_regular_market_price(html: str, *_) -> Optional[float]:
+    match = _REGULAR_MARKET_PRICE_RE.search(html)
+    return _try_parse(match.group(1)) if match else None
+
+
+def scan_price_detail_item(html: str, *_) -> Optional[float]:
+    for match in _PRICE_DETAIL_ITEM_RE.finditer(html):
+        spans = _SPAN_TEXT_RE.findall(match.group(1))
+        if any(span.strip() == "成交" for span in spans):
+            return _try_parse(spans[-1])
+    return None
+
+
+class LayeredPriceExtractor:
+    """
+    先以字串掃描取得價格，失敗時才建立完整 DOM，並記錄各路徑命中次數
+
+    last_resort_paths 只在 DOM 也找不到價格時才使用（例如無法確認屬於哪個商品的頁面 JSON）。
+    """
+
+    def __init__(
+        self,
+        fast_paths: Sequence[Tuple[str, FastPath]],
+        dom_fallback: Callable[..., float],
+        prefix_safe_paths: Optional[Iterable[str]] = None,
+        last_resort_paths: Sequence[Tuple[str, FastPath]] = (),
+    ):
+        self.fast_paths = tuple(fast_paths)
+        self.dom_fallback = dom_fallback
+        self.last_resort_paths = tuple(last_resort_paths)
+        # 只有能唯一定位目標價格的路徑，才允許在讀到部分文件時就提早採用。
+        self.prefix_safe_paths = frozenset(
+            prefix_safe_paths if prefix_safe_paths is not None else (path for path, _ in self.fast_paths)
+        )
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def scan(self, html: str, *args, prefix: bool = False) -> Optional[PriceExtraction]:
+        for path, scanner in self.fast_paths:
+            if prefix and path not in self.prefix_safe_paths:
+                continue
+            price = scanner(html, *args)
+            if price is not None:
+                return PriceExtraction(price=price, path=path)
+        return None
+
+    def extract(self, html: str, *args) -> PriceExtraction:
+        extraction = self.scan(html, *args)
+        if extraction is None:
+            try:
+                extraction = PriceExtraction(price=self.dom_fallback(html, *args), path=PATH_DOM)
+            except (ValueError, AttributeError):
+                extraction = self._scan_last_resort(html, *args)
+                if extraction is None:
+                    self.record(PATH_MISS)
+                    raise
+        self.record(extraction.path)
+        return extraction
+
+    def _scan_last_resort(self, html: str, *args) -> Optional[PriceExtraction]:
+        for path, scanner in self.last_resort_paths:
+            price = scanner(html, *args)
+            if price is not None:
+                return PriceExtraction(price=price, path=path)
+        return None
+
+    def record(self, path: str) -> None:
+        with self._lock:
+            self.stats[path] += 1
+
+    def hit_rates(self) -> Dict[str, float]:
+        with self._lock:
+            total = sum(self.stats.values())
+            if not total:
+                return {}
+            return {path: count / total for path, count in self.stats.items()}
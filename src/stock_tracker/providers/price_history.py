@@ -0,0 +1,237 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from ..constants import PRICE_HISTORY_PATH, QUOTE_STORE_BUSY_TIMEOUT
+from .market_data import PriceResult, PriceUpdateBatch
+
+logger = logging.getLogger(__name__)
+
+# (symbol, ts) 為主鍵的叢集索引（WITHOUT ROWID），同一檔股票的資料點在磁碟上連續存放
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS price_points (
+        symbol TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        price REAL NOT NULL,
+        currency TEXT NOT NULL,
+        source TEXT,
+        PRIMARY KEY (symbol, ts)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS fx_points (
+        pair TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        rate REAL NOT NULL,
+        PRIMARY KEY (pair, ts)
+    ) WITHOUT ROWID
+    """,
+)
+
+# 只在價格與該時間點之前最近一筆不同時寫入（去除重複的未變動價格）
+_INSERT_PRICE = """
+INSERT OR REPLACE INTO price_points (symbol, ts, price, currency, source)
+SELECT :symbol, :ts, :price, :currency, :source
+WHERE NOT EXISTS (
+    SELECT 1 FROM (
+        SELECT price FROM price_points
+        WHERE symbol = :symbol AND ts <= :ts
+        ORDER BY ts DESC LIMIT 1
+    ) WHERE price = :price
+)
+"""
+
+_INSERT_FX = """
+INSERT OR REPLACE INTO fx_points (pair, ts, rate)
+SELECT :pair, :ts, :rate
+WHERE NOT EXISTS (
+    SELECT 1 FROM (
+        SELECT rate FROM fx_points
+        WHERE pair = :pair AND ts <= :ts
+        ORDER BY ts DESC LIMIT 1
+    ) WHERE rate = :rate
+)
+"""
+
+_MAX_QUERY_PARAMS = 500
+
+Timestamp = Union[int, float, str, datetime]
+Series = List[Tuple[int, float]]
+
+
+def to_epoch(value: Timestamp) -> int:
+    """ISO 8601 時間戳記、datetime 或 Unix 時間轉為整數秒"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return int(value.timestamp())
+
+
+class SQLitePriceHistory:
+    """
+    各股票價格與匯率的時間序列（SQLite，WAL 模式）
+
+    每次取得報價後寫入，以 (symbol, ts) 索引；價格未變動時不新增資料點，
+    並同時記錄匯率，事後重新估值任一時間點的投資組合不需連網。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(os.path.expanduser(path or os.getenv("PRICE_HISTORY_PATH", PRICE_HISTORY_PATH)))
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def record_prices(self, prices: Iterable[PriceResult]) -> int:
+        """
+        寫入報價
+
+        時間點以報價的 market_timestamp 為準，沒有時使用 retrieved_at。
+
+        Returns:
+            int: 實際新增或更新的資料點數
+        """
+        params = []
+        for result in prices:
+            try:
+                ts = to_epoch(result.market_timestamp or result.retrieved_at)
+            except (TypeError, ValueError):
+                logger.debug("無法解析報價時間，略過價格歷史: %s", result.symbol)
+                continue
+            params.append({
+                "symbol": result.symbol,
+                "ts": ts,
+                "price": result.price,
+                "currency": result.currency,
+                "source": result.source,
+            })
+        # 依時間排序寫入，去重判斷才會以前一筆為準
+        params.sort(key=lambda row: (row["symbol"], row["ts"]))
+        return self._write(_INSERT_PRICE, params)
+
+    def record_batch(self, batch: PriceUpdateBatch) -> int:
+        return self.record_prices(batch.prices.values())
+
+    def record_fx(self, pair: str, rate: float, at: Timestamp) -> int:
+        """寫入一筆匯率（例如 USD-TWD）"""
+        return self._write(_INSERT_FX, [{"pair": pair, "ts": to_epoch(at), "rate": float(rate)}])
+
+    def read_prices(
+        self,
+        symbols: Iterable[str],
+        start: Optional[Timestamp] = None,
+        end: Optional[Timestamp] = None,
+    ) -> Dict[str, Series]:
+        """
+        一次讀取多檔股票在 start <= ts <= end 之間的價格
+
+        Returns:
+            dict: 股票代號 -> [(Unix 時間, 價格), ...]（依時間排序；沒有資料的代號不會出現）
+        """
+        low, high = self._bounds(start, end)
+        series: Dict[str, Series] = {}
+        for chunk in _chunks(list(dict.fromkeys(symbols))):
+            placeholders = ",".join("?" for _ in chunk)
+            rows = self._query(
+                f"SELECT symbol, ts, price FROM price_points "
+                f"WHERE symbol IN ({placeholders}) AND ts BETWEEN ? AND ? ORDER BY symbol, ts",
+                [*chunk, low, high],
+            )
+            for symbol, ts, price in rows:
+                series.setdefault(symbol, []).append((ts, price))
+        return series
+
+    def read_fx(self, pair: str, start: Optional[Timestamp] = None, end: Optional[Timestamp] = None) -> Series:
+        low, high = self._bounds(start, end)
+        return [
+            (ts, rate)
+            for ts, rate in self._query(
+                "SELECT ts, rate FROM fx_points WHERE pair = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                [pair, low, high],
+            )
+        ]
+
+    def prices_at(self, symbols: Iterable[str], at: Timestamp) -> Dict[str, float]:
+        """各股票在某時間點（含）之前的最後價格，用於重新估值歷史投資組合"""
+        ts = to_epoch(at)
+        prices = {}
+        for chunk in _chunks(list(dict.fromkeys(symbols))):
+            placeholders = ",".join("?" for _ in chunk)
+            # SQLite 在搭配 MAX() 的彙總查詢中，其他欄位取自 ts 最大的那一列
+            rows = self._query(
+                f"SELECT symbol, MAX(ts), price FROM price_points "
+                f"WHERE symbol IN ({placeholders}) AND ts <= ? GROUP BY symbol",
+                [*chunk, ts],
+            )
+            prices.update((symbol, price) for symbol, _, price in rows)
+        return prices
+
+    def fx_at(self, pair: str, at: Timestamp) -> Optional[float]:
+        rows = self._query(
+            "SELECT rate FROM fx_points WHERE pair = ? AND ts <= ? ORDER BY ts DESC LIMIT 1",
+            [pair, to_epoch(at)],
+        )
+        return rows[0][0] if rows else None
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    @staticmethod
+    def _bounds(start: Optional[Timestamp], end: Optional[Timestamp]) -> Tuple[int, int]:
+        low = to_epoch(start) if start is not None else -(2 ** 63)
+        high = to_epoch(end) if end is not None else 2 ** 63 - 1
+        return low, high
+
+    def _write(self, sql: str, params: List[dict]) -> int:
+        if not params:
+            return 0
+        connection = self._connection()
+        with connection:
+            before = connection.total_changes
+            connection.executemany(sql, params)
+            return connection.total_changes - before
+
+    def _query(self, sql: str, params):
+        return self._connection().execute(sql, params).fetchall()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 連線不可跨執行緒共用，每個執行緒各自開啟一條
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=QUOTE_STORE_BUSY_TIMEOUT)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    with connection:
+                        for statement in _SCHEMA:
+                            connection.execute(statement)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+
+def _chunks(symbols: List[str]):
+    # 分段查詢，避免超過 SQLite 的參數數量上限
+    for start in range(0, len(symbols), _MAX_QUERY_PARAMS):
+        yield symbols[start:start + _MAX_QUERY_PARAMS]
+
+
+_default_price_history: Optional[SQLitePriceHistory] = None
+
+
+def get_default_price_history() -> SQLitePriceHistory:
+    """取得預設的共用價格歷史資料庫實例"""
+    global _default_price_history
+    if _default_price_history is None:
+        _default_price_history = SQLitePriceHistory()
+    return _default_price_history
@@ -0,0 +1,208 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Optional
+
+from ..constants import QUOTE_CACHE_MAX_SIZE, QUOTE_CACHE_OPEN_TTL
+from ..utils.market_utils import get_market_from_symbol, get_next_market_open, is_market_open
+from .market_data import MarketDataService, PriceResult, PriceUpdateBatch
+from .price_history import SQLitePriceHistory, get_default_price_history
+from .quote_store import SQLiteQuoteStore, get_default_quote_store
+
+logger = logging.getLogger(__name__)
+
+
+def market_hours_ttl(symbol: str, now: float, open_ttl: float = QUOTE_CACHE_OPEN_TTL) -> float:
+    """開盤中使用短 TTL；收盤後報價不會再變動，有效至下一次開盤"""
+    try:
+        market = get_market_from_symbol(symbol)
+        check_time = datetime.fromtimestamp(now, tz=timezone.utc)
+        if is_market_open(market, check_time):
+            return open_ttl
+        return max(open_ttl, (get_next_market_open(market, check_time) - check_time).total_seconds())
+    except ValueError:
+        return open_ttl
+
+
+@dataclass
+class CachedQuote:
+    result: PriceResult
+    expires_at: float
+
+
+class QuoteCache:
+    def __init__(
+        self,
+        max_size: int = QUOTE_CACHE_MAX_SIZE,
+        open_ttl: float = QUOTE_CACHE_OPEN_TTL,
+        clock: Callable[[], float] = time.time,
+        store: Optional[SQLiteQuoteStore] = None,
+    ):
+        self.max_size = max(1, max_size)
+        self.open_ttl = open_ttl
+        self.clock = clock
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+        self._entries: "OrderedDict[str, CachedQuote]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, symbol: str) -> Optional[PriceResult]:
+        return self.get_many([symbol]).get(symbol)
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, PriceResult]:
+        now = self.clock()
+        found: Dict[str, PriceResult] = {}
+        missing = []
+        with self._lock:
+            for symbol in symbols:
+                entry = self._entries.get(symbol)
+                if entry is None or entry.expires_at <= now:
+                    if entry is not None:
+                        del self._entries[symbol]
+                    missing.append(symbol)
+                    continue
+                self._entries.move_to_end(symbol)
+                found[symbol] = entry.result
+            self.hits += len(found)
+
+        stored = self._read_store(missing) if missing else {}
+        with self._lock:
+            for symbol, (result, expires_at) in stored.items():
+                self._remember(CachedQuote(result=result, expires_at=expires_at))
+                found[symbol] = result
+            self.hits += len(stored)
+            self.store_hits += len(stored)
+            self.misses += len(missing) - len(stored)
+        return found
+
+    def put(self, result: PriceResult) -> None:
+        self.put_many([result])
+
+    def put_many(self, results: Iterable[PriceResult]) -> None:
+        now = self.clock()
+        entries = [
+            CachedQuote(result=result, expires_at=now + market_hours_ttl(result.symbol, now, self.open_ttl))
+            for result in results
+        ]
+        with self._lock:
+            for entry in entries:
+                self._remember(entry)
+        if self.store is not None and entries:
+            try:
+                self.store.put_many((entry.result, entry.expires_at) for entry in entries)
+            except sqlite3.Error as exc:
+                logger.warning("寫入報價資料庫失敗: %s", exc)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.store_hits = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "store_hits": self.store_hits,
+                "size": len(self._entries),
+            }
+
+    def _remember(self, entry: CachedQuote) -> None:
+        symbol = entry.result.symbol
+        self._entries[symbol] = entry
+        self._entries.move_to_end(symbol)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _read_store(self, symbols) -> Dict:
+        if self.store is None:
+            return {}
+        try:
+            return self.store.get_entries(symbols)
+        except sqlite3.Error as exc:
+            logger.warning("讀取報價資料庫失敗: %s", exc)
+            return {}
+
+
+class CachedMarketDataService:
+    """
+    在 MarketDataService 前加上一層報價快取；bypass 時只寫入不讀取（對應 --force）
+
+    實際抓取到的報價同時寫入各股票的價格歷史（快取命中的報價在抓取當時已寫入），
+    CLI、批次更新與舊版 scraper 介面的每次更新都會累積到同一份時間序列。
+    """
+
+    def __init__(
+        self,
+        service: Optional[MarketDataService] = None,
+        cache: Optional[QuoteCache] = None,
+        bypass: bool = False,
+        price_history: Optional[SQLitePriceHistory] = None,
+    ):
+        self.service = service or MarketDataService()
+        self.cache = cache or QuoteCache(store=get_default_quote_store())
+        self.bypass = bypass
+        self.price_history = price_history or get_default_price_history()
+
+    def provider_for_symbol(self, symbol: str):
+        return self.service.provider_for_symbol(symbol)
+
+    async def get_prices(
+        self,
+        symbols: Iterable[str],
+        bypass_cache: Optional[bool] = None,
+    ) -> PriceUpdateBatch:
+        ordered_symbols = list(dict.fromkeys(symbols))
+        bypass = self.bypass if bypass_cache is None else bypass_cache
+
+        cached: Dict[str, PriceResult] = {} if bypass else self.cache.get_many(ordered_symbols)
+
+        missing = [symbol for symbol in ordered_symbols if symbol not in cached]
+        fetched = PriceUpdateBatch(prices={}, failures={})
+        if missing:
+            fetched = await self.service.get_prices(missing)
+            self.cache.put_many(fetched.prices.values())
+            self._record_price_history(fetched)
+        if cached:
+            logger.debug("Quote cache served %s of %s symbols", len(cached), len(ordered_symbols))
+
+        prices: Dict[str, PriceResult] = {}
+        for symbol in ordered_symbols:
+            if symbol in cached:
+                prices[symbol] = cached[symbol]
+            elif symbol in fetched.prices:
+                prices[symbol] = fetched.prices[symbol]
+        return PriceUpdateBatch(prices=prices, failures=dict(fetched.failures))
+
+    def close(self) -> None:
+        self.service.close()
+
+    def _record_price_history(self, batch: PriceUpdateBatch) -> None:
+        if not batch.prices:
+            return
+        try:
+            self.price_history.record_batch(batch)
+        except sqlite3.Error as exc:
+            logger.warning("寫入價格歷史失敗: %s", exc)
+
+
+_default_quote_service: Optional[CachedMarketDataService] = None
+
+
+def get_quote_service() -> CachedMarketDataService:
+    """取得跨呼叫共用的快取報價服務單例"""
+    global _default_quote_service
+    if _default_quote_service is None:
+        _default_quote_service = CachedMarketDataService()
+    return _default_quote_service
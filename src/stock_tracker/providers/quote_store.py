@@ -0,0 +1,160 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from ..constants import QUOTE_STORE_BUSY_TIMEOUT, QUOTE_STORE_PATH
+from .market_data import PriceResult
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    symbol TEXT PRIMARY KEY,
+    price REAL NOT NULL,
+    currency TEXT NOT NULL,
+    retrieved_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    market_timestamp TEXT,
+    extraction_path TEXT,
+    expires_at REAL NOT NULL,
+    stored_at REAL NOT NULL
+)
+"""
+
+_UPSERT = """
+INSERT INTO quotes (
+    symbol, price, currency, retrieved_at, source,
+    market_timestamp, extraction_path, expires_at, stored_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(symbol) DO UPDATE SET
+    price = excluded.price,
+    currency = excluded.currency,
+    retrieved_at = excluded.retrieved_at,
+    source = excluded.source,
+    market_timestamp = excluded.market_timestamp,
+    extraction_path = excluded.extraction_path,
+    expires_at = excluded.expires_at,
+    stored_at = excluded.stored_at
+WHERE excluded.stored_at >= quotes.stored_at
+"""
+
+_MAX_QUERY_PARAMS = 500
+_COLUMNS = "symbol, price, currency, retrieved_at, source, market_timestamp, extraction_path, expires_at"
+
+
+class SQLiteQuoteStore:
+    """以 SQLite（WAL 模式）保存的報價，供 CLI、排程與舊版 scraper 等多個行程共用"""
+
+    def __init__(self, path: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.path = Path(os.path.expanduser(path or os.getenv("QUOTE_STORE_PATH", QUOTE_STORE_PATH)))
+        self.clock = clock
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def get(self, symbol: str) -> Optional[PriceResult]:
+        return self.get_many([symbol]).get(symbol)
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, PriceResult]:
+        return {symbol: result for symbol, (result, _) in self.get_entries(symbols).items()}
+
+    def get_entries(self, symbols: Iterable[str]) -> Dict[str, Tuple[PriceResult, float]]:
+        symbols = list(dict.fromkeys(symbols))
+        now = self.clock()
+        entries = {}
+        # 分段查詢，避免超過 SQLite 的參數數量上限
+        for start in range(0, len(symbols), _MAX_QUERY_PARAMS):
+            chunk = symbols[start:start + _MAX_QUERY_PARAMS]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = self._execute(
+                f"SELECT {_COLUMNS} FROM quotes WHERE expires_at > ? AND symbol IN ({placeholders})",
+                [now, *chunk],
+            )
+            for row in rows:
+                entries[row[0]] = (self._row_to_result(row), row[7])
+        return entries
+
+    def put(self, result: PriceResult, expires_at: float) -> None:
+        self.put_many([(result, expires_at)])
+
+    def put_many(self, entries: Iterable[Tuple[PriceResult, float]]) -> None:
+        stored_at = self.clock()
+        params = [
+            (
+                result.symbol,
+                result.price,
+                result.currency,
+                result.retrieved_at,
+                result.source,
+                result.market_timestamp,
+                result.extraction_path,
+                expires_at,
+                stored_at,
+            )
+            for result, expires_at in entries
+        ]
+        if params:
+            self._execute(_UPSERT, params, many=True)
+
+    def purge_expired(self) -> int:
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute("DELETE FROM quotes WHERE expires_at <= ?", (self.clock(),))
+        return cursor.rowcount
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _execute(self, sql: str, params, many: bool = False):
+        connection = self._connection()
+        with connection:
+            if many:
+                connection.executemany(sql, params)
+                return []
+            return connection.execute(sql, params).fetchall()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 連線不可跨執行緒共用，每個執行緒各自開啟一條
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=QUOTE_STORE_BUSY_TIMEOUT)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    with connection:
+                        connection.execute(_SCHEMA)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _row_to_result(row) -> PriceResult:
+        return PriceResult(
+            symbol=row[0],
+            price=row[1],
+            currency=row[2],
+            retrieved_at=row[3],
+            source=row[4],
+            market_timestamp=row[5],
+            extraction_path=row[6],
+        )
+
+
+_default_quote_store: Optional[SQLiteQuoteStore] = None
+
+
+def get_default_quote_store() -> SQLiteQuoteStore:
+    """取得預設的共用報價資料庫實例"""
+    global _default_quote_store
+    if _default_quote_store is None:
+        _default_quote_store = SQLiteQuoteStore()
+    return _default_quote_store
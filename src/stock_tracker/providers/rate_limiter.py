@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+from ..constants import HOST_RATE_LIMITS, RATE_LIMIT_DEFAULT_BURST, RATE_LIMIT_DEFAULT_RATE
+
+
+class TokenBucket:
+    """令牌桶：每秒補充 rate 個令牌，最多累積 burst 個。
+
+    reserve() 立即扣除令牌並回傳需等待的秒數，令牌可為負數代表已排隊的請求，
+    因此同步與非同步呼叫端可以共用同一個桶而不互相搶位。
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class HostRateLimiter:
+    """依主機名稱分別限速，並記錄每個主機的請求數與等待時間"""
+
+    def __init__(
+        self,
+        limits: Optional[Mapping[str, Tuple[float, int]]] = None,
+        default_rate: Optional[float] = RATE_LIMIT_DEFAULT_RATE,
+        default_burst: int = RATE_LIMIT_DEFAULT_BURST,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limits = dict(HOST_RATE_LIMITS if limits is None else limits)
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.clock = clock
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> Optional[TokenBucket]:
+        with self._lock:
+            if host not in self._buckets:
+                rate, burst = self.limits.get(host, (self.default_rate, self.default_burst))
+                self._buckets[host] = TokenBucket(rate, burst, self.clock) if rate else None
+            return self._buckets[host]
+
+    def reserve(self, url: str) -> float:
+        host = urlsplit(url).hostname or ""
+        bucket = self.bucket(host)
+        wait = bucket.reserve() if bucket is not None else 0.0
+        with self._lock:
+            stats = self._stats.setdefault(
+                host, {"requests": 0, "throttled": 0, "wait_seconds": 0.0, "max_wait": 0.0}
+            )
+            stats["requests"] += 1
+            if wait > 0:
+                stats["throttled"] += 1
+                stats["wait_seconds"] += wait
+                stats["max_wait"] = max(stats["max_wait"], wait)
+        return wait
+
+    def acquire(self, url: str) -> float:
+        """同步呼叫端（執行緒中的 provider）使用：必要時阻塞等待令牌"""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, url: str) -> float:
+        """非同步呼叫端使用：以 asyncio.sleep 等待，不阻塞事件迴圈"""
+        wait = self.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {host: dict(stats) for host, stats in self._stats.items()}
@@ -0,0 +1,128 @@
+import asyncio
+import codecs
+import logging
+from typing import Iterator, Optional
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..constants import (
+    DEFAULT_USER_AGENT,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    REQUEST_TIMEOUT,
+    STREAM_CHUNK_SIZE,
+    STREAM_MAX_BYTES,
+)
+from .rate_limiter import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class HttpTransport:
+    """
+    共用的 keep-alive HTTP 傳輸層，依主機維護連線池
+
+    同步呼叫端（價格來源、匯率抓取）使用連線池化的 requests.Session；
+    非同步呼叫端（Gist 讀寫）使用延遲建立的 aiohttp.ClientSession，其 connector 依主機保持連線。
+    同步請求經過依主機限流的 token bucket（rate_limiter）；
+    非同步呼叫端可自行 await rate_limiter.acquire_async(url)。
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = HTTP_POOL_CONNECTIONS,
+        pool_maxsize: int = HTTP_POOL_MAXSIZE,
+        timeout: float = REQUEST_TIMEOUT,
+        user_agent: str = DEFAULT_USER_AGENT,
+        rate_limiter: Optional[HostRateLimiter] = None,
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = user_agent
+        self._async_session: Optional[aiohttp.ClientSession] = None
+        self._async_loop = None
+
+    def get(self, url: str, headers: Optional[dict] = None, timeout: Optional[float] = None, **kwargs):
+        self.rate_limiter.acquire(url)
+        return self.session.get(
+            url,
+            headers=headers,
+            timeout=timeout if timeout is not None else self.timeout,
+            **kwargs,
+        )
+
+    def iter_text(
+        self,
+        url: str,
+        headers: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        max_bytes: int = STREAM_MAX_BYTES,
+    ) -> Iterator[str]:
+        """逐段讀取回應內容；呼叫端停止迭代時立即關閉連線"""
+        response = self.get(url, headers=headers, timeout=timeout, stream=True)
+        try:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").lower()
+            encoding = response.encoding if "charset" in content_type and response.encoding else "utf-8"
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            bytes_read = 0
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                bytes_read += len(chunk)
+                yield decoder.decode(chunk)
+                if bytes_read >= max_bytes:
+                    logger.debug("Stopped reading %s at byte cap %s", url, max_bytes)
+                    break
+            yield decoder.decode(b"", final=True)
+        finally:
+            response.close()
+
+    def async_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._async_session is None or self._async_session.closed or self._async_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_connections * self.pool_maxsize,
+                limit_per_host=self.pool_maxsize,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            )
+            self._async_session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"User-Agent": self.user_agent},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._async_loop = loop
+        return self._async_session
+
+    def rate_limit_stats(self):
+        return self.rate_limiter.stats()
+
+    def close(self) -> None:
+        self.session.close()
+
+    async def aclose(self) -> None:
+        self.close()
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+        self._async_session = None
+        self._async_loop = None
+
+
+_default_transport: Optional[HttpTransport] = None
+
+
+def get_default_transport() -> HttpTransport:
+    """取得共用 HTTP 傳輸層的單例實例"""
+    global _default_transport
+    if _default_transport is None:
+        _default_transport = HttpTransport()
+    return _default_transport
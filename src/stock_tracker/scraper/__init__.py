@@ -4,13 +4,20 @@ from .finance_scraper import (
     update_stock_price,
     update_multiple_stock_prices
 )
-from .exchange_rate_scraper import get_exchange_rate, update_exchange_rate
+from .exchange_rate_scraper import (
+    ExchangeRateService,
+    get_exchange_rate,
+    get_exchange_rate_service,
+    update_exchange_rate
+)
 
 __all__ = [
     'get_stock_price',
     'get_multiple_stock_prices',
     'update_stock_price',
     'update_multiple_stock_prices',
+    'ExchangeRateService',
     'get_exchange_rate',
+    'get_exchange_rate_service',
     'update_exchange_rate'
 ]
\ No newline at end of file
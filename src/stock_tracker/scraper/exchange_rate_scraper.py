@@ -1,70 +1,196 @@
+import asyncio
+import time
+
 import requests
 from ..exceptions import ScraperError
-from ..constants import DEFAULT_USER_AGENT, REQUEST_TIMEOUT
+from ..constants import (
+    CURRENCIES,
+    DEFAULT_USER_AGENT,
+    EXCHANGE_RATE_API_URL,
+    FX_RATE_TABLE_BASE,
+    FX_RATE_TABLE_TTL,
+    REQUEST_TIMEOUT,
+)
+from ..providers.transport import get_default_transport
 
 
 class ExchangeRateService:
+    """
+    非阻塞的匯率服務
+
+    以單一基準貨幣（預設 USD）向匯率服務取得完整匯率表並快取 TTL 秒，
+    任何貨幣對（包含 HKD-TWD、JPY-TWD 等交叉匯率）都由同一張表換算，
+    因此多個貨幣對只需要一次請求。
+    """
+
+    def __init__(self, transport=None, base_currency=FX_RATE_TABLE_BASE, ttl=FX_RATE_TABLE_TTL, clock=time.time):
+        self.transport = transport
+        self.base_currency = base_currency.upper()
+        self.ttl = ttl
+        self.clock = clock
+        self.requests_made = 0
+        self._rates = None
+        self._fetched_at = None
+        self._refresh = None
+
     async def get_rate(self, currency_pair='USD-TWD'):
-        return await update_exchange_rate(currency_pair)
+        """
+        取得單一貨幣對的匯率
+
+        Args:
+            currency_pair: 貨幣對，例如 'USD-TWD'
+
+        Returns:
+            float: 匯率
+        """
+        rates = await self._rate_table()
+        return _cross_rate(rates, currency_pair)
+
+    async def get_rates(self, currency_pairs=None):
+        """
+        一次取得多個貨幣對的匯率
+
+        Args:
+            currency_pairs: 貨幣對清單；未提供時為 CURRENCIES 中所有貨幣兌 TWD
+
+        Returns:
+            dict: 貨幣對 -> 匯率
+        """
+        if currency_pairs is None:
+            currency_pairs = [f"{currency}-TWD" for currency in CURRENCIES if currency != "TWD"]
+        rates = await self._rate_table()
+        return {pair: _cross_rate(rates, pair) for pair in currency_pairs}
 
-async def update_exchange_rate(currency_pair='USD-TWD'):
+    def invalidate(self):
+        """清除快取的匯率表，下次查詢時重新取得"""
+        self._rates = None
+        self._fetched_at = None
+
+    async def _rate_table(self):
+        if self._rates is not None and self.clock() - self._fetched_at < self.ttl:
+            return self._rates
+
+        # 同時查詢多個貨幣對時共用同一個請求
+        loop = asyncio.get_running_loop()
+        if self._refresh is None or self._refresh.done() or self._refresh.get_loop() is not loop:
+            self._refresh = loop.create_task(self._fetch_table())
+        return await asyncio.shield(self._refresh)
+
+    async def _fetch_table(self):
+        loop = asyncio.get_running_loop()
+        try:
+            rates = await loop.run_in_executor(None, fetch_rate_table, self.base_currency, self.transport)
+        finally:
+            self.requests_made += 1
+        self._rates = rates
+        self._fetched_at = self.clock()
+        return rates
+
+
+async def update_exchange_rate(currency_pair='USD-TWD', transport=None):
     """
-    從 Google Finance 獲取匯率並更新到 API
-    
+    非同步獲取匯率（不阻塞事件迴圈）
+
     Args:
         currency_pair: 貨幣對，例如 'USD-TWD'
-    
+        transport: 共用 HTTP 傳輸層，未提供時使用預設匯率服務
+
     Returns:
-        float: 匯率（四捨五入到小數點後兩位）
+        float: 匯率
     """
     try:
-        # 獲取匯率
-        rate = get_exchange_rate(currency_pair)        
-        return rate
-            
+        service = ExchangeRateService(transport=transport) if transport is not None else get_exchange_rate_service()
+        return await service.get_rate(currency_pair)
+
+    except ScraperError:
+        raise
     except Exception as e:
         raise ScraperError(f"獲取匯率時發生錯誤: {str(e)}")
 
-def get_exchange_rate(currency_pair='USD-TWD'):
+def get_exchange_rate(currency_pair='USD-TWD', transport=None):
     """
-    從免 API key 的公開 JSON 匯率服務獲取匯率
-    
+    從免 API key 的公開 JSON 匯率服務獲取匯率（同步版本）
+
     Args:
         currency_pair: 貨幣對，例如 'USD-TWD'
-    
+        transport: 共用 HTTP 傳輸層，未提供時使用預設實例
+
     Returns:
         float: 匯率（四捨五入到小數點後兩位）
     """
+    base_currency, _ = _split_currency_pair(currency_pair)
+    rates = fetch_rate_table(base_currency, transport=transport)
+    return _cross_rate(rates, currency_pair)
+
+
+def fetch_rate_table(base_currency='USD', transport=None):
+    """
+    取得某基準貨幣的完整匯率表
+
+    Args:
+        base_currency: 基準貨幣，例如 'USD'
+        transport: 共用 HTTP 傳輸層，未提供時使用預設實例
+
+    Returns:
+        dict: 貨幣代碼 -> 1 單位基準貨幣可兌換的數量（包含基準貨幣本身）
+    """
     try:
-        base_currency, target_currency = _split_currency_pair(currency_pair)
-        url = f"https://open.er-api.com/v6/latest/{base_currency}"
+        url = EXCHANGE_RATE_API_URL.format(base=base_currency.upper())
 
         headers = {'User-Agent': DEFAULT_USER_AGENT}
-        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        transport = transport or get_default_transport()
+        response = transport.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
 
         data = response.json()
         if data.get("result") != "success":
             raise ScraperError(f"匯率服務回應失敗: {data.get('result')}")
 
-        rates = data.get("rates") or {}
-        if target_currency not in rates:
-            raise ScraperError(f"無法找到 {currency_pair} 的匯率資訊")
-
-        # 將匯率四捨五入到小數點後兩位
-        exchange_rate = round(float(rates[target_currency]), 2)
-        return exchange_rate
+        rates = {code.upper(): float(value) for code, value in (data.get("rates") or {}).items()}
+        rates.setdefault(base_currency.upper(), 1.0)
+        return rates
 
+    except ScraperError:
+        raise
     except requests.RequestException as e:
         raise ScraperError(f"請求匯率資訊時發生錯誤: {str(e)}")
-    except (ValueError, AttributeError, KeyError) as e:
+    except (ValueError, TypeError, AttributeError, KeyError) as e:
         raise ScraperError(f"解析匯率資訊時發生錯誤: {str(e)}")
     except Exception as e:
         raise ScraperError(f"獲取匯率時發生未預期的錯誤: {str(e)}")
 
 
+def _cross_rate(rates, currency_pair):
+    """由同一張匯率表換算任意貨幣對：rate(A-B) = rates[B] / rates[A]"""
+    try:
+        base_currency, target_currency = _split_currency_pair(currency_pair)
+    except ValueError as e:
+        raise ScraperError(str(e))
+    if base_currency not in rates or target_currency not in rates or not rates[base_currency]:
+        raise ScraperError(f"無法找到 {currency_pair} 的匯率資訊")
+    return _round_rate(rates[target_currency] / rates[base_currency])
+
+
+def _round_rate(rate):
+    # 維持原本四捨五入到小數點後兩位的行為；小於 1 的匯率（如 JPY-TWD）保留更多位數避免失真
+    if abs(rate) >= 1:
+        return round(rate, 2)
+    return round(rate, 6)
+
+
 def _split_currency_pair(currency_pair):
     parts = currency_pair.split("-")
     if len(parts) != 2 or not parts[0] or not parts[1]:
         raise ValueError(f"Invalid currency pair: {currency_pair}")
     return parts[0].upper(), parts[1].upper()
+
+
+_default_exchange_rate_service = None
+
+
+def get_exchange_rate_service():
+    """取得共用匯率服務的單例實例"""
+    global _default_exchange_rate_service
+    if _default_exchange_rate_service is None:
+        _default_exchange_rate_service = ExchangeRateService()
+    return _default_exchange_rate_service
@@ -3,7 +3,8 @@ import logging
 
 from ..api import get_api_client
 from ..exceptions import ScraperError
-from ..providers.market_data import MarketDataService, PriceFailure
+from ..providers.market_data import PriceFailure
+from ..providers.quote_cache import get_quote_service
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +20,7 @@ def get_stock_price(symbol: str) -> dict:
     獲取股價，自動依市場代號路由到對應資料來源。
     """
     try:
-        batch = _run_async(MarketDataService().get_prices([symbol]))
+        batch = _run_async(get_quote_service().get_prices([symbol]))
         if symbol in batch.prices:
             logger.info("成功獲取 %s 價格", symbol)
             return batch.prices[symbol].to_legacy_dict()
@@ -38,7 +39,7 @@ async def update_stock_price(symbol: str) -> dict:
     """
     獲取股價並更新到外部 Portfolio API。API 更新失敗只記錄警告，維持既有容錯行為。
     """
-    batch = await MarketDataService().get_prices([symbol])
+    batch = await get_quote_service().get_prices([symbol])
     if symbol in batch.failures:
         failure = batch.failures[symbol]
         raise ScraperError(failure.message or failure.reason)
@@ -56,7 +57,7 @@ def get_multiple_stock_prices(symbols: list) -> dict:
     同步獲取多個股票的價格，保留舊 public API 的 dict 回傳格式。
     """
     results = {}
-    batch = _run_async(MarketDataService().get_prices(symbols))
+    batch = _run_async(get_quote_service().get_prices(symbols))
     for symbol, result in batch.prices.items():
         results[symbol] = result.to_legacy_dict()
     for failure in batch.failures.values():
@@ -69,7 +70,7 @@ async def update_multiple_stock_prices(symbols: list) -> dict:
     獲取多個股票價格並嘗試同步到外部 Portfolio API。
     """
     results = {}
-    batch = await MarketDataService().get_prices(symbols)
+    batch = await get_quote_service().get_prices(symbols)
     api_client = get_api_client()
 
     for symbol, result in batch.prices.items():
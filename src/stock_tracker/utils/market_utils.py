@@ -1,8 +1,11 @@
-from datetime import datetime, time, timedelta
+import logging
+from datetime import datetime, time, timedelta, timezone
 from zoneinfo import ZoneInfo
 from ..constants import MARKET_HOURS, MARKET_MAPPING
 from typing import Optional  # 添加這行
 
+logger = logging.getLogger(__name__)
+
 
 def get_market_from_symbol(symbol: str) -> str:
     """從股票代號取得市場代碼"""
@@ -74,6 +77,43 @@ def is_market_open(market: str, check_time: datetime = None) -> bool:
         
         return trading_start <= current_time <= trading_end
 
+def get_next_market_open(market: str, check_time: datetime = None) -> datetime:
+    """
+    取得指定市場下一次開盤的時間
+
+    Args:
+        market (str): 市場代碼
+        check_time (datetime, optional): 基準時間，預設為現在
+
+    Returns:
+        datetime: 下一次開盤時間（含時區）
+    """
+    if market not in MARKET_HOURS:
+        raise ValueError(f"Unknown market: {market}")
+
+    market_config = MARKET_HOURS[market]
+    if market in ['NASDAQ', 'NYSE', 'NYSEARCA']:
+        # 美股以美東時間計算，夏令時間由時區資料自動處理
+        market_tz = ZoneInfo('America/New_York')
+        open_time = time(9, 30)
+    else:
+        market_tz = ZoneInfo(market_config['timezone'])
+        open_time = market_config['trading_hours']['start']
+
+    if check_time is None:
+        local_now = datetime.now(market_tz)
+    elif check_time.tzinfo is None:
+        local_now = check_time.replace(tzinfo=market_tz)
+    else:
+        local_now = check_time.astimezone(market_tz)
+
+    for day_offset in range(8):
+        day = (local_now + timedelta(days=day_offset)).date()
+        candidate = datetime.combine(day, open_time, tzinfo=market_tz)
+        if candidate.weekday() in market_config['trading_days'] and candidate > local_now:
+            return candidate
+    raise ValueError(f"No trading day configured for market: {market}")
+
 def should_update_price(symbol: str, last_updated: Optional[str] = None, force_update: bool = False) -> bool:
     """
     判斷是否應該更新股票價格
@@ -63,4 +63,29 @@ def create_portfolio_plots(portfolio_data, output_dir='plots'):
         'asset_allocation': f'{output_dir}/asset_allocation.png',
         'market_distribution': f'{output_dir}/market_distribution.png',
         'currency_distribution': f'{output_dir}/currency_distribution.png'
-    }
\ No newline at end of file
+    }
+
+def create_history_plot(bars, resolution, output_dir='plots'):
+    """
+    生成投資組合總值走勢圖
+
+    Args:
+        bars: HistoryStore.series() 依點數上限選出的 OHLC（長區間自動改用每週或每月彙總）
+        resolution (str): bars 的解析度（daily、weekly、monthly）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    dates = np.array([bar.close_date for bar in bars], dtype='datetime64[D]')
+    closes = [bar.close for bar in bars]
+    labels = {'daily': '每日', 'weekly': '每週', 'monthly': '每月'}
+
+    plt.figure(figsize=(12, 6))
+    plt.plot(dates, closes)
+    if resolution != 'daily':
+        # 彙總期間的高低點範圍
+        plt.fill_between(dates, [bar.low for bar in bars], [bar.high for bar in bars], alpha=0.2)
+    plt.title(f'投資組合總值（{labels.get(resolution, resolution)}）')
+    plt.ylabel('TWD')
+    plt.savefig(f'{output_dir}/portfolio_history.png', bbox_inches='tight', dpi=300)
+    plt.close()
+
+    return f'{output_dir}/portfolio_history.png'
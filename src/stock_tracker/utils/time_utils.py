@@ -15,6 +15,20 @@ def get_current_timestamp(timezone: str = DEFAULT_TIMEZONE) -> str:
     tz = pytz.timezone(timezone)
     return datetime.now(tz).isoformat()
 
+def timestamp_from_epoch(epoch_seconds: float, timezone: str = DEFAULT_TIMEZONE) -> str:
+    """
+    將 Unix 時間（秒）轉為時間戳記
+    
+    Args:
+        epoch_seconds: Unix 時間（秒）
+        timezone: 時區名稱，預設為 Asia/Taipei
+    
+    Returns:
+        str: ISO8601 格式的時間戳記
+    """
+    tz = pytz.timezone(timezone)
+    return datetime.fromtimestamp(epoch_seconds, tz).isoformat()
+
 def format_timestamp(timestamp: str, format: str = DATETIME_FORMAT) -> str:
     """
     格式化時間戳記
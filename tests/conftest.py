@@ -0,0 +1,37 @@
+import logging
+import os
+import tempfile
+
+import pytest
+
+# 匯入 stock_tracker 時 config 會在 LOG_DIR 建立記錄檔；測試改寫到暫存目錄，不弄髒 ./logs
+os.environ["LOG_DIR"] = tempfile.mkdtemp(prefix="stock_tracker-logs-")
+
+from stock_tracker.utils import error_handler  # noqa: E402
+
+# error_handler 裝飾器在匯入時就會設定 ./logs 記錄檔；須在匯入 CLI 之前替換
+error_handler.setup_logging = lambda: logging.getLogger("StockTracker")
+
+import stock_tracker.__main__ as cli  # noqa: E402
+from stock_tracker.providers import price_history, quote_cache, quote_store, transport  # noqa: E402
+from stock_tracker.scraper import exchange_rate_scraper  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_quote_service(monkeypatch, tmp_path):
+    """每個測試使用獨立的報價快取與報價資料庫，避免前一個測試的報價被重用"""
+    monkeypatch.setenv("QUOTE_STORE_PATH", str(tmp_path / "quotes.sqlite3"))
+    monkeypatch.setenv("PRICE_HISTORY_PATH", str(tmp_path / "price-history.sqlite3"))
+    monkeypatch.setenv("CIRCUIT_STATE_PATH", str(tmp_path / "circuits.json"))
+    monkeypatch.setenv("PROVIDER_HEALTH_PATH", str(tmp_path / "provider-health.json"))
+    monkeypatch.setattr(quote_cache, "_default_quote_service", None)
+    monkeypatch.setattr(quote_store, "_default_quote_store", None)
+    monkeypatch.setattr(price_history, "_default_price_history", None)
+    monkeypatch.setattr(transport, "_default_transport", None)
+    monkeypatch.setattr(exchange_rate_scraper, "_default_exchange_rate_service", None)
+
+
+@pytest.fixture(autouse=True)
+def no_log_files(monkeypatch):
+    """測試不寫入 ./logs 下的記錄檔"""
+    monkeypatch.setattr(cli, "setup_logging", lambda: logging.getLogger(cli.__name__))
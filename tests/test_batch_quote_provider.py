@@ -0,0 +1,174 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from stock_tracker.providers.market_data import (
+    BasePriceProvider,
+    MarketDataService,
+    PriceResult,
+    TwseBatchQuoteProvider,
+    YahooBatchQuoteProvider,
+)
+
+STUB_PRICES = {"AAPL": 280.25, "MSFT": 410.5, "VTI": 260.0, "NVDA": 900.0, "TSLA": 213.65}
+STUB_TW_PRICES = {"tse_2330.tw": "1060.0000", "otc_6488.tw": "512.0000", "tse_0050.tw": "-"}
+
+
+class StubQuoteHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.endswith("getStockInfo.jsp"):
+            channels = query.get("ex_ch", [""])[0].split("|")
+            self.requests_seen.append(channels)
+            self._send_json(
+                {
+                    "msgArray": [
+                        {
+                            "ex": channel.split("_")[0],
+                            "c": channel.split("_")[1].split(".")[0].upper(),
+                            "z": STUB_TW_PRICES[channel],
+                            "tlong": "1778132760000",
+                        }
+                        for channel in channels
+                        if channel in STUB_TW_PRICES
+                    ],
+                    "rtcode": "0000",
+                }
+            )
+            return
+
+        symbols = query.get("symbols", [""])[0].split(",")
+        self.requests_seen.append(symbols)
+        self._send_json(
+            {
+                "quoteResponse": {
+                    "result": [
+                        {
+                            "symbol": symbol,
+                            "regularMarketPrice": STUB_PRICES[symbol],
+                            "currency": "USD",
+                            "regularMarketTime": 1778097600,
+                        }
+                        for symbol in symbols
+                        if symbol in STUB_PRICES
+                    ],
+                    "error": None,
+                }
+            }
+        )
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        return None
+
+
+@pytest.fixture
+def stub_quote_server():
+    StubQuoteHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubQuoteHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", StubQuoteHandler.requests_seen
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class PageProvider(BasePriceProvider):
+    source = "PageProvider"
+    supported_exchanges = ("NASDAQ", "NYSE", "NYSEARCA", "TPE", "TWO")
+
+    def __init__(self):
+        self.requested = []
+
+    def fetch_price(self, symbol):
+        self.requested.append(symbol)
+        return PriceResult(
+            symbol=symbol,
+            price=1.0,
+            currency="USD",
+            retrieved_at="2026-05-07T14:26:00+08:00",
+            source=self.source,
+        )
+
+
+def test_twse_provider_normalizes_exchange_channels():
+    provider = TwseBatchQuoteProvider()
+
+    assert provider.normalize_symbol("2330:TPE") == "tse_2330.tw"
+    assert provider.normalize_symbol("2330:TWSE") == "tse_2330.tw"
+    assert provider.normalize_symbol("6488:TWO") == "otc_6488.tw"
+
+
+def test_twse_provider_prices_a_chunk_per_round_trip_and_falls_back_without_trade(stub_quote_server):
+    server_url, requests_seen = stub_quote_server
+    fallback = PageProvider()
+    service = MarketDataService(
+        providers=[
+            TwseBatchQuoteProvider(base_url=f"{server_url}/stock/api/getStockInfo.jsp"),
+            fallback,
+        ],
+    )
+
+    batch = asyncio.run(service.get_prices(["2330:TPE", "6488:TWO", "0050:TPE"]))
+
+    assert batch.prices["2330:TPE"].price == 1060.0
+    assert batch.prices["2330:TPE"].market_timestamp.startswith("2026-05-07T")
+    assert batch.prices["6488:TWO"].price == 512.0
+    assert batch.prices["0050:TPE"].source == "PageProvider"
+    assert requests_seen == [["tse_2330.tw", "otc_6488.tw", "tse_0050.tw"]]
+    assert fallback.requested == ["0050:TPE"]
+
+
+def test_batch_provider_fetches_chunks_in_one_request_each(stub_quote_server):
+    server_url, requests_seen = stub_quote_server
+    provider = YahooBatchQuoteProvider(base_url=f"{server_url}/v7/finance/quote", batch_size=2)
+    service = MarketDataService(providers=[provider])
+    symbols = ["AAPL:NASDAQ", "MSFT:NASDAQ", "VTI:NYSEARCA", "NVDA:NASDAQ", "TSLA:NASDAQ"]
+
+    batch = asyncio.run(service.get_prices(symbols))
+
+    assert list(batch.prices) == symbols
+    assert batch.prices["VTI:NYSEARCA"].price == 260.0
+    assert batch.prices["AAPL:NASDAQ"].market_timestamp.startswith("2026-05-07T")
+    assert batch.prices["AAPL:NASDAQ"].extraction_path == "batch_json"
+    assert len(requests_seen) == 3
+
+
+def test_batch_provider_reports_missing_symbols_and_service_falls_back(stub_quote_server):
+    server_url, requests_seen = stub_quote_server
+    fallback = PageProvider()
+    service = MarketDataService(
+        providers=[YahooBatchQuoteProvider(base_url=f"{server_url}/v7/finance/quote"), fallback],
+    )
+
+    batch = asyncio.run(service.get_prices(["AAPL:NASDAQ", "GONE:NYSE"]))
+
+    assert batch.prices["AAPL:NASDAQ"].source == "YahooBatchQuoteProvider"
+    assert batch.prices["GONE:NYSE"].source == "PageProvider"
+    assert fallback.requested == ["GONE:NYSE"]
+    assert requests_seen == [["AAPL", "GONE"]]
+
+
+def test_batch_provider_marks_every_symbol_on_http_error():
+    provider = YahooBatchQuoteProvider(base_url="http://127.0.0.1:9/v7/finance/quote")
+
+    batch = provider.fetch_batch(["AAPL:NASDAQ", "MSFT:NASDAQ"])
+
+    assert batch.prices == {}
+    assert {failure.reason for failure in batch.failures.values()} == {"provider_http_error"}
@@ -1,15 +1,21 @@
 import asyncio
 import sys
+
+import pytest
 from types import SimpleNamespace
 
 import stock_tracker.__main__ as cli
 
 
 class FakePortfolioManager:
-    def __init__(self, status):
+    def __init__(self, status, init_error=None):
         self.status = status
+        self.init_error = init_error
+        self.closed = False
 
     async def initialize(self):
+        if self.init_error:
+            raise self.init_error
         return self
 
     async def update_prices(self):
@@ -18,9 +24,12 @@ class FakePortfolioManager:
     def print_portfolio(self):
         return None
 
+    async def aclose(self):
+        self.closed = True
+
 
-def run_cli_with_status(monkeypatch, status):
-    manager = FakePortfolioManager(status)
+def run_cli_with_status(monkeypatch, status, manager=None):
+    manager = manager or FakePortfolioManager(status)
     monkeypatch.setenv("GIST_ID", "gist-id")
     monkeypatch.setenv("GIST_TOKEN", "gist-token")
     monkeypatch.setattr(cli, "GistManager", lambda *args, **kwargs: object())
@@ -40,3 +49,12 @@ def test_cli_returns_non_zero_for_partial_success(monkeypatch):
 
 def test_cli_returns_non_zero_for_failed(monkeypatch):
     assert run_cli_with_status(monkeypatch, "failed") == 1
+
+
+def test_cli_closes_manager_when_initialize_fails(monkeypatch):
+    manager = FakePortfolioManager("success", init_error=FileNotFoundError("gist unavailable"))
+
+    with pytest.raises(FileNotFoundError):
+        run_cli_with_status(monkeypatch, "success", manager)
+
+    assert manager.closed
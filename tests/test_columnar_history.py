@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from stock_tracker.portfolio.columnar_history import ColumnarHistory, ordinals_to_dates
+from stock_tracker.portfolio.history_store import HistoryStore
+
+HISTORY_PATH = Path(__file__).resolve().parents[1] / "portfolio-history.json"
+
+
+def document(*points):
+    return {
+        "updatedAt": "2026-05-07T14:00:00+08:00",
+        "values": [{"date": day, "totalValueTwd": value} for day, value in points],
+    }
+
+
+def test_round_trips_repository_history_file(tmp_path):
+    history = ColumnarHistory.from_history_file(HISTORY_PATH)
+    original = json.loads(HISTORY_PATH.read_text(encoding="utf-8"))
+
+    assert history.days.dtype == np.int32
+    assert history.values.dtype == np.float64
+    assert len(history) == len(original["values"])
+
+    output = tmp_path / "portfolio-history.json"
+    history.write_history_file(output)
+    converted = json.loads(output.read_text(encoding="utf-8"))
+    assert converted["updatedAt"] == original["updatedAt"]
+    assert [(entry["date"], entry["totalValueTwd"]) for entry in converted["values"]] == sorted(
+        (entry["date"], entry["totalValueTwd"]) for entry in original["values"]
+    )
+
+
+def test_open_memory_maps_columns_for_range_queries(tmp_path):
+    ColumnarHistory.from_document(document(
+        ("2026-05-06", 110.0),
+        ("2026-05-04", 100.0),
+        ("2026-05-05", 90.0),
+        ("2026-05-08", 120.0),
+    )).save(tmp_path / "history.columns")
+
+    history = ColumnarHistory.open(tmp_path / "history.columns")
+    days, values = history.range("2026-05-05", "2026-05-07")
+
+    assert isinstance(history.values, np.memmap)
+    assert ordinals_to_dates(days) == ["2026-05-05", "2026-05-06"]
+    assert values.tolist() == [90.0, 110.0]
+    assert history.aggregate("2026-05-05") == {
+        "count": 3, "first": 90.0, "last": 120.0, "min": 90.0, "max": 120.0,
+        "mean": (90.0 + 110.0 + 120.0) / 3, "change": 30.0,
+    }
+    assert history.aggregate("2027-01-01") == {"count": 0}
+
+
+def test_history_store_compaction_refreshes_columnar_copy(tmp_path):
+    store = HistoryStore(tmp_path / "portfolio-history.json")
+    store.upsert({"date": "2026-05-05", "totalValueTwd": 900.0, "sourceUpdatedAt": "a"})
+    store.upsert({"date": "2026-05-06", "totalValueTwd": 950.0, "sourceUpdatedAt": "b"})
+    store.compact(force=True)
+
+    history = ColumnarHistory.open(store.columnar_path)
+    assert history.values.tolist() == [900.0, 950.0]
+    assert history.updated_at == "b"
+
+
+def test_malformed_entries_are_skipped(tmp_path):
+    history = ColumnarHistory.from_document(
+        document(("2026-05-06", 110.0), ("bad", 1.0), ("2026-05-05", "n/a"), ("2026-05-05", 90.0))
+    )
+    assert ordinals_to_dates(history.days) == ["2026-05-05", "2026-05-06"]
+    assert history.values.tolist() == [90.0, 110.0]
+
+    store = HistoryStore(tmp_path / "portfolio-history.json")
+    store.replace(document(("2026-05-05", 90.0), ("bad", 1.0)))
+    store.upsert({"date": "2026-05-06", "totalValueTwd": 110.0, "sourceUpdatedAt": "b"})
+    assert store.compact() is True
+    assert ColumnarHistory.open(store.columnar_path).values.tolist() == [90.0, 110.0]
@@ -1,6 +1,10 @@
+import asyncio
 from unittest.mock import MagicMock, patch
 
-from stock_tracker.scraper.exchange_rate_scraper import get_exchange_rate
+import pytest
+
+from stock_tracker.exceptions import ScraperError
+from stock_tracker.scraper.exchange_rate_scraper import ExchangeRateService, get_exchange_rate
 
 
 def test_get_exchange_rate_reads_twd_from_public_json_endpoint():
@@ -13,5 +17,47 @@ def test_get_exchange_rate_reads_twd_from_public_json_endpoint():
         },
     }
 
-    with patch("requests.get", return_value=response):
+    with patch("requests.Session.get", return_value=response):
         assert get_exchange_rate("USD-TWD") == 31.65
+
+
+def _rate_table_response():
+    response = MagicMock()
+    response.json.return_value = {
+        "result": "success",
+        "base_code": "USD",
+        "rates": {"USD": 1, "TWD": 31.653294, "HKD": 7.8, "CNY": 7.2, "JPY": 150.0},
+    }
+    return response
+
+
+def test_exchange_rate_service_serves_all_pairs_from_one_cached_table():
+    now = [0.0]
+    service = ExchangeRateService(ttl=60, clock=lambda: now[0])
+
+    async def fetch_all():
+        return await asyncio.gather(
+            service.get_rates(),
+            service.get_rate("USD-TWD"),
+            service.get_rate("HKD-JPY"),
+        )
+
+    with patch("requests.Session.get", return_value=_rate_table_response()) as get:
+        rates, usd_twd, hkd_jpy = asyncio.run(fetch_all())
+        assert get.call_count == 1
+
+        assert rates == {"USD-TWD": 31.65, "HKD-TWD": 4.06, "CNY-TWD": 4.4, "JPY-TWD": 0.211022}
+        assert usd_twd == 31.65
+        assert hkd_jpy == 19.23
+
+        now[0] = 61
+        asyncio.run(service.get_rate("USD-TWD"))
+        assert get.call_count == 2
+
+
+def test_exchange_rate_service_reports_missing_currency():
+    service = ExchangeRateService()
+
+    with patch("requests.Session.get", return_value=_rate_table_response()):
+        with pytest.raises(ScraperError):
+            asyncio.run(service.get_rate("USD-EUR"))
@@ -0,0 +1,101 @@
+import json
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import stock_tracker.__main__ as cli
+from stock_tracker.portfolio.analytics import HistoryAnalytics
+
+
+def document(values, start=date(2026, 1, 1)):
+    return {
+        "updatedAt": "now",
+        "values": [
+            {"date": (start + timedelta(days=offset)).isoformat(), "totalValueTwd": value}
+            for offset, value in enumerate(values)
+        ],
+    }
+
+
+def test_returns_drawdown_and_periods():
+    analytics = HistoryAnalytics.from_document(document([100.0, 110.0, 99.0, 120.0, 108.0]))
+
+    assert analytics.daily_returns() == pytest.approx([0.1, -0.1, 120 / 99 - 1, -0.1])
+    drawdown = analytics.max_drawdown()
+    assert drawdown.depth == pytest.approx(-0.1)
+    assert (drawdown.peak_date, drawdown.trough_date, drawdown.recovery_date) == (
+        "2026-01-02", "2026-01-03", "2026-01-04"
+    )
+
+    stats = analytics.stats(window=2, period="week")
+    assert stats.total_return == pytest.approx(0.08)
+    assert stats.best_day.period == "2026-01-04"
+    assert stats.worst_day.value == pytest.approx(-0.1)
+    # 2026-01-01 為星期四：第一週到 01-04，第二週從 01-05 開始
+    labels, returns = analytics.period_returns("week")
+    assert labels == ["2025-12-29", "2026-01-05"]
+    assert returns == pytest.approx([0.2, -0.1])
+
+
+def test_rolling_volatility_matches_direct_std():
+    rng = np.random.default_rng(7)
+    values = 1000 * np.cumprod(1 + rng.normal(0, 0.01, 300))
+    analytics = HistoryAnalytics.from_document(document(values.tolist()))
+
+    rolling = analytics.rolling_volatility(window=20, annualize=False)
+    returns = analytics.daily_returns()
+    expected = [returns[end - 20:end].std(ddof=1) for end in range(20, len(returns) + 1)]
+    assert rolling == pytest.approx(expected)
+
+
+def test_keeps_last_point_per_day_and_computes_cagr():
+    analytics = HistoryAnalytics(
+        days=[date(2024, 1, 1).toordinal(), date(2024, 1, 1).toordinal(), date(2025, 1, 1).toordinal()],
+        values=[50.0, 100.0, 121.0],
+    )
+
+    assert analytics.values.tolist() == [100.0, 121.0]
+    assert analytics.cagr() == pytest.approx(1.21 ** (365.25 / 366) - 1)
+
+
+def test_stats_over_decades_is_fast():
+    rng = np.random.default_rng(1)
+    values = 1e7 * np.cumprod(1 + rng.normal(0.0003, 0.01, 365 * 30))
+    start = date(1996, 1, 1).toordinal()
+    analytics = HistoryAnalytics(np.arange(start, start + len(values)), values)
+
+    began = time.perf_counter()
+    stats = analytics.stats(period="month")
+    assert time.perf_counter() - began < 1
+    assert stats.points == len(values)
+    assert stats.max_drawdown.depth < 0
+
+
+def test_history_stats_command(tmp_path, monkeypatch, capsys):
+    history_path = tmp_path / "portfolio-history.json"
+    history_path.write_text(json.dumps(document([100.0, 110.0, 99.0])), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["stock_tracker", "history", "stats", "--history", str(history_path)])
+
+    assert cli.main() == 0
+    output = capsys.readouterr().out
+    assert "歷史績效統計 (2026-01-01 ~ 2026-01-03, 3 筆)" in output
+    assert "最大回撤: -10.00%" in output
+
+
+def test_history_stats_command_uses_coarser_series_over_point_budget(tmp_path, monkeypatch, capsys):
+    history_path = tmp_path / "portfolio-history.json"
+    history_path.write_text(json.dumps(document([100.0 + offset for offset in range(60)])), encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", [
+        "stock_tracker", "history", "stats", "--history", str(history_path), "--max-points", "10",
+    ])
+
+    assert cli.main() == 0
+    output = capsys.readouterr().out
+    # 60 天超過 10 點上限，改用每週收盤：2026-01-01 ~ 2026-03-01 橫跨 9 週，各週以星期日收盤
+    assert "歷史績效統計 (2026-01-04 ~ 2026-03-01, 9 筆)" in output
+    assert "資料解析度: 每週收盤" in output
+    assert "最佳單週" in output
@@ -0,0 +1,131 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from stock_tracker.portfolio.history_store import HistoryStore
+from stock_tracker.portfolio.rollups import HistoryRollups, RollupBar, bucket_end
+
+
+def entry(day, value):
+    return {"date": day, "totalValueTwd": value, "sourceUpdatedAt": f"{day}T14:00:00+08:00"}
+
+
+def test_rollups_follow_upserts_including_replaced_highs(tmp_path):
+    store = HistoryStore(tmp_path / "portfolio-history.json")
+    # 2026-04-27 為星期一
+    for day, value in [("2026-04-27", 100.0), ("2026-04-29", 130.0), ("2026-04-28", 90.0), ("2026-05-01", 110.0)]:
+        store.upsert(entry(day, value))
+
+    assert store.rollup("weekly") == [RollupBar("2026-04-27", 100.0, 130.0, 90.0, 110.0, 4, "2026-05-01")]
+    assert store.rollup("monthly") == [
+        RollupBar("2026-04-01", 100.0, 130.0, 90.0, 130.0, 3, "2026-04-29"),
+        RollupBar("2026-05-01", 110.0, 110.0, 110.0, 110.0, 1, "2026-05-01"),
+    ]
+
+    # 同日重新寫入較低的值：原本的最高點需從該週與該月移除
+    store.upsert(entry("2026-04-29", 95.0))
+    assert store.rollup("weekly")[0].high == 110.0
+    assert store.rollup("monthly")[0].to_dict() == {
+        "period": "2026-04-01", "open": 100.0, "high": 100.0, "low": 90.0, "close": 95.0, "count": 3,
+        "close_date": "2026-04-29",
+    }
+
+    rebuilt = HistoryRollups()
+    rebuilt.rebuild(store._dates, store._numbers)
+    for resolution in ("weekly", "monthly"):
+        assert rebuilt.bars(resolution) == store.rollup(resolution)
+
+
+def test_series_picks_resolution_within_point_budget(tmp_path):
+    start = date(2020, 1, 1)
+    document = {
+        "updatedAt": "seed",
+        "values": [entry((start + timedelta(days=offset)).isoformat(), float(offset)) for offset in range(3 * 366)],
+    }
+    store = HistoryStore(tmp_path / "portfolio-history.json")
+    store.replace(document)
+
+    resolution, bars = store.series("2021-03-01", "2021-03-31", max_points=100)
+    assert resolution == "daily"
+    assert len(bars) == 31
+
+    resolution, bars = store.series("2021-01-01", "2021-12-31", max_points=100)
+    assert resolution == "weekly"
+    assert bars[0].period == "2020-12-28"
+
+    resolution, bars = store.series(max_points=100)
+    assert resolution == "monthly"
+    assert len(bars) == 37
+    assert bars[1].to_dict() == {
+        "period": "2020-02-01", "open": 31.0, "high": 59.0, "low": 31.0, "close": 59.0, "count": 29,
+        "close_date": "2020-02-29",
+    }
+
+
+def test_bucket_end_handles_month_lengths():
+    assert bucket_end("2024-02-10", "monthly") == "2024-02-29"
+    assert bucket_end("2026-12-31", "monthly") == "2026-12-31"
+    assert bucket_end("2026-05-07", "weekly") == "2026-05-10"
+
+
+def test_malformed_dates_are_skipped_not_fatal(tmp_path):
+    path = tmp_path / "portfolio-history.json"
+    path.write_text(json.dumps({
+        "updatedAt": "seed",
+        "values": [entry("2026-04-27", 100.0), {"date": "bad", "totalValueTwd": 1.0}],
+    }), encoding="utf-8")
+
+    store = HistoryStore(path)
+    store.upsert(entry("2026-04-28", 120.0))
+    store.upsert({"date": "2026-13-01", "totalValueTwd": 5.0})
+
+    assert store.rollup("weekly") == [RollupBar("2026-04-27", 100.0, 120.0, 100.0, 120.0, 2, "2026-04-28")]
+    assert [bar.period for bar in store.rollup("daily")] == ["2026-04-27", "2026-04-28"]
+    assert store.get("bad") == {"date": "bad", "totalValueTwd": 1.0}
+
+    rollups = HistoryRollups()
+    rollups.rebuild(["2026-04-27", "bad"], [100.0, 1.0])
+    rollups.refresh("bad", ["2026-04-27", "bad"], [100.0, 1.0])
+    assert rollups.bars("monthly") == [RollupBar("2026-04-01", 100.0, 100.0, 100.0, 100.0, 1, "2026-04-27")]
+
+
+def test_rollups_are_persisted_at_compaction_and_reused_on_load(tmp_path, monkeypatch):
+    path = tmp_path / "portfolio-history.json"
+    store = HistoryStore(path)
+    for day, value in [("2026-04-27", 100.0), ("2026-04-29", 130.0), ("2026-05-04", 90.0)]:
+        store.upsert(entry(day, value))
+    store.compact(force=True)
+    assert store.rollups_path.exists()
+
+    def rebuild(self, dates, values):
+        raise AssertionError("rollups should be loaded, not rebuilt")
+
+    monkeypatch.setattr(HistoryRollups, "rebuild", rebuild)
+    reloaded = HistoryStore(path)
+    for resolution in ("weekly", "monthly"):
+        assert reloaded.rollup(resolution) == store.rollup(resolution)
+
+    # 載入後的更新仍只重算所在期間
+    reloaded.upsert(entry("2026-05-05", 95.0))
+    assert reloaded.rollup("weekly")[-1] == RollupBar("2026-05-04", 90.0, 95.0, 90.0, 95.0, 2, "2026-05-05")
+
+
+def test_load_series_reads_columnar_copy_and_rollups_without_parsing_json(tmp_path, monkeypatch):
+    path = tmp_path / "portfolio-history.json"
+    start = date(2020, 1, 1)
+    store = HistoryStore(path)
+    store.replace({
+        "updatedAt": "seed",
+        "values": [entry((start + timedelta(days=offset)).isoformat(), float(offset)) for offset in range(400)],
+    })
+    store.compact()
+    expected = {
+        budget: store.series("2020-02-01", None, max_points=budget)
+        for budget in (400, 100, 10)
+    }
+
+    monkeypatch.setattr(HistoryStore, "_load", lambda self: pytest.fail("JSON history should not be parsed"))
+    for budget, (resolution, bars) in expected.items():
+        assert HistoryStore.load_series(path, "2020-02-01", max_points=budget) == (resolution, bars)
+    assert [resolution for resolution, _ in expected.values()] == ["daily", "weekly", "monthly"]
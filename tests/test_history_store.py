@@ -0,0 +1,76 @@
+import json
+
+from stock_tracker.portfolio.history_store import HistoryStore
+
+
+def entry(date, value):
+    return {"date": date, "totalValueTwd": value, "sourceUpdatedAt": f"{date}T14:00:00+08:00"}
+
+
+def test_upsert_keeps_dates_sorted_and_replaces_same_day(tmp_path):
+    store = HistoryStore(tmp_path / "portfolio-history.json", compact_every=10)
+
+    store.upsert(entry("2026-05-07", 1000.0))
+    store.upsert(entry("2026-05-05", 900.0))
+    store.upsert(entry("2026-05-06", 950.0))
+    store.upsert(entry("2026-05-06", 960.0))
+
+    exported = store.export()
+    assert [value["date"] for value in exported["values"]] == ["2026-05-05", "2026-05-06", "2026-05-07"]
+    assert store.get("2026-05-06")["totalValueTwd"] == 960.0
+    assert exported["updatedAt"] == "2026-05-06T14:00:00+08:00"
+    assert [value["date"] for value in store.range("2026-05-06", "2026-05-07")] == ["2026-05-06", "2026-05-07"]
+
+
+def test_updates_are_appended_to_segment_and_replayed_until_compaction(tmp_path):
+    path = tmp_path / "portfolio-history.json"
+    path.write_text(json.dumps({"updatedAt": "seed", "values": [entry("2026-05-05", 900.0)]}), encoding="utf-8")
+
+    store = HistoryStore(path, compact_every=3)
+    store.upsert(entry("2026-05-06", 950.0))
+    assert store.compact() is False
+    assert len(store.segment_path.read_text(encoding="utf-8").splitlines()) == 1
+    assert json.loads(path.read_text(encoding="utf-8"))["updatedAt"] == "seed"
+
+    reopened = HistoryStore(path, compact_every=1)
+    assert len(reopened) == 2
+    assert reopened.compact() is True
+    assert not reopened.segment_path.exists()
+    assert json.loads(path.read_text(encoding="utf-8")) == reopened.export()
+
+
+def test_replace_adopts_external_document(tmp_path):
+    store = HistoryStore(tmp_path / "portfolio-history.json")
+    store.upsert(entry("2026-05-01", 1.0))
+    document = {"updatedAt": "gist", "values": [entry("2026-05-06", 2.0), entry("2026-05-05", 3.0)]}
+
+    assert not store.matches(document)
+    store.replace(document)
+    store.compact()
+
+    assert [value["date"] for value in store.export()["values"]] == ["2026-05-05", "2026-05-06"]
+    assert HistoryStore(tmp_path / "portfolio-history.json").export() == store.export()
+
+
+def test_segment_appends_every_update_and_compacts_every_n(tmp_path):
+    store = HistoryStore(tmp_path / "portfolio-history.json", compact_every=4)
+    rewrites = 0
+    for day in range(1, 11):
+        store.upsert(entry(f"2026-05-{day:02d}", float(day)))
+        if store.needs_compaction():
+            rewrites += store.compact()
+
+    assert rewrites == 2
+    assert len(store.segment_path.read_text(encoding="utf-8").splitlines()) == 2
+    assert len(json.loads(store.path.read_text(encoding="utf-8"))["values"]) == 8
+    assert HistoryStore(store.path).export() == store.export()
+
+
+def test_large_segment_triggers_compaction(tmp_path):
+    store = HistoryStore(tmp_path / "portfolio-history.json", compact_every=100, compact_bytes=200)
+    store.upsert(entry("2026-05-05", 1.0))
+    assert not store.needs_compaction()
+
+    store.upsert(entry("2026-05-06", 2.0))
+    assert store.needs_compaction()
+    assert HistoryStore(store.path, compact_every=100, compact_bytes=200).needs_compaction()
@@ -0,0 +1,89 @@
+import json
+import sys
+
+from stock_tracker.portfolio.calculator import PortfolioCalculator
+from stock_tracker.portfolio.holdings import (
+    Holding,
+    dump_portfolio_document,
+    load_portfolio_document,
+)
+
+
+def test_portfolio_document_round_trips_losslessly():
+    document = {
+        "totalValue": 1000.0,
+        "exchange rate": "31.54",
+        "stocks": [
+            {
+                "name": "2330:TPE",
+                "quantity": 3,
+                "price": 100.0,
+                "currency": "TWD",
+                "lastUpdated": None,
+                "percentageOfTotal": 30.0,
+                "note": "core",
+            },
+            {"name": "AAPL:NASDAQ", "price": 10.0, "quantity": 2.5, "currency": "USD"},
+        ],
+    }
+
+    portfolio = load_portfolio_document(json.loads(json.dumps(document)))
+    assert all(isinstance(stock, Holding) for stock in portfolio["stocks"])
+
+    dumped = dump_portfolio_document(portfolio)
+    assert json.dumps(dumped) == json.dumps(document)
+
+
+def test_holdings_are_updated_through_attributes():
+    portfolio = load_portfolio_document(
+        {"stocks": [{"name": "AAPL:NASDAQ", "price": 10.0, "quantity": 2, "currency": "USD"}]}
+    )
+    stocks = portfolio["stocks"]
+
+    total = PortfolioCalculator.calculate_total_value(stocks, 32.0)
+    PortfolioCalculator.update_percentages(stocks, total, 32.0)
+
+    assert stocks[0].percentage_of_total == 100.0
+    assert dump_portfolio_document(portfolio)["stocks"][0]["percentageOfTotal"] == 100.0
+
+
+def test_holding_is_smaller_than_stock_dict():
+    data = {
+        "name": "2330:TPE",
+        "price": 100.0,
+        "quantity": 3,
+        "currency": "TWD",
+        "lastUpdated": "2026-04-28T14:21:53+08:00",
+        "percentageOfTotal": 30.0,
+    }
+    holding = Holding.from_dict(data)
+
+    assert not hasattr(holding, "__dict__")
+    assert sys.getsizeof(holding) * 2 < sys.getsizeof(data)
+
+
+def test_updater_accepts_stock_dicts_and_holdings(monkeypatch):
+    from stock_tracker.portfolio import updater
+
+    monkeypatch.setattr(updater, "get_multiple_stock_prices", lambda symbols: {
+        "AAPL:NASDAQ": {"price": 12.5, "timestamp": "2026-05-04T15:00:00+08:00"},
+        "2330:TPE": {"price": 120.0, "timestamp": "2026-05-04T15:00:01+08:00"},
+    })
+    stocks = [
+        {"name": "AAPL:NASDAQ", "price": 10.0, "quantity": 2, "currency": "USD", "note": "kept"},
+        Holding("2330:TPE", 100.0, 3, "TWD"),
+    ]
+
+    counts = updater.PortfolioUpdater.update_stock_prices(stocks, ["AAPL:NASDAQ", "2330:TPE"])
+
+    assert counts == {"us": 1, "local": 1}
+    assert stocks[0] == {
+        "name": "AAPL:NASDAQ",
+        "price": 12.5,
+        "quantity": 2,
+        "currency": "USD",
+        "note": "kept",
+        "lastUpdated": "2026-05-04T15:00:00+08:00",
+    }
+    assert stocks[1].price == 120.0
+    assert stocks[1].last_updated == "2026-05-04T15:00:01+08:00"
@@ -0,0 +1,83 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from stock_tracker.gist_utils import GistManager
+from stock_tracker.portfolio.portfolio_manager import PortfolioManager
+from stock_tracker.providers.market_data import MarketDataService
+from stock_tracker.providers.rate_limiter import HostRateLimiter
+from stock_tracker.providers.transport import HttpTransport
+
+
+def test_transport_mounts_pooled_adapter_with_configured_sizes():
+    transport = HttpTransport(pool_connections=3, pool_maxsize=7)
+
+    adapter = transport.session.get_adapter("https://tw.stock.yahoo.com/quote/2330.TW/")
+
+    assert adapter._pool_connections == 3
+    assert adapter._pool_maxsize == 7
+    assert transport.session.get_adapter("https://finance.yahoo.com/") is adapter
+
+
+def test_market_data_service_hands_transport_to_default_providers():
+    transport = HttpTransport()
+    response = MagicMock()
+    response.text = '{"regularMarketPrice":{"raw":100.50}}'
+    transport.session.get = MagicMock(return_value=response)
+
+    service = MarketDataService(transport=transport)
+    batch = asyncio.run(service.get_prices(["TSLA:NASDAQ"]))
+
+    assert batch.prices["TSLA:NASDAQ"].price == 100.50
+    assert transport.session.get.called
+    assert all(provider.transport is transport for provider in service.providers)
+
+
+def test_portfolio_manager_owns_transport_and_shares_it_with_gist_manager(tmp_path):
+    gist = GistManager("gist-id", "token")
+    manager = PortfolioManager(file_path=str(tmp_path / "portfolio.json"), gist_manager=gist)
+
+    assert gist.transport is manager.transport
+    assert manager.exchange_rate_service.transport is manager.transport
+
+    async def open_and_close():
+        session = manager.transport.async_session()
+        await manager.aclose()
+        return session
+
+    session = asyncio.run(open_and_close())
+    assert session.closed
+
+
+def test_rate_limiter_allows_burst_then_spaces_requests_per_host():
+    now = [0.0]
+    limiter = HostRateLimiter(
+        limits={"finance.yahoo.com": (2.0, 2)},
+        default_rate=None,
+        clock=lambda: now[0],
+    )
+
+    waits = [limiter.reserve("https://finance.yahoo.com/quote/AAPL/") for _ in range(4)]
+    assert waits == [0.0, 0.0, 0.5, 1.0]
+    assert limiter.reserve("https://api.github.com/gists/abc") == 0.0
+
+    now[0] = 10.0
+    assert limiter.reserve("https://finance.yahoo.com/quote/TSLA/") == 0.0
+
+    stats = limiter.stats()["finance.yahoo.com"]
+    assert stats["requests"] == 5
+    assert stats["throttled"] == 2
+    assert stats["wait_seconds"] == 1.5
+    assert stats["max_wait"] == 1.0
+
+
+def test_transport_throttles_blocking_requests_through_shared_limiter():
+    limiter = HostRateLimiter(limits={"open.er-api.com": (1000.0, 1)}, default_rate=None)
+    transport = HttpTransport(rate_limiter=limiter)
+    transport.session.get = MagicMock(return_value=MagicMock())
+
+    transport.get("https://open.er-api.com/v6/latest/USD")
+    transport.get("https://open.er-api.com/v6/latest/USD")
+
+    stats = transport.rate_limit_stats()["open.er-api.com"]
+    assert stats["requests"] == 2
+    assert stats["throttled"] == 1
@@ -1,8 +1,51 @@
+import asyncio
+import threading
+import time
+
+import requests
+
 from stock_tracker.providers.market_data import (
+    BasePriceProvider,
     MarketDataService,
+    PriceFailure,
+    PriceResult,
+    ProviderRouter,
     YahooFinanceProvider,
     YahooTaiwanProvider,
 )
+from stock_tracker.providers.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry, RetryBudget
+from stock_tracker.providers.health import ProviderHealthTracker
+from stock_tracker.providers.transport import HttpTransport
+
+
+class SleepyProvider(BasePriceProvider):
+    source = "SleepyProvider"
+    supported_exchanges = ("TPE",)
+
+    def __init__(self, delay, slow_symbols=(), max_concurrency=8):
+        self.delay = delay
+        self.slow_symbols = set(slow_symbols)
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def fetch_price(self, symbol):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay * (10 if symbol in self.slow_symbols else 1))
+            return PriceResult(
+                symbol=symbol,
+                price=1.0,
+                currency="TWD",
+                retrieved_at="2026-05-04T15:00:00+08:00",
+                source=self.source,
+            )
+        finally:
+            with self.lock:
+                self.active -= 1
 
 
 def test_taiwan_provider_normalizes_tpe_symbols_for_yahoo_taiwan():
@@ -45,3 +88,430 @@ def test_us_provider_prefers_quote_price_over_unrelated_market_streamers():
     """
 
     assert provider._parse_price(html, "AAPL") == 280.25
+
+
+def test_market_data_service_fetches_symbols_concurrently():
+    provider = SleepyProvider(delay=0.2)
+    service = MarketDataService(providers=[provider], max_concurrency=8)
+    symbols = [f"{code}:TPE" for code in range(2330, 2338)]
+
+    started = time.perf_counter()
+    batch = asyncio.run(service.get_prices(symbols))
+    elapsed = time.perf_counter() - started
+
+    assert list(batch.prices) == symbols
+    assert batch.failures == {}
+    assert elapsed < 0.2 * len(symbols) / 2
+
+
+def test_market_data_service_respects_provider_concurrency_limit():
+    provider = SleepyProvider(delay=0.05, max_concurrency=2)
+    service = MarketDataService(providers=[provider], max_concurrency=8)
+
+    asyncio.run(service.get_prices([f"{code}:TPE" for code in range(2330, 2336)]))
+
+    assert provider.peak == 2
+
+
+def test_market_data_service_reports_per_symbol_timeout():
+    provider = SleepyProvider(delay=0.05, slow_symbols={"2330:TPE"})
+    service = MarketDataService(providers=[provider], symbol_timeout=0.2)
+
+    batch = asyncio.run(service.get_prices(["2330:TPE", "2317:TPE"]))
+
+    assert "2317:TPE" in batch.prices
+    assert isinstance(batch.failures["2330:TPE"], PriceFailure)
+    assert batch.failures["2330:TPE"].reason == "provider_timeout"
+
+
+def test_taiwan_provider_reads_trade_price_without_dom_parse():
+    provider = YahooTaiwanProvider()
+    html = """
+    <ul>
+      <li class="price-detail-item D(f)"><span class="C(#6e7780)">開盤</span><span>1,050</span></li>
+      <li class="price-detail-item D(f)"><span class="C(#6e7780)">成交</span><span class="Fw(600)">1,060</span></li>
+    </ul>
+    """
+
+    extraction = provider._extract_price(html)
+
+    assert extraction.price == 1060.0
+    assert extraction.path == "price_detail_item"
+    assert provider.extractor.stats == {"price_detail_item": 1}
+
+
+def test_us_provider_falls_back_to_dom_when_targeted_scan_misses():
+    provider = YahooFinanceProvider()
+    html = """
+    <section data-testid="quote-price">
+      <span data-testid="qsp-price"><span>280.25</span></span>
+    </section>
+    """
+
+    extraction = provider._extract_price(html, "AAPL")
+
+    assert extraction.price == 280.25
+    assert extraction.path == "dom"
+    assert provider.extractor.hit_rates() == {"dom": 1.0}
+
+
+def test_us_provider_prefers_nested_dom_price_over_foreign_header_json():
+    provider = YahooFinanceProvider()
+    html = """
+    <script>{"regularMarketPrice":{"raw":7261.75,"fmt":"7,261.75"}}</script>
+    <section data-testid="quote-price">
+      <span data-testid="qsp-price"><span>280.25</span></span>
+    </section>
+    """
+
+    extraction = provider._extract_price(html, "AAPL")
+
+    assert extraction.price == 280.25
+    assert extraction.path == "dom"
+
+
+def test_us_provider_uses_json_price_only_as_last_resort():
+    provider = YahooFinanceProvider()
+
+    extraction = provider._extract_price('{"regularMarketPrice":{"raw":280.25}}', "AAPL")
+
+    assert extraction.price == 280.25
+    assert extraction.path == "regular_market_price_json"
+
+
+def test_streaming_fetch_end_of_body_prefers_nested_dom_price():
+    chunks = [
+        b'{"regularMarketPrice":{"raw":7261.75,"fmt":"7,261.75"}}',
+        b'<span data-testid="qsp-price"><span>280.25</span></span>',
+    ]
+    provider = streaming_provider(YahooFinanceProvider, FakeStreamResponse(chunks))
+
+    assert provider.fetch_price("AAPL:NASDAQ").price == 280.25
+
+
+class FakeStreamResponse:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.headers = {"Content-Type": "text/html; charset=utf-8"}
+        self.encoding = "utf-8"
+        self.chunks_read = 0
+        self.closed = False
+
+    def raise_for_status(self):
+        return None
+
+    def iter_content(self, chunk_size=None):
+        for chunk in self.chunks:
+            self.chunks_read += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def streaming_provider(provider_cls, response, **kwargs):
+    transport = HttpTransport()
+    transport.session.get = lambda *args, **kwargs: response
+    return provider_cls(transport=transport, stream=True, **kwargs)
+
+
+def test_streaming_fetch_stops_reading_once_price_is_found():
+    chunks = [
+        '<html><ul><li class="price-detail-item"><span>成'.encode("utf-8"),
+        '交</span><span>1,060</span></li></ul>'.encode("utf-8"),
+        b"<footer>" + b"x" * 1024 + b"</footer>",
+        b"<script>never read</script>",
+    ]
+    response = FakeStreamResponse(chunks)
+    provider = streaming_provider(YahooTaiwanProvider, response)
+
+    result = provider.fetch_price("2330:TPE")
+
+    assert result.price == 1060.0
+    assert result.extraction_path == "price_detail_item"
+    assert response.chunks_read == 2
+    assert response.closed
+
+
+def test_streaming_fetch_does_not_trust_unrelated_json_price_in_prefix():
+    chunks = [
+        b'{"regularMarketPrice":{"raw":7261.75,"fmt":"7,261.75"}}',
+        b'<span data-testid="qsp-price">280.25</span>',
+    ]
+    provider = streaming_provider(YahooFinanceProvider, FakeStreamResponse(chunks))
+
+    assert provider.fetch_price("AAPL:NASDAQ").price == 280.25
+
+
+def test_streaming_fetch_honours_byte_cap():
+    chunks = [b"<html>" + b"x" * 64, b"<span data-testid=\"qsp-price\">280.25</span>"]
+    response = FakeStreamResponse(chunks)
+    provider = streaming_provider(YahooFinanceProvider, response, max_stream_bytes=32)
+
+    try:
+        provider.fetch_price("AAPL:NASDAQ")
+    except PriceFailure as failure:
+        assert failure.reason == "provider_parse_error"
+    else:
+        raise AssertionError("expected parse failure when the cap cuts off the price")
+    assert response.chunks_read == 1
+    assert response.closed
+
+
+def test_router_builds_priority_ordered_chain_per_exchange():
+    taiwan = YahooTaiwanProvider()
+    us_pages = YahooFinanceProvider()
+    preferred = SleepyProvider(delay=0)
+    router = ProviderRouter([taiwan, us_pages])
+
+    router.register(preferred, priority=1)
+
+    assert router.chain("2330:TPE") == (preferred, taiwan)
+    assert router.chain("2330:TWO") == (taiwan,)
+    assert router.chain("AAPL:NASDAQ") == (us_pages,)
+    assert router.chain("not-a-symbol") == ()
+
+
+def test_market_data_service_rebuilds_routes_when_provider_is_registered():
+    service = MarketDataService(providers=[YahooFinanceProvider()])
+    assert service.providers_for_symbol("2330:TPE") == []
+
+    taiwan = YahooTaiwanProvider()
+    service.register_provider(taiwan)
+
+    assert service.provider_for_symbol("2330:TPE") is taiwan
+    batch = asyncio.run(service.get_prices(["2330"]))
+    assert batch.failures["2330"].reason == "unsupported_symbol"
+
+
+class CountingSleepyProvider(SleepyProvider):
+    def __init__(self, delay):
+        super().__init__(delay=delay)
+        self.fetches = []
+
+    def fetch_price(self, symbol):
+        self.fetches.append(symbol)
+        return super().fetch_price(symbol)
+
+
+def test_market_data_service_coalesces_concurrent_requests_for_same_symbol():
+    provider = CountingSleepyProvider(delay=0.1)
+    service = MarketDataService(providers=[provider])
+
+    async def fetch_from_two_callers():
+        return await asyncio.gather(
+            service.get_prices(["2330:TPE", "2317:TPE"]),
+            service.get_prices(["2330:TPE", "2454:TPE"]),
+        )
+
+    first, second = asyncio.run(fetch_from_two_callers())
+
+    assert sorted(provider.fetches) == ["2317:TPE", "2330:TPE", "2454:TPE"]
+    assert first.prices["2330:TPE"] is second.prices["2330:TPE"]
+    assert list(second.prices) == ["2330:TPE", "2454:TPE"]
+    assert service.metrics["coalesced"] == 1
+    assert service._inflight == {}
+
+
+class NamedSleepyProvider(SleepyProvider):
+    def __init__(self, source, delay):
+        super().__init__(delay=delay)
+        self.source = source
+        self.fetches = []
+
+    def fetch_price(self, symbol):
+        self.fetches.append(symbol)
+        return super().fetch_price(symbol)
+
+
+def test_health_tracker_ranks_faster_provider_first():
+    slow = NamedSleepyProvider("Slow", delay=0)
+    fast = NamedSleepyProvider("Fast", delay=0)
+    tracker = ProviderHealthTracker(window=10)
+    for _ in range(5):
+        tracker.record(slow, 0.5, attempts=1)
+        tracker.record(fast, 0.1, attempts=1)
+
+    assert tracker.rank((slow, fast)) == (fast, slow)
+
+    for _ in range(10):
+        tracker.record(fast, 0.1, attempts=1, faults=1)
+    assert tracker.rank((slow, fast)) == (slow, fast)
+
+
+def test_health_samples_accumulate_across_runs(tmp_path):
+    state_path = str(tmp_path / "provider-health.json")
+    provider = NamedSleepyProvider("Primary", delay=0)
+
+    # 每次執行只有 3 個樣本，少於 PROVIDER_HEALTH_MIN_SAMPLES
+    for codes in (range(2330, 2333), range(2333, 2336)):
+        service = MarketDataService(providers=[provider], health=ProviderHealthTracker(path=state_path))
+        assert service.health.hedge_delay(provider) is None
+        asyncio.run(service.get_prices([f"{code}:TPE" for code in codes]))
+
+    restarted = ProviderHealthTracker(path=state_path)
+    assert restarted.health(provider).samples == 6
+    assert restarted.hedge_delay(provider) is not None
+
+
+def test_market_data_service_hedges_primary_slower_than_its_p95():
+    primary = NamedSleepyProvider("Primary", delay=0.01)
+    backup = NamedSleepyProvider("Backup", delay=0.01)
+    service = MarketDataService(providers=[primary, backup], hedge=True)
+    for _ in range(5):
+        service.health.record(primary, 0.01)
+
+    primary.delay = 1.0
+    started = time.perf_counter()
+    batch = asyncio.run(service.get_prices(["2330:TPE"]))
+
+    assert time.perf_counter() - started < 0.9
+    assert batch.prices["2330:TPE"].source == "Backup"
+    assert service.metrics["hedged"] == 1
+    assert service.metrics["hedge_wins"] == 1
+
+
+class FailingProvider(BasePriceProvider):
+    source = "FailingProvider"
+    supported_exchanges = ("TPE",)
+
+    def __init__(self):
+        self.calls = 0
+
+    def fetch_price(self, symbol):
+        self.calls += 1
+        raise PriceFailure(symbol=symbol, reason="provider_http_error", message="503", source=self.source)
+
+
+def test_circuit_opens_after_consecutive_http_errors_and_persists(tmp_path):
+    state_path = str(tmp_path / "circuits.json")
+    failing = FailingProvider()
+    backup = NamedSleepyProvider("Backup", delay=0)
+    service = MarketDataService(
+        providers=[failing, backup],
+        breakers=CircuitBreakerRegistry(path=state_path, failure_threshold=2),
+        max_retries=0,
+    )
+
+    asyncio.run(service.get_prices(["2330:TPE"]))
+    asyncio.run(service.get_prices(["2317:TPE"]))
+    batch = asyncio.run(service.get_prices(["2454:TPE"]))
+
+    assert failing.calls == 2
+    assert batch.prices["2454:TPE"].source == "Backup"
+    assert service.circuit_stats()["FailingProvider"]["state"] == "open"
+
+    # 下一次執行（例如 cron）讀取狀態檔，不必重新發現故障
+    restarted = MarketDataService(
+        providers=[failing, backup],
+        breakers=CircuitBreakerRegistry(path=state_path, failure_threshold=2),
+    )
+    asyncio.run(restarted.get_prices(["2412:TPE"]))
+    assert failing.calls == 2
+
+
+def test_queued_units_stop_calling_once_circuit_opens():
+    failing = FailingProvider()
+    failing.max_concurrency = 1
+    service = MarketDataService(
+        providers=[failing],
+        breakers=CircuitBreakerRegistry(failure_threshold=3),
+        max_retries=0,
+    )
+    symbols = [f"{code}:TPE" for code in range(2330, 2354)]
+
+    batch = asyncio.run(service.get_prices(symbols))
+
+    # 24 個請求排隊等待同一個名額；斷路器開路後，排隊中的請求不再呼叫資料來源
+    assert failing.calls == 3
+    reasons = [failure.reason for failure in batch.failures.values()]
+    assert reasons.count("provider_http_error") == 3
+    assert reasons.count("circuit_open") == len(symbols) - 3
+
+
+class StatusResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ""
+        self.headers = {}
+        self.encoding = "utf-8"
+
+    def raise_for_status(self):
+        raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+
+def status_provider(status_code):
+    transport = HttpTransport()
+    calls = []
+
+    def get(*args, **kwargs):
+        calls.append(args)
+        return StatusResponse(status_code)
+
+    transport.session.get = get
+    return YahooTaiwanProvider(transport=transport), calls
+
+
+def test_client_errors_are_not_retried_or_counted_by_the_circuit():
+    provider, calls = status_provider(404)
+    service = MarketDataService(
+        providers=[provider],
+        breakers=CircuitBreakerRegistry(failure_threshold=1),
+        retry_budget=RetryBudget(ratio=1, initial_tokens=10, rng=lambda: 0),
+        max_retries=3,
+    )
+
+    first = asyncio.run(service.get_prices(["9999:TPE"]))
+    second = asyncio.run(service.get_prices(["9999:TPE"]))
+
+    assert first.failures["9999:TPE"].reason == "provider_client_error"
+    assert second.failures["9999:TPE"].reason == "provider_client_error"
+    assert len(calls) == 2
+    assert service.metrics["retries"] == 0
+    assert service.circuit_stats()["YahooTaiwanProvider"]["state"] == "closed"
+
+
+def test_server_errors_and_rate_limits_stay_retryable():
+    for status_code in (503, 429):
+        provider, calls = status_provider(status_code)
+        service = MarketDataService(
+            providers=[provider],
+            breakers=CircuitBreakerRegistry(failure_threshold=100),
+            retry_budget=RetryBudget(ratio=1, initial_tokens=10, base_delay=0, rng=lambda: 0),
+            max_retries=1,
+        )
+
+        batch = asyncio.run(service.get_prices(["2330:TPE"]))
+
+        assert batch.failures["2330:TPE"].reason == "provider_http_error"
+        assert len(calls) == 2
+
+
+def test_circuit_half_opens_with_single_probe_after_reset_timeout():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=lambda: now[0])
+    assert breaker.record_failure() is True
+    assert breaker.allow() is False
+
+    now[0] = 31
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() is True
+
+
+def test_retry_budget_bounds_retries_across_symbols():
+    failing = FailingProvider()
+    service = MarketDataService(
+        providers=[failing],
+        breakers=CircuitBreakerRegistry(failure_threshold=100),
+        retry_budget=RetryBudget(ratio=0, initial_tokens=2, rng=lambda: 0),
+        max_retries=3,
+    )
+
+    batch = asyncio.run(service.get_prices(["2330:TPE", "2317:TPE", "2454:TPE"]))
+
+    assert len(batch.failures) == 3
+    assert failing.calls == 3 + 2
+    assert service.metrics["retries"] == 2
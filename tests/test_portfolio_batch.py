@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import pytest
+
+from stock_tracker.portfolio.batch import PortfolioBatchUpdater, PortfolioSource
+from stock_tracker.portfolio.history_store import HistoryStore
+from stock_tracker.providers.market_data import PriceFailure, PriceResult, PriceUpdateBatch
+
+
+class CountingPriceService:
+    def __init__(self, prices):
+        self.prices = prices
+        self.requests = []
+
+    async def get_prices(self, symbols):
+        self.requests.append(list(symbols))
+        return PriceUpdateBatch(
+            prices={
+                symbol: PriceResult(
+                    symbol=symbol,
+                    price=self.prices[symbol],
+                    currency="TWD",
+                    retrieved_at="2026-05-04T15:00:00+08:00",
+                    source="test",
+                )
+                for symbol in symbols
+                if symbol in self.prices
+            },
+            failures={
+                symbol: PriceFailure(symbol=symbol, reason="price_unavailable")
+                for symbol in symbols
+                if symbol not in self.prices
+            },
+        )
+
+
+class CountingExchangeRateService:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_rate(self, currency_pair="USD-TWD"):
+        self.calls += 1
+        return 32.0
+
+
+def write_portfolio(path, symbols):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "totalValue": 0.0,
+        "exchange rate": "31.54",
+        "stocks": [
+            {"name": symbol, "price": 1.0, "quantity": 1, "currency": "TWD", "lastUpdated": None}
+            for symbol in symbols
+        ],
+    }), encoding="utf-8")
+
+
+def test_batch_fetches_union_of_symbols_once_and_reports_each_portfolio(tmp_path):
+    family = tmp_path / "family" / "portfolio.json"
+    growth = tmp_path / "growth" / "portfolio.json"
+    write_portfolio(family, ["2330:TPE", "2317:TPE"])
+    write_portfolio(growth, ["2330:TPE", "2454:TPE"])
+    prices = CountingPriceService({"2330:TPE": 100.0, "2317:TPE": 50.0})
+    rates = CountingExchangeRateService()
+
+    updater = PortfolioBatchUpdater(
+        [PortfolioSource(str(family)), PortfolioSource(str(growth))],
+        force_update=True,
+        price_service=prices,
+        exchange_rate_service=rates,
+    )
+    reports = asyncio.run(updater.run())
+
+    assert prices.requests == [["2330:TPE", "2317:TPE", "2454:TPE"]]
+    assert rates.calls == 1
+    assert [report.status for report in reports] == ["success", "partial_success"]
+    assert reports[1].result.failed_symbols[0]["symbol"] == "2454:TPE"
+
+    saved_family = json.loads(family.read_text(encoding="utf-8"))
+    saved_growth = json.loads(growth.read_text(encoding="utf-8"))
+    assert saved_family["totalValue"] == 150.0
+    assert saved_family["exchange rate"] == "32.00"
+    assert saved_growth["stocks"][0]["price"] == 100.0
+    assert saved_growth["stocks"][1]["price"] == 1.0
+
+
+def test_batch_reports_portfolio_that_cannot_be_loaded(tmp_path):
+    present = tmp_path / "present" / "portfolio.json"
+    write_portfolio(present, ["2330:TPE"])
+
+    updater = PortfolioBatchUpdater(
+        [PortfolioSource(str(tmp_path / "missing.json")), PortfolioSource(str(present))],
+        force_update=True,
+        price_service=CountingPriceService({"2330:TPE": 100.0}),
+        exchange_rate_service=CountingExchangeRateService(),
+    )
+    reports = asyncio.run(updater.run())
+
+    assert reports[0].status == "failed"
+    assert reports[0].error
+    assert reports[1].status == "success"
+
+
+def test_batch_keeps_separate_history_for_portfolios_in_same_directory(tmp_path):
+    family = tmp_path / "family.json"
+    growth = tmp_path / "growth.json"
+    write_portfolio(family, ["2330:TPE"])
+    write_portfolio(growth, ["2317:TPE"])
+
+    updater = PortfolioBatchUpdater(
+        [PortfolioSource(str(family)), PortfolioSource(str(growth))],
+        force_update=True,
+        price_service=CountingPriceService({"2330:TPE": 100.0, "2317:TPE": 50.0}),
+        exchange_rate_service=CountingExchangeRateService(),
+    )
+    asyncio.run(updater.run())
+
+    assert not (tmp_path / "portfolio-history.json.log").exists()
+    family_history = HistoryStore(tmp_path / "family-history.json").export()
+    growth_history = HistoryStore(tmp_path / "growth-history.json").export()
+    assert [entry["totalValueTwd"] for entry in family_history["values"]] == [100.0]
+    assert [entry["totalValueTwd"] for entry in growth_history["values"]] == [50.0]
+
+
+def test_batch_rejects_the_same_portfolio_twice(tmp_path):
+    portfolio = tmp_path / "portfolio.json"
+    write_portfolio(portfolio, ["2330:TPE"])
+
+    with pytest.raises(ValueError):
+        PortfolioBatchUpdater(
+            [PortfolioSource(str(portfolio)), PortfolioSource(str(tmp_path / "." / "portfolio.json"))],
+            price_service=CountingPriceService({}),
+            exchange_rate_service=CountingExchangeRateService(),
+        )
@@ -1,7 +1,10 @@
 import asyncio
 import json
+import threading
 from copy import deepcopy
 
+from stock_tracker.portfolio.change_set import PortfolioChangeSet
+from stock_tracker.portfolio.history_store import HistoryStore
 from stock_tracker.portfolio.portfolio_manager import PortfolioManager
 from stock_tracker.providers.market_data import (
     ExchangeRateFailure,
@@ -131,9 +134,14 @@ async def _assert_full_success_updates_prices_status_and_returns_success(tmp_pat
         "totalValueTwd": 1128.0,
         "sourceUpdatedAt": saved["updateStatus"]["retrieved_at"],
     }
+    # 執行期間歷史只追加到紀錄段；aclose() 時寫回 portfolio-history.json
+    await manager.aclose()
     with open(tmp_path / "portfolio-history.json", encoding="utf-8") as f:
         local_history = json.load(f)
     assert local_history == history
+    # 報價由報價服務寫入價格歷史；管理器只寫入匯率
+    assert manager.price_history.prices_at(["2330:TPE", "AAPL:NASDAQ"], "2026-05-04T15:00:01+08:00") == {}
+    assert manager.price_history.fx_at("USD-TWD", saved["exchange_rate_updated"]) == 32.0
 
 
 def test_partial_success_writes_successful_prices_and_marks_partial(tmp_path):
@@ -403,3 +411,156 @@ async def _assert_full_success_uses_local_seed_when_gist_history_is_missing(tmp_
     assert result.status == "success"
     history = gist.saved_histories[-1]
     assert [entry["date"] for entry in history["values"]] == ["2026-05-06", "2026-05-07"]
+
+
+class SlowGistManager(FakeGistManager):
+    async def read_history(self):
+        await asyncio.sleep(0.2)
+        return await super().read_history()
+
+
+class SlowPriceService(FakePriceService):
+    async def get_prices(self, symbols):
+        await asyncio.sleep(0.2)
+        return await super().get_prices(symbols)
+
+
+class SlowExchangeRateService(FakeExchangeRateService):
+    async def get_rate(self, currency_pair="USD-TWD"):
+        await asyncio.sleep(0.2)
+        return await super().get_rate(currency_pair)
+
+
+def test_update_overlaps_exchange_rate_price_and_history_fetches(tmp_path):
+    asyncio.run(_assert_update_overlaps_exchange_rate_price_and_history_fetches(tmp_path))
+
+
+async def _assert_update_overlaps_exchange_rate_price_and_history_fetches(tmp_path):
+    portfolio = base_portfolio()
+    gist = SlowGistManager(portfolio)
+    batch = PriceUpdateBatch(
+        prices={
+            symbol: PriceResult(
+                symbol=symbol,
+                price=price,
+                currency=currency,
+                retrieved_at="2026-05-04T15:00:00+08:00",
+                source="test",
+            )
+            for symbol, price, currency in (("2330:TPE", 120.0, "TWD"), ("AAPL:NASDAQ", 12.0, "USD"))
+        },
+        failures={},
+    )
+    manager = PortfolioManager(
+        file_path=str(tmp_path / "portfolio.json"),
+        gist_manager=gist,
+        force_update=True,
+        price_service=SlowPriceService(batch),
+        exchange_rate_service=SlowExchangeRateService(32.0),
+    )
+    await manager.initialize()
+
+    started = asyncio.get_running_loop().time()
+    result = await manager.update_prices()
+    elapsed = asyncio.get_running_loop().time() - started
+
+    assert result.status == "success"
+    assert elapsed < 0.4
+    saved = gist.saved_portfolios[-1]
+    assert saved["exchange rate"] == "32.00"
+    assert saved["totalValue"] == 1128.0
+    assert gist.saved_histories[-1]["values"][-1]["totalValueTwd"] == 1128.0
+
+
+def test_change_set_rolls_back_only_recorded_fields():
+    portfolio = base_portfolio()
+    changes = PortfolioChangeSet(portfolio)
+
+    changes.set(portfolio, "exchange rate", "32.00")
+    changes.set(portfolio["stocks"][0], "price", 120.0)
+    changes.set(portfolio["stocks"][0], "price", 130.0)
+    changes.set(portfolio, "updateStatus", {"status": "success"})
+    changes.set(portfolio, "totalValue", 1200.0)
+
+    assert changes.changed_fields == 4
+    assert (changes.old_total, changes.new_total) == (1000.0, 1200.0)
+
+    changes.rollback()
+    assert portfolio == base_portfolio()
+
+
+def local_manager(tmp_path):
+    with open(tmp_path / "portfolio.json", "w", encoding="utf-8") as f:
+        json.dump(base_portfolio(), f)
+    batch = PriceUpdateBatch(
+        prices={
+            "2330:TPE": PriceResult(
+                symbol="2330:TPE",
+                price=120.0,
+                currency="TWD",
+                retrieved_at="2026-05-04T15:00:00+08:00",
+                source="test",
+            ),
+            "AAPL:NASDAQ": PriceResult(
+                symbol="AAPL:NASDAQ",
+                price=12.0,
+                currency="USD",
+                retrieved_at="2026-05-04T15:00:01+08:00",
+                source="test",
+            ),
+        },
+        failures={},
+    )
+    return PortfolioManager(
+        file_path=str(tmp_path / "portfolio.json"),
+        force_update=True,
+        price_service=FakePriceService(batch),
+        exchange_rate_service=FakeExchangeRateService(32.0),
+    )
+
+
+def test_repeated_updates_append_history_without_rewriting_snapshot(tmp_path, monkeypatch):
+    rewrites = []
+    compact = HistoryStore.compact
+    monkeypatch.setattr(HistoryStore, "compact", lambda self, force=False: rewrites.append(compact(self, force)))
+
+    async def run():
+        manager = local_manager(tmp_path)
+        await manager.initialize()
+        for _ in range(5):
+            await manager.update_prices()
+        store = manager._get_history_store()
+        assert len(store.segment_path.read_text(encoding="utf-8").splitlines()) == 5
+        assert rewrites == []
+        await manager.aclose()
+        return store
+
+    store = asyncio.run(run())
+
+    # 5 次更新只在結束時寫回一次快照
+    assert rewrites == [True]
+    assert not store.segment_path.exists()
+    assert json.loads(store.path.read_text(encoding="utf-8")) == store.export()
+
+
+def test_save_does_not_wait_for_history_compaction(tmp_path):
+    asyncio.run(_assert_save_does_not_wait_for_history_compaction(tmp_path))
+
+
+async def _assert_save_does_not_wait_for_history_compaction(tmp_path):
+    manager = local_manager(tmp_path)
+    store = HistoryStore(tmp_path / "portfolio-history.json", compact_every=1)
+    release = threading.Event()
+    compact = store.compact
+    store.compact = lambda force=False: release.wait(5) and compact(force)
+    manager._history_store = store
+
+    await manager.initialize()
+    result = await manager.update_prices()
+
+    assert result.status == "success"
+    assert not store.path.exists()
+    release.set()
+    await manager.aclose()
+    assert json.loads(store.path.read_text(encoding="utf-8")) == store.export()
+    assert not store.segment_path.exists()
@@ -0,0 +1,71 @@
+import time
+
+from stock_tracker.portfolio.calculator import PortfolioCalculator
+from stock_tracker.portfolio.valuation import PortfolioValuation
+
+
+def sample_stocks():
+    return [
+        {"name": "2330:TPE", "price": 100.0, "quantity": 3, "currency": "TWD"},
+        {"name": "AAPL:NASDAQ", "price": 10.0, "quantity": 2, "currency": "USD"},
+        {"name": "0700:HKG", "price": 5.0, "quantity": 4, "currency": "HKD"},
+    ]
+
+
+def test_valuation_matches_per_stock_loop():
+    stocks = sample_stocks()
+    valuation = PortfolioValuation.from_stocks(stocks, {"USD": 32.0})
+
+    assert valuation.values_twd.tolist() == [300.0, 640.0, 20.0]
+    assert valuation.total == 960.0
+
+    valuation.apply_percentages(stocks)
+    assert [stock["percentageOfTotal"] for stock in stocks] == [31.25, 66.67, 2.08]
+
+    breakdown = valuation.currency_breakdown()
+    assert breakdown["USD"] == {"total": 20.0, "count": 1, "total_twd": 640.0}
+    assert breakdown["TWD"]["count"] == 1
+
+
+def test_calculator_uses_valuation_engine():
+    stocks = sample_stocks()
+    total = PortfolioCalculator.calculate_total_value(stocks, 32.0)
+    PortfolioCalculator.update_percentages(stocks, total, 32.0)
+
+    assert total == 960.0
+    assert stocks[1]["percentageOfTotal"] == 66.67
+
+
+def test_valuation_revalues_large_book_quickly():
+    stocks = [
+        {"name": f"{index}:TPE", "price": 10.0 + index % 7, "quantity": 1000, "currency": "USD" if index % 3 else "TWD"}
+        for index in range(20000)
+    ]
+    valuation = PortfolioValuation.from_stocks(stocks, {"USD": 31.5})
+
+    started = time.perf_counter()
+    for _ in range(10):
+        valuation.revalue()
+        valuation.percentages()
+    assert (time.perf_counter() - started) / 10 < 0.05
+
+
+def test_incremental_price_and_fx_updates_match_full_revaluation():
+    stocks = sample_stocks()
+    valuation = PortfolioValuation.from_stocks(stocks, {"USD": 32.0})
+    percentages = valuation.percentages()
+    assert valuation.percentages() is percentages
+
+    delta = valuation.apply_prices({"2330:TPE": 110.0, "UNKNOWN:TPE": 1.0})
+    assert delta == 30.0
+    assert valuation.total == 990.0
+    assert valuation.percentages() is not percentages
+
+    valuation.apply_fx({"USD": 31.0})
+    assert valuation.total == 970.0
+
+    stocks[0]["price"] = 110.0
+    full = PortfolioValuation.from_stocks(stocks, {"USD": 31.0})
+    assert valuation.values_twd.tolist() == full.values_twd.tolist()
+    assert valuation.total == full.total
+    assert valuation.percentages().tolist() == full.percentages().tolist()
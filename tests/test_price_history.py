@@ -0,0 +1,51 @@
+from stock_tracker.providers.market_data import PriceResult, PriceUpdateBatch
+from stock_tracker.providers.price_history import SQLitePriceHistory, to_epoch
+
+
+def quote(symbol, price, retrieved_at, market_timestamp=None):
+    return PriceResult(
+        symbol=symbol,
+        price=price,
+        currency="USD",
+        retrieved_at=retrieved_at,
+        source="test",
+        market_timestamp=market_timestamp,
+    )
+
+
+def test_skips_unchanged_prices_and_reads_many_symbols(tmp_path):
+    history = SQLitePriceHistory(str(tmp_path / "history.sqlite3"))
+
+    assert history.record_batch(PriceUpdateBatch(prices={
+        "AAPL": quote("AAPL", 10.0, "2026-05-04T10:00:00+08:00"),
+        "MSFT": quote("MSFT", 20.0, "2026-05-04T10:00:00+08:00"),
+    }, failures={})) == 2
+    # 收盤後重複取得相同價格不新增資料點
+    assert history.record_prices([
+        quote("AAPL", 10.0, "2026-05-04T11:00:00+08:00"),
+        quote("MSFT", 21.0, "2026-05-04T11:00:00+08:00"),
+    ]) == 1
+    assert history.record_prices([quote("AAPL", 11.0, "2026-05-05T10:00:00+08:00")]) == 1
+
+    assert history.read_prices(["AAPL", "MSFT", "TSLA"]) == {
+        "AAPL": [(to_epoch("2026-05-04T10:00:00+08:00"), 10.0), (to_epoch("2026-05-05T10:00:00+08:00"), 11.0)],
+        "MSFT": [(to_epoch("2026-05-04T10:00:00+08:00"), 20.0), (to_epoch("2026-05-04T11:00:00+08:00"), 21.0)],
+    }
+    assert history.read_prices(["AAPL"], start="2026-05-05T00:00:00+08:00") == {
+        "AAPL": [(to_epoch("2026-05-05T10:00:00+08:00"), 11.0)],
+    }
+    assert history.prices_at(["AAPL", "MSFT"], "2026-05-04T12:00:00+08:00") == {"AAPL": 10.0, "MSFT": 21.0}
+
+
+def test_prefers_market_timestamp_and_records_fx(tmp_path):
+    history = SQLitePriceHistory(str(tmp_path / "history.sqlite3"))
+
+    history.record_prices([quote("AAPL", 10.0, "2026-05-04T10:00:00+08:00", "2026-05-02T04:00:00+08:00")])
+    history.record_fx("USD-TWD", 31.5, "2026-05-04T10:00:00+08:00")
+    history.record_fx("USD-TWD", 31.5, "2026-05-05T10:00:00+08:00")
+    history.record_fx("USD-TWD", 32.0, "2026-05-06T10:00:00+08:00")
+
+    assert history.read_prices(["AAPL"])["AAPL"] == [(to_epoch("2026-05-02T04:00:00+08:00"), 10.0)]
+    assert [rate for _, rate in history.read_fx("USD-TWD")] == [31.5, 32.0]
+    assert history.fx_at("USD-TWD", "2026-05-05T23:00:00+08:00") == 31.5
+    assert history.fx_at("USD-TWD", "2026-05-01T00:00:00+08:00") is None
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from stock_tracker.providers.market_data import PriceResult, PriceUpdateBatch
+from stock_tracker.providers.price_history import SQLitePriceHistory
+from stock_tracker.providers.quote_cache import (
+    CachedMarketDataService,
+    QuoteCache,
+    market_hours_ttl,
+)
+from stock_tracker.providers.quote_store import SQLiteQuoteStore
+
+TAIPEI = ZoneInfo("Asia/Taipei")
+
+
+def taipei_epoch(*args):
+    return datetime(*args, tzinfo=TAIPEI).timestamp()
+
+
+def price(symbol, value=1.0):
+    return PriceResult(
+        symbol=symbol,
+        price=value,
+        currency="TWD",
+        retrieved_at="2026-05-11T10:00:00+08:00",
+        source="test",
+    )
+
+
+class CountingService:
+    def __init__(self):
+        self.requested = []
+
+    async def get_prices(self, symbols):
+        symbols = list(symbols)
+        self.requested.append(symbols)
+        return PriceUpdateBatch(prices={symbol: price(symbol) for symbol in symbols}, failures={})
+
+
+def test_ttl_is_short_while_market_is_open():
+    assert market_hours_ttl("2330:TPE", taipei_epoch(2026, 5, 11, 10, 0), open_ttl=60) == 60
+
+
+def test_ttl_lasts_until_next_open_after_close():
+    saturday = taipei_epoch(2026, 5, 9, 10, 0)
+    monday_open = taipei_epoch(2026, 5, 11, 9, 0)
+
+    assert market_hours_ttl("2330:TPE", saturday) == monday_open - saturday
+
+
+def test_cache_expires_entries_and_counts_hits_and_misses():
+    now = [taipei_epoch(2026, 5, 11, 10, 0)]
+    cache = QuoteCache(open_ttl=60, clock=lambda: now[0])
+    cache.put(price("2330:TPE"))
+
+    assert cache.get("2330:TPE") is not None
+    now[0] += 61
+    assert cache.get("2330:TPE") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "store_hits": 0, "size": 0}
+
+
+def test_cache_evicts_least_recently_used_symbol():
+    cache = QuoteCache(max_size=2, clock=lambda: taipei_epoch(2026, 5, 11, 10, 0))
+    cache.put(price("2330:TPE"))
+    cache.put(price("2317:TPE"))
+    cache.get("2330:TPE")
+    cache.put(price("2454:TPE"))
+
+    assert cache.get("2317:TPE") is None
+    assert cache.get("2330:TPE") is not None
+    assert len(cache) == 2
+
+
+def test_cached_service_only_fetches_missing_symbols_unless_bypassed():
+    backend = CountingService()
+    cache = QuoteCache(clock=lambda: taipei_epoch(2026, 5, 11, 10, 0))
+    service = CachedMarketDataService(backend, cache=cache)
+
+    asyncio.run(service.get_prices(["2330:TPE"]))
+    batch = asyncio.run(service.get_prices(["2330:TPE", "2317:TPE"]))
+    asyncio.run(service.get_prices(["2330:TPE"], bypass_cache=True))
+
+    assert list(batch.prices) == ["2330:TPE", "2317:TPE"]
+    assert backend.requested == [["2330:TPE"], ["2317:TPE"], ["2330:TPE"]]
+
+
+def test_cached_service_records_fetched_quotes_in_price_history(tmp_path):
+    history = SQLitePriceHistory(str(tmp_path / "price-history.sqlite3"))
+    service = CachedMarketDataService(CountingService(), cache=QuoteCache(), price_history=history)
+
+    asyncio.run(service.get_prices(["2330:TPE"]))
+    # 快取命中的報價不再寫入；新抓取的報價寫入同一份時間序列
+    asyncio.run(service.get_prices(["2330:TPE", "2317:TPE"]))
+
+    assert history.prices_at(["2330:TPE", "2317:TPE"], "2026-05-11T10:00:00+08:00") == {
+        "2330:TPE": 1.0,
+        "2317:TPE": 1.0,
+    }
+
+
+def test_quote_store_shares_quotes_between_independent_caches(tmp_path):
+    now = taipei_epoch(2026, 5, 11, 10, 0)
+    path = tmp_path / "quotes.sqlite3"
+    writer = QuoteCache(clock=lambda: now, store=SQLiteQuoteStore(path, clock=lambda: now))
+    writer.put(price("2330:TPE", 1060.0))
+
+    reader = QuoteCache(clock=lambda: now, store=SQLiteQuoteStore(path, clock=lambda: now))
+    result = reader.get("2330:TPE")
+
+    assert result == price("2330:TPE", 1060.0)
+    assert reader.stats()["store_hits"] == 1
+
+
+def test_quote_store_ignores_expired_rows(tmp_path):
+    now = [1000.0]
+    store = SQLiteQuoteStore(tmp_path / "quotes.sqlite3", clock=lambda: now[0])
+    store.put(price("2330:TPE"), expires_at=1060.0)
+
+    assert store.get("2330:TPE") is not None
+    now[0] = 1060.0
+    assert store.get("2330:TPE") is None
+    assert store.purge_expired() == 1
+
+
+def test_quote_store_accepts_concurrent_writers(tmp_path):
+    path = tmp_path / "quotes.sqlite3"
+    errors = []
+
+    def write(offset):
+        store = SQLiteQuoteStore(path)
+        try:
+            for code in range(offset, offset + 50):
+                store.put(price(f"{code}:TPE"), expires_at=2 ** 40)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            store.close()
+
+    threads = [threading.Thread(target=write, args=(offset,)) for offset in (1000, 2000, 3000, 4000)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    symbols = [f"{code}:TPE" for offset in (1000, 2000, 3000, 4000) for code in range(offset, offset + 50)]
+    assert len(SQLiteQuoteStore(path).get_many(symbols)) == 200
@@ -12,7 +12,7 @@ def mock_response():
 
 def test_get_stock_price_success(mock_response):
     """測試成功取得股價"""
-    with patch('requests.get') as mock_get:
+    with patch('requests.Session.get') as mock_get:
         mock_get.return_value = mock_response
         
         price_info = get_stock_price("TSLA:NASDAQ")
@@ -23,7 +23,7 @@ def test_get_stock_price_success(mock_response):
 
 def test_get_stock_price_network_error():
     """測試網路錯誤情況"""
-    with patch('requests.get') as mock_get:
+    with patch('requests.Session.get') as mock_get:
         mock_get.side_effect = Exception("Network error")
         
         with pytest.raises(ScraperError):